@@ -1,18 +1,21 @@
-import csv
-import os
-from datetime import datetime
+from services import metrics, profiling
+from services.event_bus import LimitRequested
+
+HISTORY_LIMIT = 5
 
 class CreditLimitAgent:
-    def __init__(self, data_path, rules_path, requests_path):
-        self.data_path = data_path
-        self.rules_path = rules_path
-        self.requests_path = requests_path
+    def __init__(self, storage, bus=None, interview=None):
+        self.storage = storage
+        # Com barramento, o registro das solicitações fica com o trabalhador 'registro'
+        self.bus = bus
+        self.interview = interview
 
     def process(self, cpf):
         while True:
             print("\n=== Agente de Limite de Crédito ===")
             print("1. Consultar Limite Atual")
             print("2. Solicitar Aumento de Limite")
+            print("3. Histórico de Solicitações")
             print("0. Voltar ao Menu Principal")
             
             choice = input("Escolha uma opção: ").strip()
@@ -21,6 +24,8 @@ class CreditLimitAgent:
                 self.consult_limit(cpf)
             elif choice == '2':
                 self.request_increase(cpf)
+            elif choice == '3':
+                self.show_history(cpf)
             elif choice == '0':
                 break
             else:
@@ -28,12 +33,9 @@ class CreditLimitAgent:
 
     def get_client_data(self, cpf):
         try:
-            with open(self.data_path, mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    if row['cpf'] == cpf:
-                        return row
+            return self.storage.get_client(cpf)
         except Exception as e:
+            metrics.ERRORS.labels('get_client_data').inc()
             print(f"Erro ao ler dados do cliente: {e}")
         return None
 
@@ -44,6 +46,27 @@ class CreditLimitAgent:
         else:
             print("\nCliente não encontrado.")
 
+    def request_history(self, cpf, limit=HISTORY_LIMIT):
+        """Últimas solicitações do cliente, da mais recente para a mais antiga, sem interação."""
+        with metrics.HISTORY_SECONDS.time():
+            return self.storage.request_history(cpf, limit)
+
+    def show_history(self, cpf):
+        try:
+            history = self.request_history(cpf)
+        except Exception as e:
+            metrics.ERRORS.labels('request_history').inc()
+            print(f"Erro ao consultar histórico de solicitações: {e}")
+            return
+        if not history:
+            print("\nNenhuma solicitação de aumento registrada.")
+            return
+        print(f"\nÚltimas {len(history)} solicitações:")
+        for row in history:
+            when = row['data_hora_solicitacao'][:16].replace('T', ' ')
+            print(f"  {when} | R$ {float(row['limite_atual']):.2f} -> R$ {float(row['novo_limite_solicitado']):.2f} | {row['status_pedido']}")
+
+    @profiling.span('request_increase')
     def request_increase(self, cpf):
         client = self.get_client_data(cpf)
         if not client:
@@ -65,10 +88,10 @@ class CreditLimitAgent:
 
         # Check rules
         max_allowed = self.check_rules(score)
-        status = 'rejeitado'
+        status = self.evaluate(requested_limit, max_allowed)
+        self.count_decision(score, status)
         
-        if requested_limit <= max_allowed:
-            status = 'aprovado'
+        if status == 'aprovado':
             print("\nParabéns! Sua solicitação foi APROVADA.")
             # In a real system, we would update the limit in clientes.csv here too.
             # For this exercise, we just log it.
@@ -83,45 +106,81 @@ class CreditLimitAgent:
         if status == 'rejeitado':
             self.offer_interview(cpf)
 
+    @staticmethod
+    def evaluate(requested_limit, max_allowed):
+        """Regra de decisão: aprova se o valor pedido não excede o máximo da faixa do score."""
+        return 'aprovado' if requested_limit <= max_allowed else 'rejeitado'
+
+    def count_decision(self, score, status):
+        """Contabiliza a decisão na métrica de aprovações/rejeições por faixa de score."""
+        try:
+            band = self.storage.score_band(score)
+        except Exception:
+            metrics.ERRORS.labels('score_band').inc()
+            band = 'desconhecida'
+        metrics.LIMIT_DECISIONS.labels(band, status).inc()
+
+    def limit_summary(self, cpf):
+        """Limite atual, score e limite máximo do cliente, sem interação. None se o CPF não existir."""
+        client = self.storage.get_client(cpf)
+        if client is None:
+            return None
+        score = float(client.get('score', 0))
+        return {
+            'cpf': client['cpf'],
+            'limite_atual': float(client.get('limite_atual', 0)),
+            'score': score,
+            'limite_maximo': self._max_limit(score),
+        }
+
+    def decide(self, cpf, requested_limit):
+        """
+        Decide e registra uma solicitação de aumento sem interação (usado pela API).
+
+        Retorna o resumo do limite acrescido de `limite_solicitado` e `status`,
+        ou None se o CPF não existir. Erros de armazenamento são propagados.
+        """
+        decision = self.limit_summary(cpf)
+        if decision is None:
+            return None
+        decision['limite_solicitado'] = requested_limit
+        decision['status'] = self.evaluate(requested_limit, decision['limite_maximo'])
+        self.count_decision(decision['score'], decision['status'])
+        with metrics.LOG_SECONDS.time():
+            self.storage.log_request(cpf, decision['limite_atual'], requested_limit, decision['status'])
+        return decision
+
     def check_rules(self, score):
         max_limit = 0.0
         try:
-            with open(self.rules_path, mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    min_s = float(row['min_score'])
-                    max_s = float(row['max_score'])
-                    limit = float(row['max_limite'])
-                    
-                    if min_s <= score <= max_s:
-                        max_limit = limit
-                        break
+            max_limit = self._max_limit(score)
         except Exception as e:
+            metrics.ERRORS.labels('check_rules').inc()
             print(f"Erro ao ler regras de limite: {e}")
         
         return max_limit
 
+    def _max_limit(self, score):
+        with metrics.RULES_SECONDS.time():
+            return self.storage.max_limit(score)
+
     def log_request(self, cpf, current, requested, status):
         try:
-            file_exists = os.path.isfile(self.requests_path)
-            with open(self.requests_path, mode='a', encoding='utf-8', newline='') as csvfile:
-                fieldnames = ['cpf_cliente', 'data_hora_solicitacao', 'limite_atual', 'novo_limite_solicitado', 'status_pedido']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                if not file_exists:
-                    writer.writeheader()
-                
-                writer.writerow({
-                    'cpf_cliente': cpf,
-                    'data_hora_solicitacao': datetime.now().isoformat(),
-                    'limite_atual': current,
-                    'novo_limite_solicitado': requested,
-                    'status_pedido': status
-                })
+            if self.bus is not None:
+                self.bus.publish(LimitRequested(cpf, current, requested, status))
+            else:
+                with metrics.LOG_SECONDS.time():
+                    self.storage.log_request(cpf, current, requested, status)
             print("Solicitação registrada com sucesso.")
         except Exception as e:
+            metrics.ERRORS.labels('log_request').inc()
             print(f"Erro ao registrar solicitação: {e}")
 
+    def handle_limit_requested(self, message):
+        """Handler de LimitRequested no barramento: grava a solicitação no log."""
+        with metrics.LOG_SECONDS.time():
+            self.storage.log_request(message.cpf, message.current_limit, message.requested_limit, message.status)
+
     def offer_interview(self, cpf):
         print("\n--- Sugestão ---")
         print("Gostaria de realizar uma Entrevista de Crédito para tentar atualizar seu score?")
@@ -129,9 +188,11 @@ class CreditLimitAgent:
         choice = input("Deseja realizar a entrevista agora? (s/n): ").strip().lower()
         
         if choice.startswith('s'):
-            from agents.interview_agent import InterviewAgent
-            # Assuming data_path is the same for all agents
-            agent = InterviewAgent(self.data_path)
+            # A entrevista conversa com o cliente: roda aqui, na thread da sessão (só a gravação vai ao barramento)
+            agent = self.interview
+            if agent is None:
+                from agents.interview_agent import InterviewAgent
+                agent = InterviewAgent(self.storage, self.bus)
             agent.process(cpf)
         else:
             print("Entendido. Retornando ao menu.")
@@ -1,49 +1,95 @@
-import json
-import urllib.request
-import urllib.error
+from services import metrics, profiling
+from services.fx_client import get_fx_client, parse_query
+from services.rate_cache import DEFAULT_API_URL
 
 class ExchangeAgent:
-    def __init__(self):
-        self.api_url = "https://open.er-api.com/v6/latest/USD"
+    def __init__(self, api_url=DEFAULT_API_URL, data_dir=None):
+        self.api_url = api_url
+        # Histórico local de câmbio no diretório do armazenamento em uso
+        self.client = get_fx_client(api_url, data_dir)
 
     def process(self):
+        base = self.client.default_base
         print("\n=== Agente de Câmbio ===")
         print("Posso consultar a cotação do Dólar (USD) para diversas moedas.")
-        
+        print("Informe várias moedas separadas por vírgula e use BASE/MOEDA para cotar a partir de outra moeda (ex: BRL,EUR,EUR/GBP).")
+
         while True:
-            target_currency = input("\nPara qual moeda você deseja ver a cotação? (ex: BRL, EUR, JPY) ou 'sair' para voltar: ").strip().upper()
-            
-            if target_currency == 'SAIR':
+            text = input("\nPara qual moeda você deseja ver a cotação? (ex: BRL, EUR, JPY) ou 'sair' para voltar: ").strip().upper()
+
+            if text == 'SAIR':
                 print("Encerrando consulta de câmbio.")
                 break
-            
-            if not target_currency:
+
+            if not text:
                 continue
 
-            self.get_rate(target_currency)
+            self.get_rates(parse_query(text, base))
+
+    def lookup(self, target_currency):
+        """Retorna (cotação ou None, horário da última atualização) sem interação (usado pela API)."""
+        # A tabela completa fica em cache até a próxima atualização da API
+        with metrics.RATE_SECONDS.time():
+            data = self.client.table()
+        return data.get('rates', {}).get(target_currency), data.get('time_last_update_utc')
+
+    def lookup_many(self, queries):
+        """
+        {base: [moedas]} -> {base: ({moeda: cotação ou None}, horário da última atualização)},
+        com as bases consultadas em paralelo. Uma base que falhar traz a exceção no lugar da tupla.
+        """
+        with metrics.RATE_SECONDS.time():
+            rates = self.client.get_many(queries, return_exceptions=True)
+        return {base: result if isinstance(result, Exception) else (result, self.updated_at(self.client.table(base)))
+                for base, result in rates.items()}
+
+    @staticmethod
+    def updated_at(table):
+        updated = table.get('time_last_update_utc')
+        if table.get('offline'):
+            # API fora do ar: a cotação veio do histórico local
+            return f"{updated} (histórico local; serviço de cotação indisponível)"
+        return updated
 
     def get_rate(self, target_currency):
-        print(f"Buscando cotação atual para USD -> {target_currency}...")
-        
+        self.get_rates({self.client.default_base: [target_currency]})
+
+    # get_rate delega para cá: o intervalo cobre também as consultas do menu de câmbio
+    @profiling.span('get_rate')
+    def get_rates(self, queries):
+        pairs = "; ".join(f"{base} -> {', '.join(targets)}" for base, targets in queries.items())
+        print(f"Buscando cotação atual para {pairs}...")
+
         try:
-            with urllib.request.urlopen(self.api_url) as response:
-                if response.status == 200:
-                    data = json.loads(response.read().decode())
-                    rates = data.get('rates', {})
-                    
-                    rate = rates.get(target_currency)
-                    
-                    if rate:
-                        print(f"\nCotação Atual:")
-                        print(f"1 USD = {rate:.4f} {target_currency}")
-                        print(f"Última atualização: {data.get('time_last_update_utc', 'Desconhecido')}")
-                    else:
-                        print(f"Moeda '{target_currency}' não encontrada na base de dados.")
-                else:
-                    print("Não foi possível acessar o serviço de cotação no momento.")
-                    
-        except urllib.error.URLError as e:
-            print(f"Erro de conexão: {e.reason}")
-            print("Verifique sua conexão com a internet.")
+            results = self.lookup_many(queries)
         except Exception as e:
+            metrics.ERRORS.labels('get_rate').inc()
             print(f"Ocorreu um erro inesperado: {e}")
+            return
+
+        header_printed = False
+        for base, result in results.items():
+            if isinstance(result, ConnectionError):
+                metrics.ERRORS.labels('get_rate').inc()
+                print(f"\nNão foi possível consultar a base {base}: {result}")
+                print("Verifique o código da moeda e sua conexão com a internet.")
+                continue
+            if isinstance(result, ValueError):
+                metrics.ERRORS.labels('get_rate').inc()
+                print(f"\nNão foi possível consultar a base {base}: {result}")
+                continue
+            if isinstance(result, Exception):
+                metrics.ERRORS.labels('get_rate').inc()
+                print(f"\nOcorreu um erro inesperado ao consultar a base {base}: {result}")
+                continue
+            rates, updated_at = result
+            for target, rate in rates.items():
+                if rate:
+                    if not header_printed:
+                        print(f"\nCotação Atual:")
+                        header_printed = True
+                    print(f"1 {base} = {rate:.4f} {target}")
+                else:
+                    print(f"Moeda '{target}' não encontrada na base de dados.")
+            if any(rates.values()):
+                print(f"Última atualização ({base}): {updated_at or 'Desconhecido'}")
@@ -1,9 +1,16 @@
-import csv
-import os
+from concurrent.futures import TimeoutError
+
+from services import metrics, profiling, scoring
+from services.event_bus import InterviewCompleted, ScoreUpdated
+
+# Espera máxima pela confirmação do trabalhador 'score' antes de responder ao cliente
+CONFIRM_TIMEOUT = 5.0
 
 class InterviewAgent:
-    def __init__(self, data_path):
-        self.data_path = data_path
+    def __init__(self, storage, bus=None):
+        self.storage = storage
+        # Com barramento, a gravação do score fica com o trabalhador 'score'
+        self.bus = bus
 
     def process(self, cpf):
         print("\n=== Entrevista de Crédito ===")
@@ -14,8 +21,11 @@ class InterviewAgent:
             score = self.calculate_score(data)
             print(f"\nSeu novo score calculado é: {score}")
             
-            if self.update_db(cpf, score):
+            updated = self.update_db(cpf, score)
+            if updated:
                 print("Seu score foi atualizado com sucesso na nossa base de dados.")
+            elif updated is None:
+                print("A atualização do seu score está na fila e será concluída em instantes.")
             else:
                 print("Houve um erro ao atualizar seu score na base de dados.")
             
@@ -78,74 +88,68 @@ class InterviewAgent:
             print("\nErro: Valor inválido inserido. A entrevista foi cancelada.")
             return None
 
-    def calculate_score(self, data):
-        # Formula:
-        # score = ( (renda_mensal / (despesas + 1)) * peso_renda + peso_emprego[tipo_emprego] + peso_dependentes[num_dependentes] + peso_dividas[tem_dividas] )
-        
-        peso_renda = 30
-        peso_emprego = {
-            "formal": 300,
-            "autônomo": 200,
-            "desempregado": 0
-        }
-        peso_dependentes = {
-            0: 100,
-            1: 80,
-            2: 60,
-            "3+": 30
-        }
-        peso_dividas = {
-            "sim": -100,
-            "não": 100
+    @staticmethod
+    def normalize_answers(answers):
+        """
+        Valida respostas vindas de fora do terminal (ex: API) no formato usado por `calculate_score`.
+
+        Levanta ValueError se renda, despesas ou tipo de emprego forem inválidos.
+        """
+        job_type = str(answers['job_type']).strip().lower()
+        if job_type not in scoring.PESO_EMPREGO:
+            raise ValueError(f"Tipo de emprego inválido: {answers['job_type']}")
+        try:
+            dependents = int(answers['dependents'])
+        except (TypeError, ValueError):
+            dependents = "3+"
+        has_debts = answers['has_debts']
+        if isinstance(has_debts, bool):
+            has_debts = "sim" if has_debts else "não"
+        has_debts = "sim" if str(has_debts).strip().lower().startswith('s') else "não"
+        return {
+            "income": float(str(answers['income']).replace(',', '.')),
+            "job_type": job_type,
+            "expenses": float(str(answers['expenses']).replace(',', '.')),
+            "dependents": scoring.dependents_key(dependents),
+            "has_debts": has_debts
         }
 
-        income = data['income']
-        expenses = data['expenses']
-        job_type = data['job_type']
-        dependents = data['dependents']
-        has_debts = data['has_debts']
+    def submit(self, cpf, data):
+        """Calcula e grava o novo score sem interação. Retorna (score, atualizado)."""
+        score = self.calculate_score(data)
+        return score, self._update_score(cpf, score)
 
-        # Calculate parts
-        part_income = (income / (expenses + 1)) * peso_renda
-        part_job = peso_emprego.get(job_type, 0)
-        part_dependents = peso_dependentes.get(dependents, 30) # Default to lowest if key mismatch
-        part_debts = peso_dividas.get(has_debts, 0)
+    def calculate_score(self, data):
+        # Formula (pesos definidos uma única vez em services/scoring.py):
+        # score = ( (renda_mensal / (despesas + 1)) * peso_renda + peso_emprego[tipo_emprego] + peso_dependentes[num_dependentes] + peso_dividas[tem_dividas] )
+        return scoring.calculate_score(data)
 
-        raw_score = part_income + part_job + part_dependents + part_debts
-        
-        # Clamp between 0 and 1000
-        final_score = max(0, min(1000, int(raw_score)))
-        
-        return final_score
+    def _update_score(self, cpf, new_score):
+        with metrics.UPDATE_SECONDS.time():
+            updated = self.storage.update_score(cpf, new_score)
+        metrics.UPDATE_RESULTS.labels('atualizado' if updated else 'nao_encontrado').inc()
+        return updated
+
+    def handle_interview_completed(self, message):
+        """Handler de InterviewCompleted no barramento: grava o score e responde com ScoreUpdated."""
+        return ScoreUpdated(message.cpf, message.score, self._update_score(message.cpf, message.score))
 
+    @profiling.span('update_db')
     def update_db(self, cpf, new_score):
-        # We need to read all, update the specific row, and write back.
-        # This is not efficient for huge DBs but fine for CSV.
-        rows = []
-        updated = False
-        
+        """
+        Grava o novo score. Com barramento, a gravação é feita pelo trabalhador
+        'score' e o retorno é None se a confirmação não chegar em CONFIRM_TIMEOUT.
+        """
+        # No backend CSV a atualização é anexada ao journal de scores (O(1));
+        # no SQLite apenas a linha do cliente é alterada.
         try:
-            with open(self.data_path, mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                fieldnames = reader.fieldnames
-                if 'score' not in fieldnames:
-                    fieldnames.append('score')
-                
-                for row in reader:
-                    if row['cpf'] == cpf:
-                        row['score'] = str(new_score)
-                        updated = True
-                    rows.append(row)
-            
-            if updated:
-                with open(self.data_path, mode='w', encoding='utf-8', newline='') as csvfile:
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(rows)
-                return True
-            else:
-                return False
-                
+            if self.bus is not None:
+                replies = self.bus.publish(InterviewCompleted(cpf, new_score)).result(CONFIRM_TIMEOUT)
+                return any(reply.updated for reply in replies if isinstance(reply, ScoreUpdated))
+            return self._update_score(cpf, new_score)
+        except TimeoutError:
+            return None
         except Exception as e:
+            metrics.ERRORS.labels('update_db').inc()
             print(f"Erro ao atualizar banco de dados: {e}")
             return False
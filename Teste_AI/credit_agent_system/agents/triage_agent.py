@@ -1,9 +1,14 @@
-import csv
-import os
+from services import metrics, profiling
+from services.admission import Throttled, get_admission
+from services.cpf_check import get_cpf_precheck, normalize_cpf
 
 class TriageAgent:
-    def __init__(self, data_path):
-        self.data_path = data_path
+    def __init__(self, storage, admission=None, precheck=None, bus=None):
+        self.storage = storage
+        # Barramento de eventos (agents/workers.py): sem ele, os efeitos colaterais são síncronos
+        self.bus = bus
+        self.admission = admission or get_admission()
+        self.precheck = precheck or get_cpf_precheck(storage)
         self.max_attempts = 3
 
     def start(self):
@@ -22,7 +27,7 @@ class TriageAgent:
         attempts = 0
         while attempts < self.max_attempts:
             print(f"\nTentativa {attempts + 1} de {self.max_attempts}")
-            cpf = input("Por favor, digite seu CPF (apenas números): ").strip()
+            cpf = normalize_cpf(input("Por favor, digite seu CPF (apenas números): "))
             dob = input("Por favor, digite sua data de nascimento (DD/MM/AAAA): ").strip()
 
             if self.validate_user(cpf, dob):
@@ -34,32 +39,57 @@ class TriageAgent:
         
         return None
 
+    @profiling.span('validate_user')
     def validate_user(self, cpf_input, dob_input):
         try:
-            with open(self.data_path, mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    # Validação simples: verifica se CPF e Data de Nascimento correspondem a um registro
-                    # Removendo não-dígitos do CPF do CSV apenas por precaução
-                    db_cpf = row['cpf'].strip()
-                    db_dob = row['data_nascimento'].strip()
-                    
-                    if db_cpf == cpf_input and db_dob == dob_input:
-                        print(f"Bem-vindo(a), {row['nome']}!")
-                        return True
+            row = self.find_user(cpf_input, dob_input)
+            if row:
+                print(f"Bem-vindo(a), {row['nome']}!")
+                return True
+        except Throttled as e:
+            print(e)
+            return False
         except FileNotFoundError:
-            print(f"Erro: Base de dados não encontrada em {self.data_path}")
+            metrics.ERRORS.labels('validate_user').inc()
+            print(f"Erro: Base de dados não encontrada em {self.storage.location}")
             return False
         except Exception as e:
+            metrics.ERRORS.labels('validate_user').inc()
             print(f"Erro ao ler base de dados: {e}")
             return False
             
         return False
 
+    def find_user(self, cpf_input, dob_input):
+        """
+        Registro do cliente se CPF e data de nascimento conferem, sem interação.
+        Lança Throttled, sem consultar o armazenamento, se o controle de admissão recusar a tentativa.
+        """
+        cpf = normalize_cpf(cpf_input)
+        with self.admission.admit(cpf) as ticket:
+            row = self.check_user(cpf, dob_input)
+            ticket.succeeded = row is not None
+        return row
+
+    def check_user(self, cpf_input, dob_input):
+        """Consulta de `find_user` sem o controle de admissão (para quem já reservou a tentativa)."""
+        # CPF recusado pela pré-checagem (dígitos verificadores, filtro de CPFs da base)
+        # não chega ao armazenamento; os demais seguem para a consulta indexada por CPF
+        with metrics.VALIDATE_SECONDS.time():
+            client = self.precheck.get_client(cpf_input, self.storage.get_client)
+            row = client if client is not None and client['data_nascimento'].strip() == dob_input.strip() else None
+        metrics.VALIDATE_RESULTS.labels('sucesso' if row else 'falha').inc()
+        return row
+
     def redirect(self, cpf):
         from agents.credit_limit_agent import CreditLimitAgent
         from agents.interview_agent import InterviewAgent
         from agents.exchange_agent import ExchangeAgent
+
+        # Agentes da sessão criados uma vez; a entrevista oferecida após uma rejeição é a mesma do menu
+        interview = InterviewAgent(self.storage, self.bus)
+        limit = CreditLimitAgent(self.storage, self.bus, interview)
+        exchange = None
         
         while True:
             print("\n------------------------------------------------")
@@ -72,16 +102,12 @@ class TriageAgent:
             choice = input("\nDigite o número da opção desejada: ").strip()
             
             if choice == '1':
-                rules_path = os.path.join(os.path.dirname(self.data_path), 'score_limite.csv')
-                requests_path = os.path.join(os.path.dirname(self.data_path), 'solicitacoes_aumento_limite.csv')
-                agent = CreditLimitAgent(self.data_path, rules_path, requests_path)
-                agent.process(cpf)
+                limit.process(cpf)
             elif choice == '2':
-                agent = InterviewAgent(self.data_path)
-                agent.process(cpf)
+                interview.process(cpf)
             elif choice == '3':
-                agent = ExchangeAgent()
-                agent.process()
+                exchange = exchange or ExchangeAgent(data_dir=self.storage.data_dir)
+                exchange.process()
             elif choice == '0':
                 self.end_execution()
                 break
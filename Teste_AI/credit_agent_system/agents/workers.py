@@ -0,0 +1,44 @@
+"""
+Trabalhadores dos agentes no barramento de eventos (services/event_bus.py).
+
+Os efeitos colaterais das sessões saem do caminho da conversa: o registro
+das solicitações de aumento (LimitRequested) e a gravação do score
+calculado na entrevista (InterviewCompleted -> ScoreUpdated) são feitos
+por trabalhadores de longa duração, no próprio processo ou em processos
+separados.
+"""
+
+from agents.credit_limit_agent import CreditLimitAgent
+from agents.interview_agent import InterviewAgent
+from services.event_bus import EventBus, InterviewCompleted, LimitRequested
+from storage.backends import DEFAULT_DATA_DIR, open_storage
+
+
+def agent_handlers(storage):
+    """{tipo de mensagem: handler} dos agentes sobre o armazenamento."""
+    return {
+        LimitRequested: CreditLimitAgent(storage).handle_limit_requested,
+        InterviewCompleted: InterviewAgent(storage).handle_interview_completed,
+    }
+
+
+def _process_handlers(spec, data_dir):
+    # Roda em cada processo trabalhador: o armazenamento é aberto lá
+    return agent_handlers(open_storage(spec, data_dir))
+
+
+def start_agents(storage, processes=0, spec=None, data_dir=DEFAULT_DATA_DIR):
+    """
+    Barramento com os trabalhadores dos agentes. Com `processes` > 0 os
+    handlers rodam nesse número de processos, cada um com o próprio
+    `open_storage(spec, data_dir)`; senão, em uma thread por agente
+    ('registro' e 'score') deste processo, sobre `storage`.
+    """
+    bus = EventBus()
+    if processes:
+        bus.subscribe_processes([LimitRequested, InterviewCompleted], _process_handlers, (spec, data_dir), processes)
+    else:
+        handlers = agent_handlers(storage)
+        bus.subscribe(LimitRequested, handlers[LimitRequested], worker='registro')
+        bus.subscribe(InterviewCompleted, handlers[InterviewCompleted], worker='score')
+    return bus
@@ -0,0 +1,106 @@
+"""
+Geradores determinísticos (com semente) de dados sintéticos para benchmarks.
+
+Uso:
+    python -m benchmarks.generate --rows 100000 --out /tmp/dados_bench
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Heitor', 'Isabela', 'João',
+               'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago', 'Vitória', 'Yuri']
+LAST_NAMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+              'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa']
+
+DEFAULT_RULES = [
+    (0, 300, 500),
+    (301, 600, 2000),
+    (601, 800, 5000),
+    (801, 1000, 15000),
+]
+
+
+def cpf_for(i):
+    """CPF sintético e único para o índice i (11 dígitos, a partir de 10000000000)."""
+    return str(10000000000 + i)
+
+
+def dob_for(i, seed=42):
+    """Data de nascimento do cliente i: função do índice, para os benchmarks saberem a data sem reler o arquivo."""
+    day = datetime(1940, 1, 1) + timedelta(days=(i * 7919 + seed) % (365 * 65))
+    return day.strftime("%d/%m/%Y")
+
+
+def generate_clients(path, rows, seed=42):
+    """Gera clientes.csv com `rows` clientes."""
+    rng = random.Random(seed)
+    with open(path, mode='w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['cpf', 'data_nascimento', 'nome', 'score', 'limite_atual'])
+        for i in range(rows):
+            writer.writerow([
+                cpf_for(i),
+                dob_for(i, seed),
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                rng.randint(0, 1000),
+                f"{rng.randrange(500, 20000, 50):.2f}",
+            ])
+
+
+def generate_rules(path, rules=DEFAULT_RULES):
+    with open(path, mode='w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['min_score', 'max_score', 'max_limite'])
+        writer.writerows(rules)
+
+
+def generate_requests(path, rows, clients, seed=42, start=datetime(2025, 1, 1)):
+    """Gera um log de solicitações (formato de solicitacoes_aumento_limite.csv) para `clients` clientes."""
+    rng = random.Random(seed + 1)
+    with open(path, mode='w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['cpf_cliente', 'data_hora_solicitacao', 'limite_atual', 'novo_limite_solicitado', 'status_pedido'])
+        seconds = 0
+        for _ in range(rows):
+            seconds += rng.randint(1, 120)
+            current = float(rng.randrange(500, 20000, 50))
+            requested = float(rng.randrange(500, 25000, 50))
+            writer.writerow([
+                cpf_for(rng.randrange(clients)),
+                (start + timedelta(seconds=seconds)).isoformat(),
+                current,
+                requested,
+                rng.choice(['aprovado', 'rejeitado']),
+            ])
+
+
+def generate_data_dir(out_dir, rows, request_rows=None, seed=42):
+    """Cria um diretório de dados completo (clientes, regras e log) pronto para os agentes."""
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    generate_clients(os.path.join(out_dir, 'clientes.csv'), rows, seed)
+    generate_rules(os.path.join(out_dir, 'score_limite.csv'))
+    generate_requests(os.path.join(out_dir, 'solicitacoes_aumento_limite.csv'),
+                      rows if request_rows is None else request_rows, rows, seed)
+    return out_dir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos para benchmarks")
+    parser.add_argument('--rows', type=int, default=100000, help="Quantidade de clientes (10^3 a 10^7)")
+    parser.add_argument('--requests', type=int, default=None, help="Linhas do log de solicitações (padrão: igual a --rows)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', required=True, help="Diretório de saída (será recriado)")
+    args = parser.parse_args(argv)
+    generate_data_dir(args.out, args.rows, args.requests, args.seed)
+    print(f"Dados gerados em {args.out}: {args.rows} clientes.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,429 @@
+"""
+Gerador de carga: usuários virtuais percorrendo os agentes de terminal a partir de um roteiro.
+
+Uso:
+    python -m benchmarks.loadgen --users 50 --sessions 20
+    python -m benchmarks.loadgen --users 200 --processes 4 --storage sqlite --rows 100000
+    python -m benchmarks.loadgen --scenario benchmarks/scenarios/fluxo_credito.json --out carga.json
+
+Cada sessão executa `TriageAgent.start()` de verdade; as chamadas a input()
+recebem as respostas do roteiro e a saída de print() é capturada por sessão.
+Tudo roda sobre uma cópia temporária do diretório de dados (ou sobre uma base
+sintética com `--rows`), então os dados originais nunca são alterados.
+
+Ao final, o estado gravado é relido em um processo novo para contar
+atualizações de score perdidas e linhas do log de solicitações que faltaram.
+
+Formato do roteiro (JSON):
+    {"pausa_ms": 0,
+     "sessoes": [{"nome": "...", "peso": 1,
+                  "respostas": ["{cpf}", {"prompt": "data de nascimento", "resposta": "{data_nascimento}"}, ...]}]}
+
+Uma resposta com "prompt" só é aceita se o texto da pergunta contiver aquele
+trecho; caso contrário a sessão é contada como desvio de roteiro. Marcadores:
+{cpf}, {data_nascimento}, {nome} e {aleatorio:MIN:MAX} (inteiro sorteado).
+"""
+
+import argparse
+import builtins
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from agents.triage_agent import TriageAgent
+from agents.workers import start_agents
+from services.admission import AdmissionController
+from benchmarks.generate import generate_data_dir
+from storage.backends import DEFAULT_DATA_DIR, open_storage
+
+DEFAULT_SCENARIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios', 'fluxo_credito.json')
+RANDOM_PATTERN = re.compile(r'\{aleatorio:(-?\d+):(-?\d+)\}')
+ERROR_MARKERS = ('Erro', 'Houve um erro')
+
+
+class ScriptError(Exception):
+    """A sessão saiu do roteiro (pergunta inesperada ou respostas esgotadas)."""
+
+
+class ScriptedSession:
+    """Respostas de uma sessão e a saída capturada dela."""
+
+    def __init__(self, answers, pause=0.0):
+        self.answers = answers
+        self.position = 0
+        self.pause = pause
+        self.paused = 0.0
+        self.output = []
+
+    def answer(self, prompt):
+        if self.position >= len(self.answers):
+            raise ScriptError(f"respostas esgotadas na pergunta {prompt.strip()!r}")
+        expected, value = self.answers[self.position]
+        if expected and expected not in prompt:
+            raise ScriptError(f"esperava {expected!r}, recebeu {prompt.strip()!r}")
+        self.position += 1
+        if self.pause:
+            time.sleep(self.pause)
+            self.paused += self.pause
+        return value
+
+    def printed_errors(self):
+        text = ''.join(self.output)
+        return [line.strip() for line in text.splitlines() if line.strip().startswith(ERROR_MARKERS)]
+
+
+class ScriptedConsole:
+    """
+    Substitui input() e sys.stdout no processo, despachando por thread.
+
+    Threads com sessão associada respondem pelo roteiro e escrevem no buffer
+    da sessão; as demais usam o terminal normalmente.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._stdout = None
+        self._input = None
+
+    def install(self):
+        self._stdout, self._input = sys.stdout, builtins.input
+        sys.stdout, builtins.input = self, self.input
+
+    def uninstall(self):
+        sys.stdout, builtins.input = self._stdout, self._input
+
+    @contextlib.contextmanager
+    def bind(self, session):
+        self._local.session = session
+        try:
+            yield session
+        finally:
+            self._local.session = None
+
+    def write(self, text):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            return self._stdout.write(text)
+        session.output.append(text)
+        return len(text)
+
+    def flush(self):
+        if getattr(self._local, 'session', None) is None:
+            self._stdout.flush()
+
+    def input(self, prompt=''):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            return self._input(prompt)
+        session.output.append(prompt)
+        return session.answer(prompt)
+
+
+class RecordingStorage:
+    """Repassa tudo ao Storage real e registra as escritas feitas pelos agentes."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.writes = []
+        self.logged = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def update_score(self, cpf, new_score):
+        start = time.monotonic()
+        updated = self.storage.update_score(cpf, new_score)
+        if updated:
+            self.writes.append((cpf, new_score, start, time.monotonic()))
+        return updated
+
+    def log_request(self, cpf, current, requested, status):
+        self.storage.log_request(cpf, current, requested, status)
+        with self._lock:
+            self.logged += 1
+
+
+def load_scenario(path):
+    with open(path, mode='r', encoding='utf-8') as f:
+        scenario = json.load(f)
+    sessions = []
+    for entry in scenario['sessoes']:
+        answers = []
+        for item in entry['respostas']:
+            if isinstance(item, dict):
+                answers.append((item.get('prompt'), str(item['resposta'])))
+            else:
+                answers.append((None, str(item)))
+        sessions.append({'nome': entry['nome'], 'peso': entry.get('peso', 1), 'respostas': answers})
+    return {'pausa_ms': scenario.get('pausa_ms', 0), 'sessoes': sessions}
+
+
+def expand_answers(answers, client, rng):
+    def fill(value):
+        value = RANDOM_PATTERN.sub(lambda m: str(rng.randint(int(m.group(1)), int(m.group(2)))), value)
+        return (value.replace('{cpf}', client['cpf'])
+                     .replace('{data_nascimento}', client['data_nascimento'])
+                     .replace('{nome}', client['nome']))
+    return [(prompt, fill(value)) for prompt, value in answers]
+
+
+# Sessões simuladas não passam pelos limites de autenticação: o teste mede a capacidade da aplicação
+UNLIMITED_ADMISSION = AdmissionController(cpf_attempts=0, global_rate=0, max_inflight=0)
+
+
+def run_session(console, storage, bus, template, client, rng, pause):
+    """Executa uma sessão completa. Retorna (segundos sem as pausas, lista de erros)."""
+    session = ScriptedSession(expand_answers(template['respostas'], client, rng), pause)
+    errors = []
+    start = time.monotonic()
+    with console.bind(session):
+        try:
+            TriageAgent(storage, UNLIMITED_ADMISSION, bus=bus).start()
+        except ScriptError as e:
+            errors.append(f"desvio de roteiro: {e}")
+        except Exception as e:
+            errors.append(f"exceção {type(e).__name__}: {e}")
+    elapsed = time.monotonic() - start - session.paused
+    if not errors and session.position < len(session.answers):
+        errors.append(f"desvio de roteiro: {len(session.answers) - session.position} respostas não usadas")
+    errors.extend(f"mensagem: {line[:80]}" for line in session.printed_errors())
+    return elapsed, errors
+
+
+def run_users(spec, data_dir, scenario, user_ids, sessions_per_user, clients, seed):
+    """Roda os usuários `user_ids` em threads deste processo, sobre um Storage próprio."""
+    storage = RecordingStorage(open_storage(spec, data_dir))
+    templates = scenario['sessoes']
+    weights = [t['peso'] for t in templates]
+    pause = scenario['pausa_ms'] / 1000.0
+    latencies = defaultdict(list)
+    errors = Counter()
+    failed = []
+    results_lock = threading.Lock()
+
+    # Trabalhadores dos agentes (registro e score) compartilhados pelas sessões deste processo
+    bus = start_agents(storage)
+    console = ScriptedConsole()
+    console.install()
+
+    def user(user_id):
+        rng = random.Random(seed * 1000003 + user_id)
+        client = clients[user_id % len(clients)]
+        for _ in range(sessions_per_user):
+            template = rng.choices(templates, weights)[0]
+            elapsed, session_errors = run_session(console, storage, bus, template, client, rng, pause)
+            with results_lock:
+                latencies[template['nome']].append(elapsed)
+                if session_errors:
+                    failed.append(template['nome'])
+                    errors.update(session_errors)
+
+    threads = [threading.Thread(target=user, args=(i,), name=f"vu-{i}") for i in user_ids]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        console.uninstall()
+        bus.close()
+        storage.close()
+
+    return {
+        'latencias': dict(latencies),
+        'erros': dict(errors),
+        'sessoes_com_erro': len(failed),
+        'escritas': storage.writes,
+        'solicitacoes_registradas': storage.logged,
+    }
+
+
+def read_state(spec, data_dir, cpfs):
+    """Estado em disco visto por um processo novo: scores dos CPFs e total de solicitações."""
+    storage = open_storage(spec, data_dir)
+    try:
+        scores = {}
+        for cpf, row in zip(cpfs, storage.get_clients(cpfs)):
+            scores[cpf] = row['score'] if row else None
+        return scores, sum(1 for _ in storage.iter_requests())
+    finally:
+        storage.close()
+
+
+def in_fresh_process(func, *args):
+    # 'spawn': o processo filho não herda índices e caches já carregados neste processo
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(func, *args).result()
+
+
+def lost_updates(writes, final_scores):
+    """
+    CPFs cujo score final não corresponde a nenhuma escrita que pode ter sido a última.
+
+    Com vários usuários no mesmo CPF, qualquer escrita concorrente à que
+    terminou por último é um resultado válido.
+    """
+    by_cpf = defaultdict(list)
+    for cpf, score, start, end in writes:
+        by_cpf[cpf].append((start, end, score))
+    lost = []
+    for cpf, cpf_writes in by_cpf.items():
+        last_start = max(cpf_writes, key=lambda w: w[1])[0]
+        candidates = {float(score) for start, end, score in cpf_writes if end >= last_start}
+        stored = final_scores.get(cpf)
+        if stored is None or float(stored) not in candidates:
+            lost.append(cpf)
+    return lost, len(by_cpf)
+
+
+def prepare_data(spec, source_dir, rows, seed, work_dir):
+    data_dir = os.path.join(work_dir, 'data')
+    if rows:
+        generate_data_dir(data_dir, rows, seed=seed)
+    else:
+        shutil.copytree(source_dir, data_dir, ignore=shutil.ignore_patterns('*.db-wal', '*.db-shm', '__pycache__'))
+    if spec.partition(':')[0] == 'sqlite':
+        from storage.csv_storage import CsvStorage
+        from storage.sqlite_storage import SqliteStorage
+
+        db_path = os.path.join(data_dir, spec.partition(':')[2] or 'credito.db')
+        if not os.path.exists(db_path):
+            target = SqliteStorage(db_path)
+            target.import_from(CsvStorage(data_dir))
+            target.close()
+    if spec.partition(':')[0] == 'sharded' and not spec.partition(':')[2]:
+        from storage.base import CLIENT_FIELDS
+        from storage.csv_storage import CsvStorage
+        from storage.sharded_storage import SHARDS_DIR, reshard
+
+        shards_dir = os.path.join(data_dir, SHARDS_DIR)
+        if not os.path.exists(shards_dir):
+            reshard(CsvStorage(data_dir).iter_clients(), CLIENT_FIELDS, shards_dir, 16)
+    return data_dir
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    pick = lambda f: ordered[min(len(ordered) - 1, int(round(f * (len(ordered) - 1))))] * 1000
+    return {'p50_ms': pick(0.50), 'p90_ms': pick(0.90), 'p99_ms': pick(0.99), 'max_ms': ordered[-1] * 1000}
+
+
+def merge(parts):
+    total = {'latencias': defaultdict(list), 'erros': Counter(), 'sessoes_com_erro': 0,
+             'escritas': [], 'solicitacoes_registradas': 0}
+    for part in parts:
+        for name, values in part['latencias'].items():
+            total['latencias'][name].extend(values)
+        total['erros'].update(part['erros'])
+        total['sessoes_com_erro'] += part['sessoes_com_erro']
+        total['escritas'].extend(part['escritas'])
+        total['solicitacoes_registradas'] += part['solicitacoes_registradas']
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gerador de carga com sessões roteirizadas dos agentes")
+    parser.add_argument('--scenario', default=DEFAULT_SCENARIO, help="Arquivo JSON com o roteiro das sessões")
+    parser.add_argument('--users', type=int, default=20, help="Usuários virtuais simultâneos")
+    parser.add_argument('--sessions', type=int, default=10, help="Sessões por usuário")
+    parser.add_argument('--processes', type=int, default=0,
+                        help="Distribui os usuários entre N processos (padrão: todos em threads deste processo)")
+    parser.add_argument('--storage', default=os.environ.get('CREDIT_STORAGE', 'csv'), help="csv, sharded ou sqlite")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Diretório de dados copiado para a área temporária")
+    parser.add_argument('--rows', type=int, default=0, help="Usa uma base sintética com N clientes em vez da cópia")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help="Arquivo JSON com o relatório")
+    parser.add_argument('--keep', action='store_true', help="Mantém a cópia temporária dos dados ao final")
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario)
+    work_dir = tempfile.mkdtemp(prefix='carga_credito_')
+    try:
+        data_dir = prepare_data(args.storage, args.data_dir, args.rows, args.seed, work_dir)
+        setup = open_storage(args.storage, data_dir)
+        clients = [{k: row[k] for k in ('cpf', 'data_nascimento', 'nome')}
+                   for _, row in zip(range(max(args.users, 1)), setup.iter_clients())]
+        if not clients:
+            parser.error("A base de clientes está vazia.")
+        _, requests_before = in_fresh_process(read_state, args.storage, data_dir, [])
+
+        user_ids = list(range(args.users))
+        print(f"{args.users} usuários x {args.sessions} sessões ({args.storage}, "
+              f"{'%d processos' % args.processes if args.processes else 'threads'}) em {data_dir}", file=sys.stderr)
+        start = time.monotonic()
+        if args.processes:
+            setup.close()
+            slices = [user_ids[i::args.processes] for i in range(args.processes)]
+            with ProcessPoolExecutor(max_workers=args.processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(run_users, args.storage, data_dir, scenario, ids, args.sessions, clients, args.seed)
+                           for ids in slices if ids]
+                result = merge(f.result() for f in futures)
+        else:
+            result = merge([run_users(args.storage, data_dir, scenario, user_ids, args.sessions, clients, args.seed)])
+        wall = time.monotonic() - start
+
+        cpfs = sorted({w[0] for w in result['escritas']})
+        final_scores, requests_after = in_fresh_process(read_state, args.storage, data_dir, cpfs)
+        lost, checked = lost_updates(result['escritas'], final_scores)
+        missing_rows = result['solicitacoes_registradas'] - (requests_after - requests_before)
+    finally:
+        if args.keep:
+            print(f"Dados mantidos em {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    all_latencies = [v for values in result['latencias'].values() for v in values]
+    report = {
+        'usuarios': args.users,
+        'sessoes': len(all_latencies),
+        'sessoes_com_erro': result['sessoes_com_erro'],
+        'segundos': wall,
+        'sessoes_por_segundo': len(all_latencies) / wall if wall else 0.0,
+        'latencia': percentiles(all_latencies),
+        'latencia_por_roteiro': {name: dict(percentiles(values), sessoes=len(values))
+                                 for name, values in sorted(result['latencias'].items())},
+        'erros': dict(result['erros'].most_common()),
+        'atualizacoes_de_score': len(result['escritas']),
+        'cpfs_verificados': checked,
+        'atualizacoes_perdidas': len(lost),
+        'solicitacoes_registradas': result['solicitacoes_registradas'],
+        'solicitacoes_perdidas': missing_rows,
+    }
+
+    lat = report['latencia']
+    print(f"\nSessões: {report['sessoes']} em {wall:.2f}s ({report['sessoes_por_segundo']:,.1f}/s), "
+          f"{report['sessoes_com_erro']} com erro")
+    print(f"Latência por sessão: p50 {lat['p50_ms']:.2f} ms | p90 {lat['p90_ms']:.2f} ms | "
+          f"p99 {lat['p99_ms']:.2f} ms | máx {lat['max_ms']:.2f} ms")
+    for name, stats in report['latencia_por_roteiro'].items():
+        print(f"  {name:<40} {stats['sessoes']:>7} sessões  p50 {stats['p50_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms")
+    print(f"Atualizações de score: {report['atualizacoes_de_score']} em {checked} CPFs, "
+          f"{report['atualizacoes_perdidas']} CPFs com atualização perdida")
+    print(f"Solicitações registradas: {report['solicitacoes_registradas']}, perdidas: {missing_rows}")
+    if report['erros']:
+        print("Erros:")
+        for message, count in list(report['erros'].items())[:10]:
+            print(f"  {count:>6}  {message}")
+
+    if args.out:
+        with open(args.out, mode='w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório salvo em {args.out}")
+    return 1 if report['atualizacoes_perdidas'] or missing_rows else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Benchmarks dos caminhos quentes dos agentes sobre dados sintéticos.
+
+Uso:
+    python -m benchmarks.run --sizes 1000,10000,100000 --ops 2000 --out resultados.json
+    python -m benchmarks.run --sizes 100000 --storage csv,sqlite --compare base.json --threshold 0.2
+
+Para cada tamanho de base é gerado um diretório de dados temporário (semente
+fixa) e cada caminho é executado `--ops` vezes, medindo ops/s e latências
+p50/p99. O câmbio usa um servidor local (benchmarks.stub_fx), sem rede.
+Com `--compare`, resultados piores que a referência além do limiar são
+marcados como regressão (código de saída 1).
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from agents.credit_limit_agent import CreditLimitAgent
+from agents.exchange_agent import ExchangeAgent
+from agents.interview_agent import InterviewAgent
+from agents.triage_agent import TriageAgent
+from services.admission import AdmissionController
+from services.cpf_check import CpfPrecheck
+from benchmarks.generate import cpf_for, dob_for, generate_data_dir
+from benchmarks.stub_fx import StubFxServer
+from services.rate_cache import RateCache
+from storage.csv_storage import CsvStorage
+from storage.sqlite_storage import SqliteStorage
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def measure(func, args_list):
+    """Executa `func(*args)` para cada item e retorna as latências em nanossegundos."""
+    latencies = []
+    clock = time.perf_counter_ns
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for args in args_list:
+            start = clock()
+            func(*args)
+            latencies.append(clock() - start)
+    return latencies
+
+
+def summarize(name, backend, rows, latencies):
+    ordered = sorted(latencies)
+    total_s = sum(ordered) / 1e9
+    return {
+        'bench': name,
+        'backend': backend,
+        'rows': rows,
+        'ops': len(ordered),
+        'ops_per_s': len(ordered) / total_s if total_s > 0 else 0.0,
+        'p50_us': percentile(ordered, 0.50) / 1e3,
+        'p99_us': percentile(ordered, 0.99) / 1e3,
+    }
+
+
+def open_backend(backend, data_dir):
+    csv_storage = CsvStorage(data_dir)
+    if backend == 'csv':
+        return csv_storage
+    if backend == 'csv_idx':
+        # Consultas pontuais pelo sidecar de offsets, sem carregar a base
+        csv_storage.clients.offsets.build()
+        return csv_storage
+    if backend == 'sqlite':
+        storage = SqliteStorage(os.path.join(data_dir, 'bench.db'))
+        storage.import_from(csv_storage)
+        csv_storage.close()
+        return storage
+    raise ValueError(f"Backend desconhecido: {backend}")
+
+
+def run_size(rows, backend, ops, seed, fx, work_dir):
+    """Roda todos os benchmarks para uma base de `rows` clientes."""
+    rng = random.Random(seed)
+    data_dir = os.path.join(work_dir, f"{backend}_{rows}")
+    generate_data_dir(data_dir, rows, seed=seed)
+    storage = open_backend(backend, data_dir)
+    results = []
+
+    try:
+        indexes = [rng.randrange(rows) for _ in range(ops)]
+        cpfs = [cpf_for(i) for i in indexes]
+
+        # Primeira consulta: inclui a carga do índice/conexão (partida a frio)
+        cold = measure(storage.get_client, [(cpfs[0],)])
+        results.append(summarize('carga_inicial', backend, rows, cold))
+
+        # Sem limites de admissão: o caso mede a consulta, não o throttling
+        triage = TriageAgent(storage, AdmissionController(cpf_attempts=0, global_rate=0, max_inflight=0),
+                             CpfPrecheck(storage))
+        # Filtro de CPFs montado antes das medições, e não em segundo plano durante elas
+        triage.precheck.refresh(wait=True)
+        limit = CreditLimitAgent(storage)
+        interview = InterviewAgent(storage)
+        # As tabelas do servidor local vão para o histórico de câmbio do diretório de trabalho, não o de data/
+        exchange = ExchangeAgent(fx.url('USD'), work_dir)
+
+        # Metade dos logins com data correta, metade com CPF inexistente
+        logins = [(cpf_for(i), dob_for(i, seed)) if k % 2 == 0 else (cpf_for(rows + i), '01/01/2000')
+                  for k, i in enumerate(indexes)]
+        answers = [{
+            'income': rng.uniform(0, 20000),
+            'job_type': rng.choice(['formal', 'autônomo', 'desempregado']),
+            'expenses': rng.uniform(0, 10000),
+            'dependents': rng.choice([0, 1, 2, '3+']),
+            'has_debts': rng.choice(['sim', 'não']),
+        } for _ in range(ops)]
+
+        cases = [
+            ('validate_user', triage.validate_user, logins),
+            ('get_client_data', limit.get_client_data, [(cpf,) for cpf in cpfs]),
+            ('check_rules', limit.check_rules, [(rng.uniform(0, 1000),) for _ in range(ops)]),
+            ('calculate_score', interview.calculate_score, [(a,) for a in answers]),
+            ('update_db', interview.update_db, [(cpf, rng.randint(0, 1000)) for cpf in cpfs]),
+            ('log_request', limit.log_request,
+             [(cpf, 1000.0, float(rng.randrange(500, 20000)), 'aprovado') for cpf in cpfs]),
+            ('get_rate', exchange.get_rate, [(rng.choice(['BRL', 'EUR', 'JPY']),) for _ in range(ops)]),
+        ]
+        for name, func, args_list in cases:
+            results.append(summarize(name, backend, rows, measure(func, args_list)))
+
+        # Busca completa na API (sem cache), limitada para não dominar o tempo total
+        fetches = max(1, min(ops, 200))
+        results.append(summarize('get_rate_fetch', backend, rows,
+                                 measure(lambda: RateCache(fx.url('USD')).get_table(), [()] * fetches)))
+    finally:
+        storage.close()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Lista as regressões em relação à referência (queda de ops/s ou alta de p99 acima do limiar)."""
+    reference = {(r['bench'], r['backend'], r['rows']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        ref = reference.get((result['bench'], result['backend'], result['rows']))
+        if ref is None:
+            continue
+        if ref['ops_per_s'] and result['ops_per_s'] < ref['ops_per_s'] * (1 - threshold):
+            regressions.append((result, 'ops_per_s', ref['ops_per_s'], result['ops_per_s']))
+        if ref['p99_us'] and result['p99_us'] > ref['p99_us'] * (1 + threshold):
+            regressions.append((result, 'p99_us', ref['p99_us'], result['p99_us']))
+    return regressions
+
+
+def print_table(results):
+    print(f"{'benchmark':<16} {'backend':<8} {'linhas':>10} {'ops/s':>14} {'p50 (µs)':>12} {'p99 (µs)':>12}")
+    for r in results:
+        print(f"{r['bench']:<16} {r['backend']:<8} {r['rows']:>10} {r['ops_per_s']:>14,.0f} "
+              f"{r['p50_us']:>12,.1f} {r['p99_us']:>12,.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks dos agentes de crédito")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="Tamanhos da base, separados por vírgula")
+    parser.add_argument('--storage', default='csv', help="Backends: csv, csv_idx, sqlite (separados por vírgula)")
+    parser.add_argument('--ops', type=int, default=2000, help="Operações por benchmark")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--fx-latency', type=float, default=0.0, help="Latência simulada da API de câmbio (s)")
+    parser.add_argument('--out', help="Arquivo JSON de saída")
+    parser.add_argument('--compare', help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Tolerância relativa de regressão (padrão 0.2)")
+    parser.add_argument('--work-dir', help="Diretório para os dados gerados (padrão: temporário)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(float(s)) for s in args.sizes.split(',') if s]
+    backends = [b.strip() for b in args.storage.split(',') if b.strip()]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='bench_credito_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = []
+    try:
+        with StubFxServer(latency=args.fx_latency) as fx:
+            for backend in backends:
+                for rows in sizes:
+                    print(f"-> {backend}, {rows} clientes...", file=sys.stderr)
+                    results.extend(run_size(rows, backend, args.ops, args.seed, fx, work_dir))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_table(results)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'ops': args.ops,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, mode='w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em {args.out}")
+
+    if args.compare:
+        with open(args.compare, mode='r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) acima de {args.threshold:.0%}:")
+            for result, metric, before, after in regressions:
+                print(f"  {result['bench']} [{result['backend']}, {result['rows']}]: {metric} {before:,.1f} -> {after:,.1f}")
+            return 1
+        print("\nSem regressões em relação à referência.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
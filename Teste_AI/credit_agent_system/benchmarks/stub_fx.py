@@ -0,0 +1,124 @@
+"""
+Servidor HTTP local que imita a API open.er-api.com, para benchmarks e testes offline.
+
+    with StubFxServer(latency=0.05) as fx:
+        agent = ExchangeAgent(fx.url('USD'))
+"""
+
+import json
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CURRENCIES = [
+    'USD', 'AED', 'AFN', 'ALL', 'AMD', 'ANG', 'AOA', 'ARS', 'AUD', 'AWG', 'AZN', 'BAM', 'BBD', 'BDT', 'BGN', 'BHD',
+    'BIF', 'BMD', 'BND', 'BOB', 'BRL', 'BSD', 'BTN', 'BWP', 'BYN', 'BZD', 'CAD', 'CDF', 'CHF', 'CLP', 'CNY', 'COP',
+    'CRC', 'CUP', 'CVE', 'CZK', 'DJF', 'DKK', 'DOP', 'DZD', 'EGP', 'ERN', 'ETB', 'EUR', 'FJD', 'FKP', 'FOK', 'GBP',
+    'GEL', 'GGP', 'GHS', 'GIP', 'GMD', 'GNF', 'GTQ', 'GYD', 'HKD', 'HNL', 'HRK', 'HTG', 'HUF', 'IDR', 'ILS', 'IMP',
+    'INR', 'IQD', 'IRR', 'ISK', 'JEP', 'JMD', 'JOD', 'JPY', 'KES', 'KGS', 'KHR', 'KID', 'KMF', 'KRW', 'KWD', 'KYD',
+    'KZT', 'LAK', 'LBP', 'LKR', 'LRD', 'LSL', 'LYD', 'MAD', 'MDL', 'MGA', 'MKD', 'MMK', 'MNT', 'MOP', 'MRU', 'MUR',
+    'MVR', 'MWK', 'MXN', 'MYR', 'MZN', 'NAD', 'NGN', 'NIO', 'NOK', 'NPR', 'NZD', 'OMR', 'PAB', 'PEN', 'PGK', 'PHP',
+    'PKR', 'PLN', 'PYG', 'QAR', 'RON', 'RSD', 'RUB', 'RWF', 'SAR', 'SBD', 'SCR', 'SDG', 'SEK', 'SGD', 'SHP', 'SLE',
+    'SLL', 'SOS', 'SRD', 'SSP', 'STN', 'SYP', 'SZL', 'THB', 'TJS', 'TMT', 'TND', 'TOP', 'TRY', 'TTD', 'TVD', 'TWD',
+    'TZS', 'UAH', 'UGX', 'UYU', 'UZS', 'VES', 'VND', 'VUV', 'WST', 'XAF', 'XCD', 'XDR', 'XOF', 'XPF', 'YER', 'ZAR',
+    'ZMW', 'ZWL',
+]
+
+
+def _usd_rates(seed):
+    rng = random.Random(seed)
+    rates = {code: round(rng.uniform(0.2, 5000.0), 6) for code in CURRENCIES}
+    rates['USD'] = 1.0
+    rates['BRL'] = 5.4321
+    rates['EUR'] = 0.9123
+    return rates
+
+
+class StubFxServer:
+    """
+    Servidor local (thread de fundo) com respostas no formato de /v6/latest/<BASE>.
+
+    `latency` simula o tempo de resposta da API; `ttl` define o
+    `time_next_update_unix`; `hits` conta as requisições recebidas e
+    `fail` faz o servidor responder HTTP 503.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, ttl=86400, seed=7):
+        self.latency = latency
+        self.ttl = ttl
+        self.fail = False
+        self.hits = 0
+        self.usd_rates = _usd_rates(seed)
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Cabeçalho e corpo saem em duas escritas: sem isso, em conexões
+            # keep-alive o corpo espera o ACK atrasado do cliente (~40 ms)
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.hits += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub.fail:
+                    self._send(503, {'result': 'error', 'error-type': 'unavailable'})
+                    return
+                base = self.path.rstrip('/').rsplit('/', 1)[-1].upper()
+                payload = stub.payload(base)
+                if payload is None:
+                    self._send(404, {'result': 'error', 'error-type': 'unsupported-code'})
+                else:
+                    self._send(200, payload)
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    def payload(self, base):
+        if base not in self.usd_rates:
+            return None
+        now = int(time.time())
+        pivot = self.usd_rates[base]
+        return {
+            'result': 'success',
+            'base_code': base,
+            'time_last_update_unix': now,
+            'time_last_update_utc': formatdate(now, usegmt=True),
+            'time_next_update_unix': now + self.ttl,
+            'rates': {code: rate / pivot for code, rate in self.usd_rates.items()},
+        }
+
+    def url(self, base='USD'):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v6/latest/{base}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 
@@ -6,13 +7,324 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
 from agents.triage_agent import TriageAgent
+from storage.backends import open_storage
 
-def main():
-    # Caminho para o arquivo CSV
-    data_path = os.path.join(current_dir, 'data', 'clientes.csv')
-    
-    agent = TriageAgent(data_path)
-    agent.start()
+DATA_DIR = os.path.join(current_dir, 'data')
+
+def run_interactive(args):
+    from agents.workers import start_agents
+    from storage.sqlite_storage import SqliteStorage
+
+    storage = open_storage(args.storage, DATA_DIR)
+    processes = args.bus_processes if args.bus_processes is not None else int(os.environ.get('EVENT_BUS_PROCESSES', 0))
+    if processes and not isinstance(storage, SqliteStorage):
+        # O journal de scores e o log CSV são de um processo só: gravações de outro processo não seriam vistas aqui
+        print("Trabalhadores em processos separados exigem --storage sqlite; usando threads neste processo.")
+        processes = 0
+    bus = start_agents(storage, processes=processes, spec=args.storage, data_dir=DATA_DIR)
+
+    agent = TriageAgent(storage, bus=bus)
+    try:
+        agent.start()
+    finally:
+        bus.close()
+
+def run_bulk(args):
+    """Decide em lote um arquivo de solicitações (cpf, novo_limite_solicitado)"""
+    from services.bulk_decision import decide_file
+
+    storage = open_storage(args.storage, DATA_DIR)
+
+    def progress(stats, elapsed):
+        print(f"  {stats['linhas']} linhas processadas ({stats['linhas'] / elapsed:,.0f} linhas/s)", file=sys.stderr)
+
+    stats = decide_file(args.entrada, args.saida, storage, chunk_size=args.chunk_size,
+                        progress=progress if args.verbose else None)
+    print(f"Linhas: {stats['linhas']} | Aprovadas: {stats['aprovados']} | Rejeitadas: {stats['rejeitados']} | "
+          f"CPF não encontrado: {stats['nao_encontrados']} | Inválidas: {stats['invalidos']}")
+    print(f"Tempo: {stats['segundos']:.2f}s | Vazão: {stats['linhas_por_segundo']:,.0f} linhas/s")
+
+def run_rescore(args):
+    """Recalcula em lote o score da carteira a partir de um CSV de respostas da entrevista"""
+    from services.bulk_rescore import rescore_file
+
+    storage = open_storage(args.storage, DATA_DIR)
+
+    def progress(stats, elapsed):
+        print(f"  {stats['linhas']} linhas processadas ({stats['linhas'] / elapsed:,.0f} linhas/s)", file=sys.stderr)
+
+    try:
+        stats = rescore_file(args.entrada, args.saida, storage, apply=args.aplicar, chunk_size=args.chunk_size,
+                             progress=progress if args.verbose else None)
+    finally:
+        storage.close()
+    print(f"Linhas: {stats['linhas']} | Scores alterados: {stats['alterados']} | Gravados: {stats['gravados']} | "
+          f"CPF não encontrado: {stats['nao_encontrados']} | Inválidas: {stats['invalidos']}")
+    print(f"Tempo: {stats['segundos']:.2f}s | Vazão: {stats['linhas_por_segundo']:,.0f} linhas/s")
+
+def run_migrate(args):
+    """Migra os arquivos CSV do diretório de dados para um banco SQLite"""
+    from storage.csv_storage import CsvStorage
+    from storage.sqlite_storage import SqliteStorage
+
+    db_path = args.db or os.path.join(DATA_DIR, 'credito.db')
+    target = SqliteStorage(db_path)
+    try:
+        counts = target.import_from(CsvStorage(DATA_DIR))
+    finally:
+        target.close()
+    print(f"Migração concluída em {db_path}:")
+    for table, count in counts.items():
+        print(f"  {table}: {count} registros")
+    print("Use --storage sqlite (ou CREDIT_STORAGE=sqlite) para utilizar o banco.")
+
+def run_reshard(args):
+    """Particiona a base de clientes em N shards pelo hash do CPF"""
+    from storage.base import CLIENT_FIELDS
+    from storage.sharded_storage import SHARDS_DIR, reshard
+
+    shards_dir = args.dir or os.path.join(DATA_DIR, SHARDS_DIR)
+    # Origem: o backend atual (clientes.csv, ou os próprios shards ao reparticionar)
+    source = open_storage(args.storage, DATA_DIR)
+    counts = reshard(source.iter_clients(), CLIENT_FIELDS, shards_dir, args.shards)
+    print(f"{sum(counts)} clientes distribuídos em {args.shards} shards em {shards_dir}")
+    print(f"Menor/maior shard: {min(counts)}/{max(counts)} registros")
+    print("Use --storage sharded (ou CREDIT_STORAGE=sharded) para utilizar a base particionada.")
+
+def run_index(args):
+    """Cria/atualiza o índice de offsets por CPF de clientes.csv (consultas sem carregar a base)"""
+    from storage.csv_storage import CLIENTES_FILE
+    from storage.offset_index import CpfOffsetIndex, IndexUnavailable
+
+    index = CpfOffsetIndex(os.path.join(DATA_DIR, CLIENTES_FILE))
+    try:
+        count = index.build()
+    except IndexUnavailable as e:
+        print(f"Não foi possível indexar clientes.csv: {e}")
+        return
+    print(f"{count} CPFs indexados em {index.index_path}")
+    print("O índice é atualizado automaticamente quando clientes.csv muda.")
+
+def run_fx_history(args):
+    """Consulta o histórico local de câmbio (sem acesso à rede)"""
+    import time
+    from services.fx_history import format_when, get_snapshot_store, parse_when
+
+    store = get_snapshot_store(data_dir=open_storage(args.storage, DATA_DIR).data_dir)
+    base = args.base.upper()
+    currencies = [c.strip().upper() for c in args.moedas.split(',') if c.strip()]
+    try:
+        start = parse_when(args.start) if args.start else None
+        end = parse_when(args.end, end_of_day=True) if args.end else None
+        when = parse_when(args.at, end_of_day=True) if args.at else time.time()
+    except ValueError:
+        print("Data inválida. Use AAAA-MM-DD, AAAA-MM-DD HH:MM ou DD/MM/AAAA.")
+        return
+    print(f"Histórico local: {len(store)} tabelas em {store.path}")
+
+    for currency in currencies:
+        if start is not None or end is not None:
+            points = store.series(currency, start, end, base)
+            print(f"\n1 {base} em {currency}: {len(points)} cotações")
+            for ts, rate in points:
+                print(f"  {format_when(ts)}  {rate:.4f}")
+        else:
+            found = store.rate_at(currency, when, base)
+            if found is None:
+                print(f"Sem cotação de {base} -> {currency} no histórico até essa data.")
+            else:
+                rate, ts = found
+                print(f"1 {base} = {rate:.4f} {currency} (tabela de {format_when(ts)})")
+
+def run_segment_log(args):
+    """Divide o log de solicitações em segmentos diários comprimidos com índice por CPF"""
+    from storage.csv_storage import REQUESTS_FILE
+    from storage.log_segments import SegmentedLog
+    from storage.request_log import policy_from_env
+
+    policy = policy_from_env()
+    log = SegmentedLog(os.path.join(DATA_DIR, REQUESTS_FILE), segment_bytes=int(policy['segment_mb'] * 1024 * 1024))
+    created = log.split()
+    still_pending = log.seal_pending(force=True)
+    print(f"{created} segmentos criados; {len(log.segments())} segmentos em {log.dir}")
+    if still_pending:
+        print(f"{still_pending} segmentos continuam sem compressão.")
+
+def run_analytics(args):
+    """Agregados do log de solicitações (lê apenas as linhas novas desde o último checkpoint)"""
+    from services.request_analytics import DIMENSIONS, RequestAnalytics
+
+    try:
+        analytics = RequestAnalytics(open_storage(args.storage, DATA_DIR))
+    except ValueError as e:
+        print(e)
+        return
+    new_rows = analytics.rebuild() if args.rebuild else analytics.refresh()
+    report = analytics.report(refresh=False)
+    print(f"{new_rows} novas linhas processadas ({report['segmentos']} segmentos fechados + {report['offset']:,} bytes "
+          f"do arquivo ativo; checkpoint em {analytics.checkpoint_path})")
+    if report['invalidos']:
+        print(f"Linhas inválidas ignoradas: {report['invalidos']}")
+
+    titles = {'faixa_score': "Faixa de score", 'dia': "Dia", 'faixa_valor': "Valor solicitado"}
+    header = f"{'pedidos':>9} {'aprovados':>10} {'taxa':>7} {'média solicitada':>17} {'média atual':>12}"
+
+    def line(label, totals):
+        return (f"{label:<18}{totals['pedidos']:>9} {totals['aprovados']:>10} {totals['taxa_aprovacao']:>7.1%} "
+                f"{totals['media_solicitado']:>17,.2f} {totals['media_atual']:>12,.2f}")
+
+    for dimension in [args.por] if args.por else DIMENSIONS:
+        print(f"\n{titles[dimension]:<18}{header}")
+        for key, totals in report[dimension].items():
+            print(line(key, totals))
+    print(f"\n{'Total':<18}{header}")
+    print(line('', report['total']))
+
+def run_simulate(args):
+    """Reavalia o histórico de solicitações com tabelas score_limite candidatas (em paralelo)"""
+    from services.limit_simulation import load_table, simulate
+    from storage.score_rules import ScoreRulesError
+
+    candidates = []
+    for path in args.tabelas:
+        try:
+            candidates.append((os.path.basename(path), load_table(path)))
+        except (OSError, ScoreRulesError, KeyError, ValueError) as e:
+            print(f"Tabela {path} inválida: {e}")
+            return
+    report = simulate(candidates, spec=args.storage, data_dir=DATA_DIR, workers=args.workers,
+                      chunk_bytes=int(args.chunk_mb * 1024 * 1024))
+    print(f"{report['linhas']:,} solicitações em {report['segundos']:.2f}s com {report['processos']} processos "
+          f"(aprovadas no log: {report['aprovados_registrados']:,}; sem cliente na base: {report['sem_cliente']:,}; "
+          f"inválidas: {report['invalidos']:,})")
+
+    header = (f"{'pedidos':>9} {'aprov. atual':>13} {'aprov. nova':>12} {'-> aprov.':>10} {'-> rejeit.':>11} "
+              f"{'exposição atual':>17} {'exposição nova':>17} {'delta':>15}")
+
+    def line(label, totals):
+        return (f"{label:<14}{totals['pedidos']:>9} {totals['aprovados_atual']:>13} {totals['aprovados_novo']:>12} "
+                f"{totals['passam_a_aprovar']:>10} {totals['passam_a_rejeitar']:>11} {totals['exposicao_atual']:>17,.2f} "
+                f"{totals['exposicao_nova']:>17,.2f} {totals['delta_exposicao']:>+15,.2f}")
+
+    for name, result in report['candidatas'].items():
+        print(f"\nTabela candidata: {name}")
+        print(f"{'Faixa':<14}{header}")
+        for band, totals in result['faixas'].items():
+            print(line(band, totals))
+        print(line('Total', result['total']))
+
+def run_serve(args):
+    """Sobe a API JSON headless (asyncio) com os agentes"""
+    import asyncio
+    from services.api_server import ApiServer
+
+    server = ApiServer(open_storage(args.storage, DATA_DIR), exchange_url=args.fx_url, workers=args.workers)
+
+    def ready(srv):
+        print(f"API ouvindo em http://{args.host}:{args.port} ({args.workers} threads de I/O)")
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, ready=ready))
+    except KeyboardInterrupt:
+        print("\nEncerrando API.")
+    finally:
+        server.close()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Sistema de Agentes de Crédito")
+    parser.add_argument('--storage', default=None,
+                        help="Backend de dados: 'csv' (padrão), 'sharded' ou 'sqlite[:arquivo.db]'. Também via CREDIT_STORAGE.")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Expõe as métricas (formato Prometheus) em http://127.0.0.1:<porta>/metrics. Também via METRICS_PORT.")
+    parser.add_argument('--metrics-dump', default=None,
+                        help="Grava as métricas neste arquivo periodicamente e ao sair. Também via METRICS_DUMP.")
+    parser.add_argument('--bus-processes', type=int, default=None,
+                        help="Processos para os trabalhadores dos agentes (registro e score); 0 = threads (padrão). "
+                             "Também via EVENT_BUS_PROCESSES.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Mede os pontos de entrada dos agentes e grava um relatório da sessão. Também via CREDIT_PROFILE.")
+    parser.add_argument('--profile-cprofile', action='store_true',
+                        help="Com --profile, perfila cada intervalo com cProfile (funções com maior tempo próprio)")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="Com --profile, mede o pico de memória de cada intervalo com tracemalloc")
+    parser.add_argument('--profile-dir', default=None,
+                        help="Diretório dos relatórios de perfil (padrão: perfis/). Também via CREDIT_PROFILE_DIR.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    bulk = subparsers.add_parser('bulk', help="Decide em lote um CSV de solicitações de aumento de limite")
+    bulk.add_argument('entrada', help="CSV com colunas cpf e novo_limite_solicitado")
+    bulk.add_argument('saida', help="CSV de saída no formato de solicitacoes_aumento_limite.csv")
+    bulk.add_argument('--chunk-size', type=int, default=50000, help="Linhas por bloco (padrão: 50000)")
+    bulk.add_argument('-v', '--verbose', action='store_true', help="Mostra o progresso a cada bloco")
+    bulk.set_defaults(func=run_bulk)
+
+    rescore = subparsers.add_parser('rescore', help="Recalcula em lote os scores a partir das respostas da entrevista")
+    rescore.add_argument('entrada', help="CSV com colunas cpf, renda, tipo_emprego, despesas, dependentes e dividas")
+    rescore.add_argument('saida', help="CSV de saída com cpf, score_anterior e score_novo")
+    rescore.add_argument('--aplicar', action='store_true', help="Grava na base os scores que mudaram")
+    rescore.add_argument('--chunk-size', type=int, default=50000, help="Linhas por bloco (padrão: 50000)")
+    rescore.add_argument('-v', '--verbose', action='store_true', help="Mostra o progresso a cada bloco")
+    rescore.set_defaults(func=run_rescore)
+
+    migrate = subparsers.add_parser('migrate', help="Migra os CSVs de data/ para um banco SQLite (modo WAL)")
+    migrate.add_argument('--db', help="Arquivo do banco (padrão: data/credito.db)")
+    migrate.set_defaults(func=run_migrate)
+
+    reshard = subparsers.add_parser('reshard', help="Particiona clientes.csv (ou os shards atuais) em N arquivos por CPF")
+    reshard.add_argument('--shards', type=int, default=16, help="Número de shards (padrão: 16)")
+    reshard.add_argument('--dir', help="Diretório dos shards (padrão: data/clientes_shards)")
+    reshard.set_defaults(func=run_reshard)
+
+    index = subparsers.add_parser('index', help="Cria o índice de offsets por CPF de clientes.csv (partida sem carregar a base)")
+    index.set_defaults(func=run_index)
+
+    fx_history = subparsers.add_parser('fx-history', help="Cotações do histórico local de câmbio, sem acesso à rede")
+    fx_history.add_argument('moedas', help="Moedas separadas por vírgula (ex: BRL,EUR)")
+    fx_history.add_argument('--base', default='USD', help="Moeda base (padrão: USD)")
+    fx_history.add_argument('--at', help="Cotação vigente nesta data (padrão: agora)")
+    fx_history.add_argument('--from', dest='start', help="Início da série (AAAA-MM-DD ou DD/MM/AAAA)")
+    fx_history.add_argument('--to', dest='end', help="Fim da série (inclusivo)")
+    fx_history.set_defaults(func=run_fx_history)
+
+    segment_log = subparsers.add_parser('segment-log', help="Divide o log de solicitações em segmentos diários (gzip + índice por CPF)")
+    segment_log.set_defaults(func=run_segment_log)
+
+    analytics = subparsers.add_parser('analytics', help="Taxa de aprovação e valores por faixa de score, dia e valor solicitado")
+    analytics.add_argument('--por', choices=['faixa_score', 'dia', 'faixa_valor'], help="Mostra só esta dimensão")
+    analytics.add_argument('--rebuild', action='store_true', help="Descarta o checkpoint e reprocessa o log inteiro")
+    analytics.set_defaults(func=run_analytics)
+
+    simulate = subparsers.add_parser('simulate', help="Reavalia o histórico de solicitações com tabelas score_limite candidatas")
+    simulate.add_argument('tabelas', nargs='+', help="CSVs no formato de score_limite.csv (min_score,max_score,max_limite)")
+    simulate.add_argument('--workers', type=int, default=None, help="Processos do pool (padrão: nº de CPUs; 1 = sem pool)")
+    simulate.add_argument('--chunk-mb', type=float, default=8, help="Tamanho dos blocos do log ativo em MB (padrão: 8)")
+    simulate.set_defaults(func=run_simulate)
+
+    serve = subparsers.add_parser('serve', help="Sobe a API JSON (autenticação, limite, entrevista e câmbio)")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('--workers', type=int, default=16, help="Threads para I/O de arquivos/banco (padrão: 16)")
+    serve.add_argument('--fx-url', default=None, help="URL da API de câmbio (padrão: open.er-api.com)")
+    serve.set_defaults(func=run_serve)
+
+    parser.set_defaults(func=run_interactive)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from services import metrics
+    metrics.start_from_env(port=args.metrics_port, dump_path=args.metrics_dump)
+    from services import profiling
+    if args.profile or args.profile_cprofile or args.profile_memory:
+        profiling.configure(cprofile=args.profile_cprofile, memory=args.profile_memory, out_dir=args.profile_dir)
+    else:
+        profiling.configure_from_env()
+    profiler = profiling.start_session(args.command or 'interativo') if profiling.enabled() else None
+    try:
+        args.func(args)
+    finally:
+        if profiler is not None:
+            print(f"Relatório de perfil gravado em {profiler.write()}")
 
 if __name__ == "__main__":
     main()
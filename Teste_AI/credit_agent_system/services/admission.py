@@ -0,0 +1,192 @@
+"""
+Controle de admissão na frente da autenticação (CPF + data de nascimento).
+
+Cada tentativa precisa de uma ficha no balde do CPF e no balde global
+(token bucket: as fichas se recompõem continuamente até o limite de
+rajada) e de uma vaga entre as consultas em andamento. Sem ficha ou sem
+vaga, a tentativa é recusada com `Throttled` antes de tocar no
+armazenamento. Uma autenticação bem-sucedida devolve o balde do CPF ao
+estado inicial, então o limite por CPF na prática conta as falhas.
+
+Os baldes por CPF ficam em um dict (CPF -> (fichas, instante)) em ordem
+de uso; um balde que já teria se recomposto por completo equivale a não
+existir e é descartado na varredura periódica, e acima de `max_keys` os
+menos recentes são removidos.
+"""
+
+import os
+import threading
+import time
+
+from services import metrics
+
+
+class Throttled(Exception):
+    """Tentativa recusada pelo controle de admissão (`motivo`: 'cpf', 'global' ou 'concorrencia')."""
+
+    def __init__(self, reason, retry_after):
+        messages = {
+            'cpf': "Muitas tentativas para este CPF.",
+            'global': "Muitas tentativas de acesso no momento.",
+            'concorrencia': "Sistema ocupado.",
+        }
+        super().__init__(f"{messages[reason]} Tente novamente em {max(1, round(retry_after))} s.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """Baldes de fichas por chave, com recomposição preguiçosa e expiração (não thread-safe)."""
+
+    def __init__(self, rate, burst, max_keys=100000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        # Tempo para um balde vazio voltar a ficar cheio: depois disso ele pode ser descartado
+        self.idle_ttl = burst / rate
+        self._buckets = {}
+        self._ops = 0
+
+    def _tokens(self, key, now):
+        entry = self._buckets.pop(key, None)
+        if entry is None:
+            return self.burst
+        tokens, stamp = entry
+        return min(self.burst, tokens + (now - stamp) * self.rate)
+
+    def take(self, key):
+        """Consome uma ficha. Retorna 0 se havia ficha, senão os segundos até a próxima."""
+        now = self.clock()
+        tokens = self._tokens(key, now)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / self.rate
+        # Reinserção: o dict fica ordenado do uso mais antigo ao mais recente
+        self._buckets[key] = (tokens, now)
+        self._ops += 1
+        if self._ops >= 1024 or len(self._buckets) > self.max_keys:
+            self._sweep(now)
+        return wait
+
+    def give_back(self, key):
+        """Devolve a ficha consumida por `take` (tentativa que não chegou a ser feita)."""
+        entry = self._buckets.get(key)
+        if entry is not None:
+            self._buckets[key] = (min(self.burst, entry[0] + 1), entry[1])
+
+    def reset(self, key):
+        self._buckets.pop(key, None)
+
+    def _sweep(self, now):
+        self._ops = 0
+        expired = [key for key, (_, stamp) in self._buckets.items() if now - stamp >= self.idle_ttl]
+        for key in expired:
+            del self._buckets[key]
+        excess = len(self._buckets) - self.max_keys
+        if excess > 0:
+            for key in list(self._buckets)[:excess]:
+                del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class _Ticket:
+    """Vaga de uma tentativa admitida; libera a concorrência ao sair do bloco `with`."""
+
+    def __init__(self, controller, cpf):
+        self._controller = controller
+        self.cpf = cpf
+        self.succeeded = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._controller._release(self.cpf, self.succeeded)
+        return False
+
+
+class AdmissionController:
+    """
+    Baldes por CPF e global, mais um teto de consultas simultâneas (thread-safe).
+
+        with admission.admit(cpf) as ticket:      # Throttled se recusada
+            user = storage.authenticate(cpf, dob)
+            ticket.succeeded = user is not None
+    """
+
+    def __init__(self, cpf_attempts=5, cpf_window=300.0, global_rate=50.0, global_burst=100,
+                 max_inflight=32, max_keys=100000, clock=time.monotonic):
+        # Limite zerado desliga o respectivo balde
+        self.per_cpf = TokenBuckets(cpf_attempts / cpf_window, cpf_attempts, max_keys, clock) if cpf_attempts > 0 else None
+        self.global_bucket = TokenBuckets(global_rate, global_burst, 1, clock) if global_rate > 0 else None
+        self.max_inflight = max_inflight
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    def _refuse(self, reason, retry_after):
+        metrics.AUTH_THROTTLED.labels(reason).inc()
+        raise Throttled(reason, retry_after)
+
+    def admit(self, cpf):
+        """Reserva a tentativa do CPF. Retorna um ticket para usar com `with`; lança Throttled se recusada."""
+        cpf = cpf.strip()
+        with self._lock:
+            if self.max_inflight and self._inflight >= self.max_inflight:
+                self._refuse('concorrencia', 1.0)
+            if self.per_cpf is not None:
+                wait = self.per_cpf.take(cpf)
+                if wait:
+                    self._refuse('cpf', wait)
+            if self.global_bucket is not None:
+                wait = self.global_bucket.take('')
+                if wait:
+                    # Recusada pelo limite global: a ficha do CPF não conta contra ele
+                    if self.per_cpf is not None:
+                        self.per_cpf.give_back(cpf)
+                    self._refuse('global', wait)
+            self._inflight += 1
+            metrics.AUTH_INFLIGHT.set(self._inflight)
+            if self.per_cpf is not None:
+                metrics.AUTH_BUCKETS.set(len(self.per_cpf))
+        return _Ticket(self, cpf)
+
+    def _release(self, cpf, succeeded):
+        with self._lock:
+            self._inflight -= 1
+            metrics.AUTH_INFLIGHT.set(self._inflight)
+            if succeeded and self.per_cpf is not None:
+                self.per_cpf.reset(cpf)
+
+
+def limits_from_env():
+    """
+    Limites configuráveis pelas variáveis AUTH_CPF_ATTEMPTS e AUTH_CPF_WINDOW
+    (tentativas por CPF na janela, em segundos), AUTH_GLOBAL_RATE e
+    AUTH_GLOBAL_BURST (tentativas/s e rajada no total) e AUTH_MAX_INFLIGHT
+    (consultas simultâneas). Um limite 0 desliga o respectivo controle.
+    """
+    return {
+        'cpf_attempts': int(os.environ.get('AUTH_CPF_ATTEMPTS', 5)),
+        'cpf_window': float(os.environ.get('AUTH_CPF_WINDOW', 300)),
+        'global_rate': float(os.environ.get('AUTH_GLOBAL_RATE', 50)),
+        'global_burst': int(os.environ.get('AUTH_GLOBAL_BURST', 100)),
+        'max_inflight': int(os.environ.get('AUTH_MAX_INFLIGHT', 32)),
+    }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission():
+    """Controle de admissão compartilhado pelo processo (CLI, API e sessões do Streamlit)."""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(**limits_from_env())
+        return _controller
@@ -0,0 +1,290 @@
+"""
+API JSON headless (asyncio) para os agentes de triagem, limite, entrevista e câmbio.
+
+Rotas:
+    POST /auth                      {"cpf", "data_nascimento"} -> {"token", "nome"}
+    GET  /limite                    (Authorization: Bearer <token>)
+    POST /limite/solicitacoes       {"novo_limite"}
+    POST /entrevista                {"renda", "tipo_emprego", "despesas", "dependentes", "dividas"}
+    GET  /cambio/<moeda>            (base USD)
+    GET  /cambio/<base>/<moeda>
+    GET  /health
+    GET  /metrics                   (texto no formato Prometheus)
+
+A lógica de decisão é a dos próprios agentes (métodos sem input/print); todo
+acesso a arquivo/banco roda em um pool de threads limitado, de modo que uma
+reescrita lenta não trava o loop de eventos nem as demais requisições.
+As cotações são buscadas no próprio loop (AsyncFxClient, conexões
+keep-alive), sem ocupar o pool.
+"""
+
+import asyncio
+import json
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from agents.credit_limit_agent import CreditLimitAgent
+from agents.exchange_agent import ExchangeAgent
+from agents.interview_agent import InterviewAgent
+from agents.triage_agent import TriageAgent
+from services import metrics
+from services.admission import Throttled
+from services.cpf_check import normalize_cpf
+from services.fx_client import AsyncFxClient
+from services.rate_cache import DEFAULT_API_URL
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class SessionStore:
+    """Tokens de sessão em memória (token -> cpf) com expiração."""
+
+    def __init__(self, ttl=1800):
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, cpf):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._sessions[token] = (cpf, time.monotonic() + self.ttl)
+        return token
+
+    def resolve(self, token):
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None:
+                return None
+            cpf, expires_at = entry
+            if time.monotonic() > expires_at:
+                del self._sessions[token]
+                return None
+            return cpf
+
+
+class ApiServer:
+    def __init__(self, storage, exchange_url=None, workers=16, max_pending=None, session_ttl=1800):
+        self.storage = storage
+        self.triage = TriageAgent(storage)
+        self.limit = CreditLimitAgent(storage)
+        self.interview = InterviewAgent(storage)
+        # Uma instância por loop: as conexões são abertas no loop de `serve`
+        self.fx = AsyncFxClient(exchange_url or DEFAULT_API_URL, data_dir=storage.data_dir)
+        self.sessions = SessionStore(session_ttl)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-io")
+        # Limita trabalhos aguardando o pool: acima disso as conexões esperam (backpressure)
+        self._slots = asyncio.Semaphore(max_pending or workers * 4)
+        self.routes = {
+            ('POST', '/auth'): self.handle_auth,
+            ('GET', '/limite'): self.handle_limit,
+            ('POST', '/limite/solicitacoes'): self.handle_limit_request,
+            ('POST', '/entrevista'): self.handle_interview,
+            ('GET', '/health'): self.handle_health,
+            ('GET', '/metrics'): self.handle_metrics,
+        }
+
+    async def run_blocking(self, func, *args):
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    # --- Handlers ---
+
+    def _session_cpf(self, headers):
+        auth = headers.get('authorization', '')
+        scheme, _, token = auth.partition(' ')
+        cpf = self.sessions.resolve(token.strip()) if scheme.lower() == 'bearer' else None
+        if cpf is None:
+            raise ApiError(HTTPStatus.UNAUTHORIZED, "Sessão inválida ou expirada. Autentique-se em /auth.")
+        return cpf
+
+    @staticmethod
+    def _field(body, name):
+        if name not in body:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Campo obrigatório ausente: {name}")
+        return body[name]
+
+    async def handle_health(self, headers, body):
+        return HTTPStatus.OK, {'status': 'ok'}
+
+    async def handle_metrics(self, headers, body):
+        return HTTPStatus.OK, metrics.render()
+
+    async def handle_auth(self, headers, body):
+        cpf = normalize_cpf(self._field(body, 'cpf'))
+        dob = str(self._field(body, 'data_nascimento')).strip()
+        # Admissão no próprio loop: uma tentativa recusada não ocupa vaga no pool de I/O
+        try:
+            ticket = self.triage.admission.admit(cpf)
+        except Throttled as e:
+            raise ApiError(HTTPStatus.TOO_MANY_REQUESTS, str(e))
+        with ticket:
+            user = await self.run_blocking(self.triage.check_user, cpf, dob)
+            ticket.succeeded = user is not None
+        if not user:
+            raise ApiError(HTTPStatus.UNAUTHORIZED, "Dados incorretos. Verifique o CPF e a data de nascimento.")
+        return HTTPStatus.OK, {'token': self.sessions.create(user['cpf']), 'nome': user['nome']}
+
+    async def handle_limit(self, headers, body):
+        cpf = self._session_cpf(headers)
+        summary = await self.run_blocking(self.limit.limit_summary, cpf)
+        if summary is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Cliente não encontrado.")
+        return HTTPStatus.OK, summary
+
+    async def handle_limit_request(self, headers, body):
+        cpf = self._session_cpf(headers)
+        try:
+            requested = float(str(self._field(body, 'novo_limite')).replace(',', '.'))
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Valor inválido para novo_limite.")
+        decision = await self.run_blocking(self.limit.decide, cpf, requested)
+        if decision is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Cliente não encontrado.")
+        return HTTPStatus.OK, decision
+
+    async def handle_interview(self, headers, body):
+        cpf = self._session_cpf(headers)
+        try:
+            data = self.interview.normalize_answers({
+                'income': self._field(body, 'renda'),
+                'job_type': self._field(body, 'tipo_emprego'),
+                'expenses': self._field(body, 'despesas'),
+                'dependents': self._field(body, 'dependentes'),
+                'has_debts': self._field(body, 'dividas'),
+            })
+        except ValueError as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, str(e))
+        score, updated = await self.run_blocking(self.interview.submit, cpf, data)
+        if not updated:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Cliente não encontrado.")
+        return HTTPStatus.OK, {'score': score, 'atualizado': True}
+
+    async def handle_rate(self, pair):
+        base, _, currency = pair.upper().rpartition('/')
+        base = base or self.fx.default_base
+        for code in (base, currency):
+            # O código vai para a URL da API: só letras
+            if not (code.isascii() and code.isalpha()):
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"Código de moeda inválido: '{code}'.")
+        try:
+            with metrics.RATE_SECONDS.time():
+                table = await self.fx.table(base)
+        except ConnectionError as e:
+            raise ApiError(HTTPStatus.BAD_GATEWAY, f"Serviço de cotação indisponível: {e}")
+        except ValueError as e:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Base '{base}' não disponível: {e}")
+        rate = table.get('rates', {}).get(currency)
+        if rate is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Moeda '{currency}' não encontrada.")
+        return HTTPStatus.OK, {'base': base, 'moeda': currency, 'cotacao': rate,
+                               'atualizado_em': ExchangeAgent.updated_at(table)}
+
+    async def dispatch(self, method, path, headers, body):
+        path = path.split('?', 1)[0].rstrip('/') or '/'
+        if path.startswith('/cambio/') and method == 'GET' and path.count('/') <= 3:
+            return await self.handle_rate(path[len('/cambio/'):])
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(p == path for _, p in self.routes):
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, "Método não permitido.")
+            raise ApiError(HTTPStatus.NOT_FOUND, "Rota não encontrada.")
+        return await handler(headers, body)
+
+    # --- HTTP/1.1 ---
+
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        if len(head) > MAX_HEADER_BYTES:
+            raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Cabeçalho muito grande.")
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ', 2)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Linha de requisição inválida.")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        length = headers.get('content-length') or '0'
+        # Só dígitos: int() também aceitaria '+5' e '1_0', e um valor negativo quebraria o readexactly
+        if not (length.isascii() and length.isdigit()):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Content-Length inválido.")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo da requisição muito grande.")
+        raw = await reader.readexactly(length) if length else b''
+        body = {}
+        if raw:
+            try:
+                body = json.loads(raw.decode('utf-8'))
+            except ValueError:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "JSON inválido.")
+            if not isinstance(body, dict):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "O corpo deve ser um objeto JSON.")
+
+        keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+        return method.upper(), target, headers, body, keep_alive
+
+    @staticmethod
+    def _response(status, payload, keep_alive):
+        # Texto puro (ex: /metrics) vai como text/plain; o resto como JSON
+        if isinstance(payload, str):
+            data, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            data, content_type = json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8'
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode('latin-1') + data
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    method, target, headers, body, keep_alive = await self._read_request(reader)
+                    status, payload = await self.dispatch(method, target, headers, body)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    status, payload = HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, {'erro': "Cabeçalho muito grande."}
+                except ApiError as e:
+                    status, payload = e.status, {'erro': e.message}
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'erro': f"Erro interno: {e}"}
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080, ready=None):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.fx.aclose()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.storage.close()
@@ -0,0 +1,103 @@
+import csv
+import time
+from datetime import datetime
+
+from storage.request_log import FIELDNAMES
+
+CPF_COLUMNS = ('cpf', 'cpf_cliente')
+LIMIT_COLUMNS = ('novo_limite_solicitado', 'limite_solicitado', 'requested_limit')
+
+
+def _columns(header):
+    """Descobre as posições de CPF e limite solicitado no cabeçalho do arquivo."""
+    names = [name.strip().lower() for name in header]
+    try:
+        cpf_col = next(names.index(c) for c in CPF_COLUMNS if c in names)
+        limit_col = next(names.index(c) for c in LIMIT_COLUMNS if c in names)
+    except StopIteration:
+        raise ValueError(
+            f"Cabeçalho inválido: esperado uma coluna de CPF {CPF_COLUMNS} "
+            f"e uma de limite {LIMIT_COLUMNS}."
+        )
+    return cpf_col, limit_col
+
+
+def _chunks(reader, size):
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def decide_file(input_path, output_path, storage, chunk_size=50000, progress=None):
+    """
+    Processa em lote um CSV de solicitações (cpf, novo limite).
+
+    O arquivo é lido em blocos de `chunk_size` linhas; para cada bloco os
+    clientes são buscados de uma vez com `storage.get_clients`, as faixas de
+    score_limite são resolvidas com `storage.max_limits` e as decisões são
+    gravadas no formato de solicitacoes_aumento_limite.csv. A memória usada
+    depende apenas do tamanho do bloco, não do arquivo.
+
+    Retorna um dict com as contagens e a vazão (linhas/s).
+    """
+    stats = {'linhas': 0, 'aprovados': 0, 'rejeitados': 0, 'nao_encontrados': 0, 'invalidos': 0}
+    start = time.perf_counter()
+
+    with open(input_path, mode='r', encoding='utf-8', newline='') as src, \
+            open(output_path, mode='w', encoding='utf-8', newline='') as dst:
+        reader = csv.reader(src)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("Arquivo de entrada vazio.")
+        cpf_col, limit_col = _columns(header)
+
+        writer = csv.writer(dst)
+        writer.writerow(FIELDNAMES)
+
+        for chunk in _chunks(reader, chunk_size):
+            stats['linhas'] += len(chunk)
+            cpfs = []
+            requested = []
+            for row in chunk:
+                try:
+                    asked = float(row[limit_col].replace(',', '.'))
+                    cpf = row[cpf_col].strip()
+                except (IndexError, ValueError):
+                    stats['invalidos'] += 1
+                    continue
+                # As duas listas só crescem juntas: a posição i é sempre a mesma linha
+                requested.append(asked)
+                cpfs.append(cpf)
+
+            clients = storage.get_clients(cpfs)
+            found = [i for i, client in enumerate(clients) if client is not None]
+            stats['nao_encontrados'] += len(cpfs) - len(found)
+
+            scores = [float(clients[i].get('score') or 0) for i in found]
+            max_allowed = storage.max_limits(scores)
+            now = datetime.now().isoformat()
+
+            rows = []
+            for pos, i in enumerate(found):
+                asked = requested[i]
+                if asked <= max_allowed[pos]:
+                    status = 'aprovado'
+                    stats['aprovados'] += 1
+                else:
+                    status = 'rejeitado'
+                    stats['rejeitados'] += 1
+                rows.append((cpfs[i], now, float(clients[i].get('limite_atual') or 0), asked, status))
+            writer.writerows(rows)
+
+            if progress is not None:
+                progress(stats, time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - start
+    stats['segundos'] = elapsed
+    stats['linhas_por_segundo'] = stats['linhas'] / elapsed if elapsed > 0 else 0.0
+    return stats
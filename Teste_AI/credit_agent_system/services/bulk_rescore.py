@@ -0,0 +1,84 @@
+import csv
+import time
+
+from agents.interview_agent import InterviewAgent
+from services import scoring
+from services.bulk_decision import _chunks
+
+ANSWER_COLUMNS = ('cpf', 'renda', 'tipo_emprego', 'despesas', 'dependentes', 'dividas')
+OUTPUT_FIELDS = ('cpf', 'score_anterior', 'score_novo')
+
+
+def rescore_file(input_path, output_path, storage, apply=False, chunk_size=50000, progress=None):
+    """
+    Recalcula em lote o score da carteira a partir das respostas da entrevista.
+
+    O CSV de entrada tem as colunas de ANSWER_COLUMNS (mesmos valores aceitos
+    pela API em /entrevista). Cada bloco de `chunk_size` linhas é validado,
+    os clientes são buscados de uma vez com `storage.get_clients` e os scores
+    saem de uma única chamada a `scoring.calculate_scores` (vetorizada com
+    NumPy). A saída lista cpf, score anterior e score novo; com `apply=True`
+    os scores que mudaram também são gravados na base.
+
+    Retorna um dict com as contagens e a vazão (linhas/s).
+    """
+    stats = {'linhas': 0, 'alterados': 0, 'gravados': 0, 'nao_encontrados': 0, 'invalidos': 0}
+    start = time.perf_counter()
+
+    with open(input_path, mode='r', encoding='utf-8', newline='') as src, \
+            open(output_path, mode='w', encoding='utf-8', newline='') as dst:
+        reader = csv.DictReader(src)
+        missing = [c for c in ANSWER_COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Cabeçalho inválido: colunas ausentes {missing}.")
+
+        writer = csv.writer(dst)
+        writer.writerow(OUTPUT_FIELDS)
+
+        for chunk in _chunks(reader, chunk_size):
+            stats['linhas'] += len(chunk)
+            cpfs = []
+            answers = []
+            for row in chunk:
+                try:
+                    data = InterviewAgent.normalize_answers({
+                        'income': row['renda'], 'job_type': row['tipo_emprego'], 'expenses': row['despesas'],
+                        'dependents': row['dependentes'], 'has_debts': row['dividas'],
+                    })
+                    cpf = row['cpf'].strip()
+                except (AttributeError, ValueError):
+                    stats['invalidos'] += 1
+                    continue
+                cpfs.append(cpf)
+                answers.append(data)
+
+            clients = storage.get_clients(cpfs)
+            found = [i for i, client in enumerate(clients) if client is not None]
+            stats['nao_encontrados'] += len(cpfs) - len(found)
+
+            scores = scoring.calculate_scores(
+                [answers[i]['income'] for i in found],
+                [answers[i]['expenses'] for i in found],
+                [answers[i]['job_type'] for i in found],
+                [answers[i]['dependents'] for i in found],
+                [answers[i]['has_debts'] for i in found],
+            )
+
+            rows = []
+            for i, score in zip(found, scores):
+                score = int(score)
+                previous = int(float(clients[i].get('score') or 0))
+                if score != previous:
+                    stats['alterados'] += 1
+                    if apply and storage.update_score(cpfs[i], score):
+                        stats['gravados'] += 1
+                rows.append((cpfs[i], previous, score))
+            writer.writerows(rows)
+
+            if progress is not None:
+                progress(stats, time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - start
+    stats['segundos'] = elapsed
+    stats['linhas_por_segundo'] = stats['linhas'] / elapsed if elapsed > 0 else 0.0
+    return stats
@@ -0,0 +1,311 @@
+"""
+Pré-checagem do CPF antes da consulta ao armazenamento.
+
+O CPF digitado é normalizado (pontos, traço e espaços removidos) e passa
+por duas verificações que não tocam no armazenamento:
+
+- dígitos verificadores: os dois últimos dígitos conferidos pelo algoritmo
+  oficial (módulo 11). No modo 'auto' (padrão) a verificação só recusa
+  tentativas se todos os CPFs da base forem válidos; bases fictícias, como
+  data/clientes.csv e as geradas pelos benchmarks, continuam aceitas;
+- filtro de Bloom com os CPFs da base: um CPF ausente do filtro certamente
+  não existe e é recusado em O(1). O filtro é refeito em segundo plano
+  quando a base muda (`Storage.clients_version`); enquanto a versão montada
+  estiver desatualizada, ele não recusa nada.
+
+Um CPF que passa pelo filtro mas não existe na base é um falso positivo. A
+taxa observada (falsos positivos sobre os CPFs inexistentes consultados) e
+a estimada pela ocupação dos bits são exportadas nas métricas.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from array import array
+from math import ceil, log
+
+from services import metrics
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele o filtro é montado CPF a CPF
+    np = None
+
+CPF_DIGITS = 11
+CHECK_DIGITS_MODES = ('auto', 'bloquear', 'desligado')
+CHUNK_KEYS = 65536
+
+_NON_DIGITS = re.compile(r'\D')
+_MASK = (1 << 64) - 1
+_SECOND_SEED = 0xD6E8FEB86659FD93
+# Chaves de CPFs fora do padrão ficam acima de qualquer CPF numérico de 11 dígitos
+_IRREGULAR_BIT = 1 << 63
+
+
+def normalize_cpf(text):
+    """CPF só com os dígitos ('123.456.789-09' -> '12345678909')."""
+    return _NON_DIGITS.sub('', str(text))
+
+
+def valid_cpf(cpf):
+    """True se o CPF tem 11 dígitos, não todos iguais, e os dois dígitos verificadores conferem."""
+    if len(cpf) != CPF_DIGITS or not cpf.isdigit() or cpf == cpf[0] * CPF_DIGITS:
+        return False
+    digits = [int(ch) for ch in cpf]
+    for position in (9, 10):
+        total = sum(digit * weight for digit, weight in zip(digits, range(position + 1, 1, -1)))
+        if total * 10 % 11 % 10 != digits[position]:
+            return False
+    return True
+
+
+def _filter_key(cpf):
+    # CPF de 11 dígitos é a própria chave; os demais viram um hash com o bit alto ligado
+    if len(cpf) == CPF_DIGITS and cpf.isdigit():
+        return int(cpf)
+    digest = hashlib.blake2b(cpf.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') | _IRREGULAR_BIT
+
+
+def _splitmix64(x):
+    z = (x + 0x9E3779B97F4A7C15) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+def _splitmix64_np(x):
+    # Mesma função sobre uint64: as operações do NumPy já são módulo 2^64
+    z = x + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _invalid_count_np(keys):
+    """CPFs numéricos de 11 dígitos (uint64) com dígitos verificadores errados ou todos iguais."""
+    values = keys.astype(np.int64)
+    digits = np.stack([values // 10 ** (CPF_DIGITS - 1 - i) % 10 for i in range(CPF_DIGITS)], axis=1)
+    first = (digits[:, :9] @ np.arange(10, 1, -1)) * 10 % 11 % 10
+    second = (digits[:, :10] @ np.arange(11, 1, -1)) * 10 % 11 % 10
+    repeated = (digits == digits[:, :1]).all(axis=1)
+    return int(np.count_nonzero((first != digits[:, 9]) | (second != digits[:, 10]) | repeated))
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre chaves inteiras de 64 bits.
+
+    As `hashes` posições de cada chave vêm de hash duplo (h1 + i*h2) sobre o
+    splitmix64 da chave; o tamanho e a quantidade de hashes são os ótimos
+    para `capacity` chaves com a taxa de falso positivo `fp_rate`.
+    """
+
+    def __init__(self, capacity, fp_rate=0.01):
+        capacity = max(1, capacity)
+        bits = ceil(-capacity * log(fp_rate) / log(2) ** 2)
+        self.size = max(64, (bits + 63) // 64 * 64)
+        self.hashes = max(1, round(self.size / capacity * log(2)))
+        self.bits = bytearray(self.size // 8)
+
+    def _positions(self, key):
+        h1 = _splitmix64(key)
+        h2 = _splitmix64(key ^ _SECOND_SEED) | 1
+        for i in range(self.hashes):
+            yield ((h1 + i * h2) & _MASK) % self.size
+
+    def add(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def add_many(self, keys):
+        """Insere uma sequência de chaves (array('Q'), lista...), vetorizado quando há NumPy."""
+        if np is None:
+            for key in keys:
+                self.add(key)
+            return
+        keys = np.asarray(keys, dtype=np.uint64)
+        marks = np.unpackbits(np.frombuffer(bytes(self.bits), dtype=np.uint8), bitorder='little').astype(bool)
+        size = np.uint64(self.size)
+        for start in range(0, len(keys), CHUNK_KEYS):
+            chunk = keys[start:start + CHUNK_KEYS]
+            h1 = _splitmix64_np(chunk)
+            h2 = _splitmix64_np(chunk ^ np.uint64(_SECOND_SEED)) | np.uint64(1)
+            for i in range(self.hashes):
+                marks[(h1 + np.uint64(i) * h2) % size] = True
+        self.bits = bytearray(np.packbits(marks, bitorder='little').tobytes())
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] >> (position & 7) & 1:
+                return False
+        return True
+
+    def expected_fp_rate(self):
+        """Taxa de falso positivo esperada pela fração de bits ligados."""
+        ones = int.from_bytes(self.bits, 'little').bit_count()
+        return (ones / self.size) ** self.hashes
+
+
+def _collect_keys(clients):
+    """Chaves do filtro para os CPFs da base e quantos deles não são CPFs válidos."""
+    keys = array('Q')
+    numeric = array('Q')
+    irregular = 0
+    for row in clients:
+        cpf = row['cpf'].strip()
+        key = _filter_key(cpf)
+        keys.append(key)
+        if key & _IRREGULAR_BIT:
+            irregular += 1
+        elif np is not None:
+            numeric.append(key)
+        elif not valid_cpf(cpf):
+            irregular += 1
+    if np is not None and numeric:
+        values = np.frombuffer(numeric, dtype=np.uint64)
+        for start in range(0, len(values), CHUNK_KEYS):
+            irregular += _invalid_count_np(values[start:start + CHUNK_KEYS])
+    return keys, irregular
+
+
+class CpfPrecheck:
+    """
+    Pré-checagem dos CPFs consultados em um armazenamento (thread-safe).
+
+        client = precheck.get_client(cpf, storage.get_client)   # None se recusado
+
+    `check_digits`: 'auto' (recusa dígitos verificadores errados só se a base
+    não tiver CPFs inválidos), 'bloquear' ou 'desligado'. `fp_rate` é a taxa
+    de falso positivo alvo do filtro de Bloom; 0 desliga o filtro.
+    """
+
+    def __init__(self, storage, check_digits='auto', fp_rate=0.01, check_interval=2.0, clock=time.monotonic):
+        if check_digits not in CHECK_DIGITS_MODES:
+            raise ValueError(f"Modo de verificação de dígitos desconhecido: {check_digits}")
+        self.storage = storage
+        self.check_digits = check_digits
+        self.fp_rate = fp_rate
+        self.check_interval = check_interval
+        self.clock = clock
+        # (filtro, versão da base, CPFs inválidos na base): trocado por inteiro a cada reconstrução
+        self._built = None
+        self._fresh = False
+        self._checked = None
+        self._builder = None
+        self._lock = threading.Lock()
+        self._negatives = 0
+        self._false_positives = 0
+
+    def refresh(self, wait=False):
+        """Confere a versão da base e, se mudou, refaz o filtro em segundo plano (ou aguarda, com `wait`)."""
+        if not self.fp_rate and self.check_digits != 'auto':
+            return  # nada depende da base
+        version = self.storage.clients_version()
+        with self._lock:
+            built = self._built
+            self._fresh = built is not None and built[1] == version
+            if self._fresh:
+                return
+            builder = self._builder
+            if builder is None:
+                builder = self._builder = threading.Thread(target=self._rebuild, args=(version,),
+                                                           name='cpf-filtro', daemon=True)
+                builder.start()
+        if wait:
+            builder.join()
+
+    def _rebuild(self, version):
+        try:
+            started = time.perf_counter()
+            keys, irregular = _collect_keys(self.storage.iter_clients())
+            bloom = None
+            if self.fp_rate:
+                bloom = BloomFilter(len(keys), self.fp_rate)
+                bloom.add_many(keys)
+                metrics.CPF_FILTER_EXPECTED_FP.set(bloom.expected_fp_rate())
+            metrics.CPF_BASE_INVALID.set(irregular)
+            metrics.CPF_FILTER_BUILD_SECONDS.observe(time.perf_counter() - started)
+            # A base pode ter mudado durante a montagem: nesse caso o filtro entra desatualizado
+            current = self.storage.clients_version()
+            with self._lock:
+                self._built = (bloom, version, irregular)
+                self._fresh = current == version
+        except Exception:
+            metrics.ERRORS.labels('cpf_filtro').inc()
+        finally:
+            with self._lock:
+                self._builder = None
+
+    def _screen(self, cpf):
+        now = self.clock()
+        if self._checked is None or now - self._checked >= self.check_interval:
+            self._checked = now
+            self.refresh()
+        built, fresh = self._built, self._fresh
+        enforce = self.check_digits == 'bloquear' or (
+            self.check_digits == 'auto' and built is not None and built[2] == 0)
+        if enforce and not valid_cpf(cpf):
+            return ('formato' if len(cpf) != CPF_DIGITS else 'digito'), False
+        if fresh and built[0] is not None:
+            if _filter_key(cpf) not in built[0]:
+                return 'desconhecido', True
+            return None, True
+        return None, False
+
+    def rejection(self, cpf):
+        """Motivo da recusa do CPF normalizado ('formato', 'digito', 'desconhecido') ou None."""
+        return self._screen(cpf)[0]
+
+    def get_client(self, cpf, fetch):
+        """Normaliza e pré-checa o CPF; se aceito, retorna `fetch(cpf)`, senão None sem chamar `fetch`."""
+        cpf = normalize_cpf(cpf)
+        reason, screened = self._screen(cpf)
+        if reason is not None:
+            metrics.CPF_PRECHECK.labels(reason).inc()
+            if screened:
+                self._count(false_positive=False)
+            return None
+        metrics.CPF_PRECHECK.labels('aceito').inc()
+        client = fetch(cpf)
+        if screened and client is None:
+            self._count(false_positive=True)
+        return client
+
+    def _count(self, false_positive):
+        with self._lock:
+            if false_positive:
+                self._false_positives += 1
+            else:
+                self._negatives += 1
+            rate = self._false_positives / (self._false_positives + self._negatives)
+        metrics.CPF_FILTER_FP_RATE.set(rate)
+
+
+def precheck_from_env():
+    """
+    Configuração pelas variáveis CPF_CHECK_DIGITS ('auto', 'bloquear' ou
+    'desligado') e CPF_FILTER_FP (taxa de falso positivo alvo do filtro de
+    Bloom; 0 desliga o filtro).
+    """
+    return {
+        'check_digits': os.environ.get('CPF_CHECK_DIGITS', 'auto'),
+        'fp_rate': float(os.environ.get('CPF_FILTER_FP', 0.01)),
+    }
+
+
+_prechecks = {}
+_prechecks_lock = threading.Lock()
+
+
+def get_cpf_precheck(storage):
+    """Pré-checagem compartilhada pelo processo para o armazenamento (CLI, API e sessões do Streamlit)."""
+    with _prechecks_lock:
+        precheck = _prechecks.get(id(storage))
+        if precheck is None or precheck.storage is not storage:
+            precheck = _prechecks[id(storage)] = CpfPrecheck(storage, **precheck_from_env())
+        return precheck
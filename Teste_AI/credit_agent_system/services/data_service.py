@@ -0,0 +1,192 @@
+"""
+Camada de dados compartilhada pelo processo (usada pela interface Streamlit via st.cache_resource).
+
+Mantém em memória os registros de clientes já consultados, o histórico de
+solicitações de cada CPF, as faixas de score compiladas e a referência ao
+cache da tabela de câmbio. Consultas repetidas (a cada rerun do Streamlit)
+não tocam em arquivo nem banco:
+
+- escritas feitas por este processo (`update_score`, `log_request`)
+  atualizam apenas o que mudou — o registro ou o histórico daquele CPF;
+- alterações externas (outro processo, edição manual dos arquivos) são
+  detectadas por `Storage.version()` e `Storage.requests_version()`,
+  verificadas no máximo a cada `check_interval` segundos; quando a versão
+  muda, os caches afetados são descartados.
+"""
+
+import threading
+import time
+
+from services import metrics
+from services.fx_client import get_fx_client
+from services.rate_cache import DEFAULT_API_URL
+from storage.score_rules import ScoreRules
+
+
+class DataService:
+    def __init__(self, storage, fx_api_url=DEFAULT_API_URL, check_interval=2.0, max_clients=100000,
+                 clock=time.monotonic):
+        self.storage = storage
+        self.fx_api_url = fx_api_url
+        self.check_interval = check_interval
+        self.max_clients = max_clients
+        self.clock = clock
+        self._clients = {}
+        self._history = {}
+        self._rules = None
+        self._version = None
+        self._requests_version = None
+        self._checked_at = None
+        # Incrementada a cada escrita/descarte: uma leitura iniciada antes não repõe dado velho no cache
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        now = self.clock()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        version = self.storage.version()
+        requests_version = self.storage.requests_version()
+        with self._lock:
+            self._checked_at = now
+            if version != self._version:
+                if self._version is not None:
+                    metrics.DATA_SERVICE_INVALIDATIONS.labels('externa').inc()
+                self._clients = {}
+                self._history = {}
+                self._rules = None
+                self._version = version
+                self._generation += 1
+            elif requests_version != self._requests_version:
+                # Log alterado (inclusive pelos lotes das nossas próprias solicitações): só o histórico cai
+                self._history = {}
+                self._generation += 1
+            self._requests_version = requests_version
+
+    def _write(self, func, *args):
+        """
+        Executa uma escrita própria e adota a versão resultante, para que ela
+        não descarte caches que a própria escrita já manteve corretos. Se a
+        versão já tinha mudado antes (alteração externa), nada é adotado e a
+        próxima verificação descarta os caches normalmente.
+        """
+        before = self.storage.version()
+        result = func(*args)
+        after = self.storage.version()
+        with self._lock:
+            if before == self._version:
+                self._version = after
+        return result
+
+    # --- Clientes ---
+
+    def _client_row(self, cpf):
+        self._check_version()
+        cpf = cpf.strip()
+        row = self._clients.get(cpf)
+        if row is not None:
+            metrics.DATA_SERVICE_CACHE.labels('hit').inc()
+            return row
+        metrics.DATA_SERVICE_CACHE.labels('miss').inc()
+        generation = self._generation
+        row = self.storage.get_client(cpf)
+        if row is not None:
+            with self._lock:
+                if generation != self._generation:
+                    return row
+                if len(self._clients) >= self.max_clients:
+                    # Descarta o registro mais antigo (dicts preservam a ordem de inserção)
+                    self._clients.pop(next(iter(self._clients)))
+                self._clients[cpf] = row
+        return row
+
+    def get_client(self, cpf):
+        """Cópia do registro do cliente, ou None."""
+        row = self._client_row(cpf)
+        return dict(row) if row is not None else None
+
+    def authenticate(self, cpf, dob):
+        row = self._client_row(cpf)
+        if row is not None and row['data_nascimento'].strip() == dob.strip():
+            return dict(row)
+        return None
+
+    def update_score(self, cpf, new_score):
+        """Grava o score e atualiza só o registro deste CPF no cache."""
+        cpf = cpf.strip()
+        updated = self._write(self.storage.update_score, cpf, new_score)
+        if updated:
+            with self._lock:
+                self._generation += 1
+                row = self._clients.get(cpf)
+                if row is not None:
+                    self._clients[cpf] = dict(row, score=str(new_score))
+            metrics.DATA_SERVICE_INVALIDATIONS.labels('cliente').inc()
+        return updated
+
+    # --- Regras e log ---
+
+    def rules(self):
+        self._check_version()
+        rules = self._rules
+        if rules is None:
+            rules = ScoreRules.from_rows(self.storage.score_bands())
+            with self._lock:
+                self._rules = rules
+        return rules
+
+    def max_limit(self, score):
+        return self.rules().max_limit(score)
+
+    def score_band(self, score):
+        return self.rules().band_label(score)
+
+    def log_request(self, cpf, current, requested, status):
+        """Registra a solicitação e descarta só o histórico em cache deste CPF."""
+        self._write(self.storage.log_request, cpf, current, requested, status)
+        with self._lock:
+            self._generation += 1
+            self._history.pop(cpf.strip(), None)
+        metrics.DATA_SERVICE_INVALIDATIONS.labels('historico').inc()
+
+    def request_history(self, cpf, limit=10):
+        """Últimas solicitações do CPF, em cache por CPF até a próxima solicitação ou mudança no log."""
+        self._check_version()
+        cpf = cpf.strip()
+        entry = self._history.get(cpf)
+        if entry is not None and entry[0] >= limit:
+            metrics.DATA_SERVICE_CACHE.labels('hit').inc()
+            return entry[1][:limit]
+        metrics.DATA_SERVICE_CACHE.labels('miss').inc()
+        generation = self._generation
+        rows = self.storage.request_history(cpf, limit)
+        with self._lock:
+            if generation == self._generation:
+                if len(self._history) >= self.max_clients:
+                    self._history.pop(next(iter(self._history)))
+                self._history[cpf] = (limit, rows)
+        return rows
+
+    # --- Câmbio ---
+
+    def get_rate(self, currency):
+        return get_fx_client(self.fx_api_url, self.storage.data_dir).table().get('rates', {}).get(currency)
+
+    def get_rates(self, queries):
+        """{base: [moedas]} -> {base: {moeda: cotação} ou exceção}, bases buscadas em paralelo."""
+        return get_fx_client(self.fx_api_url, self.storage.data_dir).get_many(queries, return_exceptions=True)
+
+    def currencies(self):
+        """Códigos de moeda conhecidos pela API (da tabela da base padrão)."""
+        return sorted(get_fx_client(self.fx_api_url, self.storage.data_dir).table().get('rates', {}))
+
+    def invalidate(self):
+        """Descarta todos os caches (a próxima consulta relê a base)."""
+        with self._lock:
+            self._clients = {}
+            self._history = {}
+            self._rules = None
+            self._version = None
+            self._requests_version = None
+            self._checked_at = None
+            self._generation += 1
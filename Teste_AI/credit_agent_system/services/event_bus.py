@@ -0,0 +1,336 @@
+"""
+Barramento de eventos entre os agentes.
+
+As mensagens são tipadas (dataclasses imutáveis e serializáveis com
+pickle) e sempre carregam o CPF do cliente. Cada tipo é entregue aos
+handlers inscritos, que rodam em trabalhadores de longa duração, cada um
+com a sua fila:
+
+- no próprio processo: uma thread por trabalhador (`subscribe`);
+- em processos separados ('spawn'): os handlers são montados em cada
+  processo por uma função de fábrica (`subscribe_processes`), e as
+  mensagens do mesmo CPF vão sempre para o mesmo processo, na ordem em que
+  foram publicadas.
+
+`publish` só enfileira e devolve um Future com as respostas dos handlers.
+Quem precisa do resultado (ex: confirmar a gravação do score) espera por
+ele; os demais seguem sem esperar. Um handler pode responder com outra
+mensagem, que é publicada em seguida (ex: InterviewCompleted ->
+ScoreUpdated). `close()` (também chamado no `atexit`) espera as filas
+esvaziarem, por no máximo `CLOSE_TIMEOUT` segundos, antes de parar os
+trabalhadores.
+
+Se um processo trabalhador morre (ou a fábrica de handlers falha ao
+montá-lo), as mensagens que estavam com ele e as que forem roteadas para
+ele depois falham com RuntimeError, em vez de deixar os Futures (e o
+`close()`) esperando para sempre.
+
+A conversa em si não passa pelo barramento: a entrevista oferecida após
+uma rejeição lê as respostas do próprio cliente (input/print) e por isso
+roda na thread da sessão, chamada diretamente pelo agente de limite. Não
+há mensagens de "autenticado" ou "rejeitado" porque nenhum efeito
+colateral depende delas; a rejeição já segue no LimitRequested.
+"""
+
+import atexit
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from services import metrics
+
+_STOP = object()
+
+CLOSE_TIMEOUT = 10.0
+# Intervalo com que o coletor de respostas confere se os processos trabalhadores continuam vivos
+LIVENESS_INTERVAL = 0.5
+
+
+@dataclass(frozen=True)
+class Message:
+    cpf: str
+
+
+@dataclass(frozen=True)
+class LimitRequested(Message):
+    current_limit: float
+    requested_limit: float
+    status: str
+
+
+@dataclass(frozen=True)
+class InterviewCompleted(Message):
+    score: float
+
+
+@dataclass(frozen=True)
+class ScoreUpdated(Message):
+    score: float
+    updated: bool
+
+
+class _Delivery:
+    """Uma mensagem publicada: aguarda a resposta de cada trabalhador inscrito no tipo."""
+
+    def __init__(self, message, targets):
+        self.message = message
+        self.future = Future()
+        self.remaining = targets
+        self.replies = []
+        self.error = None
+        self.started = time.perf_counter()
+
+
+class AgentWorker:
+    """Trabalhador de longa duração no próprio processo: uma fila e uma thread que chama os handlers."""
+
+    def __init__(self, bus, name):
+        self.bus = bus
+        self.name = name
+        self.handlers = {}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"agente-{name}", daemon=True)
+        self._thread.start()
+
+    def put(self, delivery):
+        self._queue.put(delivery)
+        metrics.BUS_PENDING.labels(self.name).set(self._queue.qsize())
+
+    def _run(self):
+        while True:
+            delivery = self._queue.get()
+            if delivery is _STOP:
+                break
+            try:
+                reply = self.handlers[type(delivery.message)](delivery.message)
+            except Exception as e:
+                self.bus._done(delivery, None, e)
+            else:
+                self.bus._done(delivery, reply, None)
+            metrics.BUS_PENDING.labels(self.name).set(self._queue.qsize())
+
+    def stop(self, timeout=None):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+
+def _process_main(factory, args, inbox, outbox):
+    """Laço de um processo trabalhador: handlers de `factory(*args)` sobre as mensagens da fila."""
+    handlers = factory(*args)
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        token, message = item
+        try:
+            outbox.put((token, handlers[type(message)](message), None))
+        except Exception as e:
+            outbox.put((token, None, f"{type(e).__name__}: {e}"))
+
+
+class ProcessWorkers:
+    """Trabalhadores em processos separados; as mensagens são distribuídas pelo CPF."""
+
+    def __init__(self, bus, name, factory, args, processes):
+        self.bus = bus
+        self.name = name
+        context = multiprocessing.get_context('spawn')
+        self._outbox = context.Queue()
+        self._inboxes = []
+        self._processes = []
+        for i in range(processes):
+            inbox = context.Queue()
+            process = context.Process(target=_process_main, args=(factory, args, inbox, self._outbox),
+                                      name=f"agente-{name}-{i}", daemon=True)
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+        # token -> (entrega, índice do processo que a recebeu)
+        self._pending = {}
+        self._dead = set()
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+        self._collector = threading.Thread(target=self._collect, name=f"agente-{name}-respostas", daemon=True)
+        self._collector.start()
+
+    def _died(self, index):
+        process = self._processes[index]
+        return RuntimeError(f"Processo trabalhador {process.name} encerrado (código {process.exitcode}).")
+
+    def put(self, delivery):
+        index = zlib.crc32(delivery.message.cpf.encode('utf-8')) % len(self._inboxes)
+        with self._lock:
+            dead = index in self._dead
+            if not dead:
+                token = next(self._tokens)
+                self._pending[token] = (delivery, index)
+                metrics.BUS_PENDING.labels(self.name).set(len(self._pending))
+        if dead:
+            self.bus._done(delivery, None, self._died(index))
+            return
+        self._inboxes[index].put((token, delivery.message))
+
+    def _reply(self, item):
+        token, reply, error = item
+        with self._lock:
+            entry = self._pending.pop(token, None)
+            metrics.BUS_PENDING.labels(self.name).set(len(self._pending))
+        if entry is not None:
+            self.bus._done(entry[0], reply, RuntimeError(error) if error else None)
+
+    def _check_processes(self):
+        """Falha as entregas pendentes dos processos que morreram desde a última verificação."""
+        newly_dead = [i for i, process in enumerate(self._processes)
+                      if i not in self._dead and not process.is_alive()]
+        if not newly_dead:
+            return
+        # O que o processo respondeu antes de morrer já está na fila de saída
+        while True:
+            try:
+                item = self._outbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._outbox.put(None)
+                break
+            self._reply(item)
+        with self._lock:
+            self._dead.update(newly_dead)
+            lost = [(token, index) for token, (_, index) in self._pending.items() if index in self._dead]
+            deliveries = [(self._pending.pop(token)[0], index) for token, index in lost]
+            metrics.BUS_PENDING.labels(self.name).set(len(self._pending))
+        for delivery, index in deliveries:
+            self.bus._done(delivery, None, self._died(index))
+
+    def _collect(self):
+        while True:
+            try:
+                item = self._outbox.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                self._check_processes()
+                continue
+            if item is None:
+                break
+            self._reply(item)
+
+    def stop(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        # Processos parados: o coletor responde ou falha o que ainda estiver pendente
+        self._check_processes()
+        self._outbox.put(None)
+        self._collector.join()
+
+
+class EventBus:
+    """
+    Roteia cada mensagem publicada para os trabalhadores inscritos no seu tipo (thread-safe).
+
+        bus.subscribe(LimitRequested, agent.handle_limit_requested, worker='registro')
+        bus.publish(LimitRequested(cpf, 1000.0, 5000.0, 'rejeitado'))          # não espera
+        replies = bus.publish(InterviewCompleted(cpf, 640.0)).result(timeout=5)
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._workers = {}
+        self._outstanding = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        atexit.register(self.close)
+
+    def subscribe(self, message_type, handler, worker='agentes'):
+        """Trata `message_type` com `handler` na thread do trabalhador `worker` (criado no primeiro uso)."""
+        with self._cond:
+            target = self._workers.get(worker)
+            if target is None:
+                target = self._workers[worker] = AgentWorker(self, worker)
+            target.handlers[message_type] = handler
+            self._routes.setdefault(message_type, []).append(target)
+
+    def subscribe_processes(self, message_types, factory, args=(), processes=2, worker='processos'):
+        """
+        Trata `message_types` em `processes` processos. Cada processo chama
+        `factory(*args)` (função de módulo, para o 'spawn') e recebe um dict
+        {tipo de mensagem: handler}.
+        """
+        with self._cond:
+            target = self._workers[worker] = ProcessWorkers(self, worker, factory, args, processes)
+            for message_type in message_types:
+                self._routes.setdefault(message_type, []).append(target)
+
+    def publish(self, message):
+        """Enfileira a mensagem. Retorna um Future com a lista de respostas dos handlers."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Barramento de eventos encerrado.")
+            targets = list(self._routes.get(type(message), ()))
+            delivery = _Delivery(message, len(targets))
+            if targets:
+                self._outstanding += 1
+        metrics.BUS_MESSAGES.labels(type(message).__name__).inc()
+        if not targets:
+            delivery.future.set_result([])
+        for target in targets:
+            target.put(delivery)
+        return delivery.future
+
+    def _done(self, delivery, reply, error):
+        if error is not None:
+            metrics.ERRORS.labels(f"barramento_{type(delivery.message).__name__}").inc()
+        # A resposta é publicada antes de concluir a original: `flush` também espera por ela
+        if isinstance(reply, Message):
+            try:
+                self.publish(reply)
+            except RuntimeError:
+                pass  # barramento já encerrado
+        with self._cond:
+            if reply is not None:
+                delivery.replies.append(reply)
+            if error is not None and delivery.error is None:
+                delivery.error = error
+            delivery.remaining -= 1
+            finished = delivery.remaining == 0
+            if finished:
+                self._outstanding -= 1
+                self._cond.notify_all()
+        if finished:
+            metrics.BUS_SECONDS.labels(type(delivery.message).__name__).observe(time.perf_counter() - delivery.started)
+            if delivery.error is not None:
+                delivery.future.set_exception(delivery.error)
+            else:
+                delivery.future.set_result(delivery.replies)
+
+    def flush(self, timeout=None):
+        """Bloqueia até que todas as mensagens publicadas (e suas respostas) tenham sido tratadas."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """
+        Esvazia as filas e para os trabalhadores (idempotente), esperando no
+        máximo `timeout` segundos no total (None: sem limite). Retorna False
+        se sobraram mensagens sem tratamento.
+        """
+        with self._cond:
+            if self._closed:
+                return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        drained = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.stop(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return drained
@@ -0,0 +1,213 @@
+"""
+Cliente da API de câmbio para várias moedas e várias bases de uma vez.
+
+    client = get_fx_client()
+    client.get_rates('USD', ['BRL', 'EUR'])          # {'BRL': 5.43, 'EUR': 0.91}
+    client.get_many({'USD': ['BRL'], 'EUR': ['BRL', 'GBP']})
+
+Todas as conversões de uma base saem de uma única tabela da API: no máximo
+uma requisição por base, e nenhuma enquanto a tabela estiver no cache
+compartilhado (RateCache). Bases diferentes são buscadas em paralelo, e as
+requisições usam conexões persistentes (services.http_pool). Com a API fora
+do ar, as cotações vêm da última tabela do histórico local
+(services.fx_history), marcada com 'offline': True. AsyncFxClient oferece a
+mesma interface para código asyncio.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services import metrics
+from services.fx_history import get_snapshot_store
+from services.http_pool import AsyncHttpPool, split_url
+from services.rate_cache import DEFAULT_API_URL, get_rate_cache, parse_table
+
+
+def parse_query(text, default_base='USD'):
+    """
+    'BRL, EUR, EUR/GBP' -> {'USD': ['BRL', 'EUR'], 'EUR': ['GBP']}.
+
+    Cada item é uma moeda (cotada na base padrão) ou um par BASE/MOEDA.
+    """
+    queries = {}
+    for item in text.replace(';', ',').split(','):
+        item = item.strip().upper()
+        if not item:
+            continue
+        base, sep, target = item.partition('/')
+        if not sep:
+            base, target = default_base, base
+        base, target = base.strip(), target.strip()
+        if base and target and target not in queries.setdefault(base, []):
+            queries[base].append(target)
+    return queries
+
+
+def offline_table(base, data_dir=None):
+    """Última tabela do histórico local de `data_dir` convertida para `base`, ou None."""
+    snapshot = get_snapshot_store(data_dir=data_dir).latest_table(base.upper())
+    if snapshot is not None:
+        metrics.FX_CACHE.labels('historico').inc()
+    return snapshot
+
+
+class FxClient:
+    """Consultas de cotação em lote sobre o cache compartilhado de tabelas (thread-safe)."""
+
+    def __init__(self, api_url=DEFAULT_API_URL, max_workers=8, data_dir=None):
+        self.api_url = api_url
+        self.data_dir = data_dir
+        prefix, _, base = api_url.rstrip('/').rpartition('/')
+        self._prefix = prefix + '/'
+        self.default_base = base.upper()
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def url(self, base=None):
+        """URL da tabela de uma base (o último segmento da URL da API é a moeda base)."""
+        return self._prefix + (base or self.default_base).upper()
+
+    def table(self, base=None):
+        """Tabela completa da base (dict da API): do cache, da API ou, com a API fora do ar, do histórico."""
+        try:
+            return get_rate_cache(self.url(base), self.data_dir).get_table()
+        except ConnectionError:
+            snapshot = offline_table(base or self.default_base, self.data_dir)
+            if snapshot is None:
+                raise
+            return snapshot
+
+    def get_rates(self, base, targets):
+        """{moeda: cotação de 1 unidade de `base`, ou None se desconhecida} para cada moeda."""
+        rates = self.table(base).get('rates', {})
+        return {target: rates.get(target) for target in targets}
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fx")
+        return self._executor
+
+    def get_many(self, queries, return_exceptions=False):
+        """
+        {base: [moedas]} -> {base: {moeda: cotação}}, com as bases buscadas em
+        paralelo. Com `return_exceptions=True`, uma base que falhar tem a
+        exceção no lugar do resultado em vez de interromper as demais.
+        """
+        if len(queries) <= 1:
+            futures = None
+        else:
+            pool = self._pool()
+            futures = {base: pool.submit(self.get_rates, base, targets) for base, targets in queries.items()}
+        results = {}
+        for base, targets in queries.items():
+            try:
+                results[base] = futures[base].result() if futures else self.get_rates(base, targets)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[base] = e
+        return results
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+class AsyncFxClient:
+    """
+    Variante asyncio do FxClient, com conexões keep-alive próprias (AsyncHttpPool).
+
+    Compartilha o cache de tabelas com o FxClient; buscas concorrentes da mesma
+    base no loop dividem uma única requisição. Se a API falhar, é usada a
+    última tabela em memória ou, sem ela, a do histórico local. Use uma
+    instância por loop de eventos.
+    """
+
+    def __init__(self, api_url=DEFAULT_API_URL, timeout=10, data_dir=None):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.data_dir = data_dir
+        self._client = FxClient(api_url, data_dir=data_dir)
+        self.default_base = self._client.default_base
+        self._pools = {}
+        self._inflight = {}
+
+    async def _fetch(self, url, cache):
+        origin, path = split_url(url)
+        pool = self._pools.get(origin)
+        if pool is None:
+            pool = self._pools[origin] = AsyncHttpPool(*origin, timeout=self.timeout)
+        started = time.perf_counter()
+        try:
+            data = parse_table(*await pool.get(path))
+        except Exception as e:
+            metrics.FX_FETCHES.labels(type(e).__name__).inc()
+            cache.record_failure(e)
+            fallback = cache.peek(stale=True)
+            if fallback is None and isinstance(e, ConnectionError):
+                fallback = offline_table(url.rpartition('/')[2], self.data_dir)
+            if fallback is not None:
+                return fallback
+            raise
+        finally:
+            metrics.FX_FETCH_SECONDS.observe(time.perf_counter() - started)
+        metrics.FX_FETCHES.labels('ok').inc()
+        cache.store(data)
+        return data
+
+    async def table(self, base=None):
+        url = self._client.url(base)
+        cache = get_rate_cache(url, self.data_dir)
+        data = cache.peek()
+        if data is not None:
+            metrics.FX_CACHE.labels('hit').inc()
+            return data
+        if isinstance(cache.recent_failure(), ConnectionError):
+            # Servidor fora do ar há pouco: histórico local sem esperar outro timeout
+            data = offline_table(url.rpartition('/')[2], self.data_dir)
+            if data is not None:
+                return data
+        metrics.FX_CACHE.labels('miss').inc()
+        task = self._inflight.get(url)
+        if task is None:
+            task = self._inflight[url] = asyncio.ensure_future(self._fetch(url, cache))
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def get_rates(self, base, targets):
+        rates = (await self.table(base)).get('rates', {})
+        return {target: rates.get(target) for target in targets}
+
+    async def get_many(self, queries, return_exceptions=False):
+        bases = list(queries)
+        results = await asyncio.gather(*(self.get_rates(base, queries[base]) for base in bases),
+                                       return_exceptions=return_exceptions)
+        return dict(zip(bases, results))
+
+    async def aclose(self):
+        pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            await pool.aclose()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_fx_client(api_url=DEFAULT_API_URL, data_dir=None):
+    """Retorna a instância compartilhada de FxClient para a URL e o diretório de dados informados."""
+    key = (api_url, data_dir and os.path.abspath(data_dir))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = FxClient(api_url, data_dir=data_dir)
+            _clients[key] = client
+        return client
@@ -0,0 +1,306 @@
+"""
+Histórico local das tabelas de câmbio: cotações por data, sem acesso à rede.
+
+Toda tabela obtida da API (cerca de 160 moedas, identificada por
+`time_last_update_unix`) é anexada a `cambio_historico.dat` em formato
+binário compacto:
+
+    'FXS1' | crc32 do restante (uint32) | timestamp (int64) | moeda base (3 bytes)
+    | n (uint16) | n códigos de moeda (3 bytes cada) | n cotações (float64)
+
+e o índice `cambio_historico.idx` guarda (timestamp, offset, tamanho, base)
+de cada registro, carregado em memória e consultado por busca binária.
+O .dat é a fonte da verdade: registros que o índice não cobre (queda entre
+as duas escritas, outro processo gravando) são encontrados varrendo apenas
+o final do arquivo.
+
+A partir de qualquer tabela é possível cotar em qualquer base
+(cotação[X] / cotação[base]), então o histórico responde também para bases
+que nunca foram consultadas diretamente.
+"""
+
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+
+from storage.backends import DEFAULT_DATA_DIR
+
+HISTORY_FILE = 'cambio_historico.dat'
+MAGIC = b'FXS1'
+RECORD = struct.Struct('<4sIq3sH')
+CRC_START = 8
+ENTRY = struct.Struct('<qqI3sx')
+CODE_BYTES = 3
+CACHED_SNAPSHOTS = 64
+
+
+def _encode(table):
+    """Tabela da API -> (timestamp, base, bytes do registro), ou None se a tabela não for gravável."""
+    ts = int(table.get('time_last_update_unix') or 0)
+    base = str(table.get('base_code') or '').upper()
+    rates = table.get('rates') or {}
+    codes = [code for code, rate in rates.items()
+             if len(code) == CODE_BYTES and code.isascii() and isinstance(rate, (int, float))]
+    if ts <= 0 or len(base) != CODE_BYTES or not base.isascii() or not codes:
+        return None
+    values = array('d', [float(rates[code]) for code in codes])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    body = (RECORD.pack(MAGIC, 0, ts, base.encode('ascii'), len(codes))[CRC_START:]
+            + ''.join(codes).encode('ascii') + values.tobytes())
+    return ts, base, MAGIC + struct.pack('<I', zlib.crc32(body)) + body
+
+
+def _decode(data):
+    """Bytes de um registro -> (base, {moeda: cotação})."""
+    _, _, _, base, count = RECORD.unpack_from(data)
+    start = RECORD.size
+    codes = data[start:start + CODE_BYTES * count].decode('ascii')
+    values = array('d')
+    values.frombytes(data[start + CODE_BYTES * count:start + (CODE_BYTES + 8) * count])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return base.decode('ascii'), {codes[i * CODE_BYTES:(i + 1) * CODE_BYTES]: values[i] for i in range(count)}
+
+
+def _convert(base, rates, currency, target_base):
+    """Cotação de 1 `target_base` em `currency` a partir de uma tabela na base `base`, ou None."""
+    rate = rates.get(currency)
+    if rate is None:
+        return None
+    if target_base == base:
+        return rate
+    pivot = rates.get(target_base)
+    return rate / pivot if pivot else None
+
+
+def parse_when(text, end_of_day=False):
+    """
+    'AAAA-MM-DD[ HH:MM[:SS]]' ou 'DD/MM/AAAA' (UTC) -> timestamp unix. Com
+    `end_of_day`, uma data sem horário vale até o último segundo do dia.
+    """
+    text = text.strip()
+    try:
+        moment = datetime.strptime(text, '%d/%m/%Y')
+        date_only = True
+    except ValueError:
+        moment = datetime.fromisoformat(text)
+        date_only = len(text) <= 10
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    if end_of_day and date_only:
+        moment += timedelta(days=1, seconds=-1)
+    return int(moment.timestamp())
+
+
+def format_when(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%d/%m/%Y %H:%M UTC')
+
+
+def _append(path, payload):
+    """Anexa com uma única escrita em O_APPEND (sem intercalar com outro processo). Retorna o offset."""
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        written = os.write(fd, payload)
+        if written != len(payload):
+            raise OSError(f"Escrita incompleta em {path}")
+        return os.lseek(fd, 0, os.SEEK_CUR) - written
+    finally:
+        os.close(fd)
+
+
+class FxSnapshotStore:
+    """Séries temporais de cotações a partir das tabelas gravadas (thread-safe)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + '.idx'
+        self._times = array('q')
+        self._offsets = array('q')
+        self._lengths = array('q')
+        self._bases = []
+        self._keys = set()
+        self._end = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    # --- Índice ---
+
+    def _add(self, ts, offset, length, base):
+        if (ts, base) in self._keys:
+            return
+        i = bisect_right(self._times, ts)
+        self._times.insert(i, ts)
+        self._offsets.insert(i, offset)
+        self._lengths.insert(i, length)
+        self._bases.insert(i, base)
+        self._keys.add((ts, base))
+
+    def _load_index(self, size):
+        self._end = 0
+        try:
+            with open(self.index_path, mode='rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        entries = sorted(ENTRY.unpack_from(data, pos) for pos in range(0, len(data) - ENTRY.size + 1, ENTRY.size))
+        for ts, offset, length, base in entries:
+            if offset + length <= size:
+                self._add(ts, offset, length, base.decode('ascii'))
+        # A varredura do .dat começa onde a cobertura contínua do índice termina
+        for offset, length in sorted((offset, length) for _, offset, length, _ in entries):
+            if offset > self._end or offset + length > size:
+                break
+            self._end = max(self._end, offset + length)
+
+    def _refresh(self):
+        """Incorpora registros anexados ao .dat desde a última leitura (inclusive por outros processos)."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        recovering = self._end is None
+        if recovering:
+            self._load_index(size)
+        if size <= self._end:
+            return
+        missing = []
+        with open(self.path, mode='rb') as f:
+            f.seek(self._end)
+            data = f.read(size - self._end)
+        pos = 0
+        while len(data) - pos >= RECORD.size:
+            magic, crc, ts, base, count = RECORD.unpack_from(data, pos)
+            length = RECORD.size + (CODE_BYTES + 8) * count
+            if (magic != MAGIC or len(data) - pos < length
+                    or zlib.crc32(data[pos + CRC_START:pos + length]) != crc):
+                # Gravação interrompida no meio: pula até o próximo registro. Sem
+                # outro registro depois, pode ser uma gravação em andamento: para aqui
+                following = data.find(MAGIC, pos + 1)
+                if following < 0:
+                    break
+                pos = following
+                continue
+            base = base.decode('ascii')
+            if recovering and (ts, base) not in self._keys:
+                missing.append((ts, self._end + pos, length, base))
+            self._add(ts, self._end + pos, length, base)
+            pos += length
+        self._end += pos
+        if missing:
+            # Registros sem entrada no índice (queda entre as duas escritas): o índice é completado
+            _append(self.index_path, b''.join(ENTRY.pack(ts, offset, length, base.encode('ascii'))
+                                              for ts, offset, length, base in missing))
+
+    def _snapshot(self, i):
+        offset = self._offsets[i]
+        snapshot = self._cache.get(offset)
+        if snapshot is None:
+            with open(self.path, mode='rb') as f:
+                f.seek(offset)
+                snapshot = _decode(f.read(self._lengths[i]))
+            if len(self._cache) >= CACHED_SNAPSHOTS:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[offset] = snapshot
+        return snapshot
+
+    # --- Gravação ---
+
+    def record(self, table):
+        """Anexa uma tabela da API. Retorna False se ela já estava gravada (mesmo timestamp e base)."""
+        encoded = _encode(table)
+        if encoded is None:
+            return False
+        ts, base, payload = encoded
+        with self._lock:
+            self._refresh()
+            if (ts, base) in self._keys:
+                return False
+            offset = _append(self.path, payload)
+            _append(self.index_path, ENTRY.pack(ts, offset, len(payload), base.encode('ascii')))
+            self._refresh()
+        return True
+
+    # --- Consultas ---
+
+    def rate_at(self, currency, when, base='USD'):
+        """(cotação de 1 `base` em `currency`, timestamp da tabela) vigente no instante `when` (unix), ou None."""
+        with self._lock:
+            self._refresh()
+            for i in range(bisect_right(self._times, when) - 1, -1, -1):
+                rate = _convert(*self._snapshot(i), currency, base)
+                if rate is not None:
+                    return rate, self._times[i]
+        return None
+
+    def series(self, currency, start=None, end=None, base='USD'):
+        """Lista de (timestamp, cotação) de `currency` em `base` entre `start` e `end` (unix, inclusivos)."""
+        points = {}
+        with self._lock:
+            self._refresh()
+            lo = 0 if start is None else bisect_right(self._times, start - 1)
+            hi = len(self._times) if end is None else bisect_right(self._times, end)
+            for i in range(lo, hi):
+                ts = self._times[i]
+                # Tabelas de bases diferentes no mesmo instante: prefere a da própria base
+                if ts in points and self._bases[i] != base:
+                    continue
+                rate = _convert(*self._snapshot(i), currency, base)
+                if rate is not None:
+                    points[ts] = rate
+        return sorted(points.items())
+
+    def latest_table(self, base='USD'):
+        """Última tabela gravada convertida para `base`, no formato da API (com 'offline': True), ou None."""
+        with self._lock:
+            self._refresh()
+            for i in range(len(self._times) - 1, -1, -1):
+                snapshot_base, rates = self._snapshot(i)
+                if base != snapshot_base and not rates.get(base):
+                    continue
+                ts = self._times[i]
+                return {
+                    'result': 'success',
+                    'base_code': base,
+                    'time_last_update_unix': ts,
+                    'time_last_update_utc': formatdate(ts, usegmt=True),
+                    'rates': {code: _convert(snapshot_base, rates, code, base) for code in rates},
+                    'offline': True,
+                }
+        return None
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._times)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_snapshot_store(path=None, data_dir=None):
+    """
+    Instância compartilhada do histórico. Caminho padrão: FX_HISTORY_PATH ou
+    cambio_historico.dat em `data_dir` (o diretório do armazenamento em uso;
+    sem ele, data/).
+    """
+    path = os.path.abspath(path or os.environ.get('FX_HISTORY_PATH')
+                           or os.path.join(data_dir or DEFAULT_DATA_DIR, HISTORY_FILE))
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = FxSnapshotStore(path)
+            _stores[path] = store
+        return store
+
+
+def record_snapshot(table, data_dir=None):
+    """Grava a tabela no histórico de `data_dir` (usado pelo cache de câmbio a cada busca na API)."""
+    return get_snapshot_store(data_dir=data_dir).record(table)
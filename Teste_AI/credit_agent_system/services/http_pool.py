@@ -0,0 +1,220 @@
+"""
+Conexões HTTP persistentes (keep-alive) reutilizadas entre requisições.
+
+Cada origem (esquema, host, porta) tem um pool de conexões ociosas: uma
+requisição reaproveita uma conexão já aberta, sem novo handshake TCP/TLS, e
+a devolve ao pool ao terminar (a menos que o servidor peça para fechá-la).
+Se o servidor tiver encerrado uma conexão ociosa, a requisição é repetida
+uma vez em uma conexão nova. AsyncHttpPool é a variante sobre asyncio
+streams, para uso dentro de um loop de eventos.
+
+Falhas de rede são relançadas como ConnectionError, a exceção que os
+agentes já tratam como "serviço indisponível".
+"""
+
+import asyncio
+import http.client
+import ssl
+import threading
+import urllib.parse
+
+from services import metrics
+
+USER_AGENT = 'credit-agent-system'
+
+
+def split_url(url):
+    """URL -> ((esquema, host, porta), caminho com query string)."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f"URL não suportada: {url}")
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    return (parts.scheme, parts.hostname, port), path
+
+
+class HttpPool:
+    """Pool de conexões http.client keep-alive para uma origem (thread-safe)."""
+
+    def __init__(self, scheme, host, port, timeout=10, max_idle=8):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._ssl = ssl.create_default_context() if scheme == 'https' else None
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        metrics.FX_CONNECTIONS.labels('nova').inc()
+        if self._ssl is not None:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self._ssl)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self, fresh):
+        if not fresh:
+            with self._lock:
+                if self._idle:
+                    metrics.FX_CONNECTIONS.labels('reutilizada').inc()
+                    return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def get(self, path):
+        """GET em `path`. Retorna (status, corpo em bytes)."""
+        for attempt in (0, 1):
+            conn, reused = self._acquire(fresh=attempt > 0)
+            try:
+                conn.request('GET', path, headers={'Accept': 'application/json', 'User-Agent': USER_AGENT})
+                response = conn.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                # O servidor pode ter fechado a conexão ociosa: repete em uma conexão nova
+                if reused and attempt == 0:
+                    continue
+                raise ConnectionError(f"Falha ao acessar {self.host}: {e}") from e
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return response.status, body
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class AsyncHttpPool:
+    """
+    Variante asyncio do HttpPool (HTTP/1.1 sobre asyncio.open_connection).
+
+    As conexões pertencem ao loop de eventos em que foram abertas: use uma
+    instância por loop.
+    """
+
+    def __init__(self, scheme, host, port, timeout=10, max_idle=8):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._ssl = ssl.create_default_context() if scheme == 'https' else None
+        default_port = 443 if scheme == 'https' else 80
+        self._host_header = host if port == default_port else f"{host}:{port}"
+        self._idle = []
+
+    async def _connect(self):
+        metrics.FX_CONNECTIONS.labels('nova').inc()
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self._ssl), self.timeout)
+
+    async def _exchange(self, reader, writer, path):
+        writer.write((
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {self._host_header}\r\n"
+            f"Accept: application/json\r\n"
+            f"User-Agent: {USER_AGENT}\r\n"
+            f"Connection: keep-alive\r\n\r\n"
+        ).encode('latin-1'))
+        await writer.drain()
+
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        version, status = lines[0].split(' ', 2)[:2]
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';', 1)[0], 16)
+                if size == 0:
+                    # Trailers (normalmente vazios) até a linha em branco
+                    while (await reader.readline()).strip():
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()  # corpo delimitado pelo fim da conexão
+            keep_alive = False
+        return int(status), body, keep_alive
+
+    async def get(self, path):
+        """GET em `path`. Retorna (status, corpo em bytes)."""
+        for attempt in (0, 1):
+            reused = attempt == 0 and bool(self._idle)
+            if reused:
+                metrics.FX_CONNECTIONS.labels('reutilizada').inc()
+                reader, writer = self._idle.pop()
+            else:
+                try:
+                    reader, writer = await self._connect()
+                except (OSError, asyncio.TimeoutError) as e:
+                    raise ConnectionError(f"Falha ao acessar {self.host}: {e}") from e
+            try:
+                status, body, keep_alive = await asyncio.wait_for(
+                    self._exchange(reader, writer, path), self.timeout)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+                writer.close()
+                if reused:
+                    continue
+                raise ConnectionError(f"Falha ao acessar {self.host}: {e}") from e
+            except asyncio.TimeoutError as e:
+                writer.close()
+                raise ConnectionError(f"Tempo esgotado ao acessar {self.host}") from e
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive and len(self._idle) < self.max_idle:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, body
+
+    async def aclose(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(url, timeout=10):
+    """Pool compartilhado (HttpPool) da origem da URL e o caminho a requisitar."""
+    origin, path = split_url(url)
+    with _pools_lock:
+        pool = _pools.get(origin)
+        if pool is None:
+            pool = HttpPool(*origin, timeout=timeout)
+            _pools[origin] = pool
+        return pool, path
@@ -0,0 +1,256 @@
+"""
+Simulação ("e se") de tabelas score_limite alternativas sobre o histórico.
+
+Cada solicitação do log é reavaliada com o score atual do cliente (junção
+com a base por `Storage.get_clients`) contra a tabela vigente e contra cada
+tabela candidata, com a regra do agente de limite: limite máximo da faixa
+do score (ScoreRules, como em `CreditLimitAgent.check_rules`) e aprovação
+se o valor pedido não passa dele (`CreditLimitAgent.evaluate`).
+
+O log é dividido em blocos independentes (cada segmento fechado de
+storage.log_segments e trechos de `chunk_bytes` do arquivo ativo, cortados
+em fim de linha; nos backends sem log CSV, lotes de `chunk_rows` linhas),
+avaliados em paralelo por um pool de processos. Cada processo abre o
+próprio armazenamento e devolve apenas contagens por faixa, somadas no fim.
+
+Para cada candidata o resultado traz, por faixa da candidata e no total:
+pedidos, aprovações com a tabela vigente e com a candidata, quantos passam
+a ser aprovados ou rejeitados e a exposição (soma dos limites aprovados).
+"""
+
+import csv
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from agents.credit_limit_agent import CreditLimitAgent
+from storage.backends import DEFAULT_DATA_DIR, open_storage
+from storage.log_segments import SegmentedLog
+from storage.score_rules import ScoreRules
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele cada bloco é avaliado linha a linha
+    np = None
+
+FIELDS = ('pedidos', 'aprovados_atual', 'aprovados_novo', 'passam_a_aprovar', 'passam_a_rejeitar',
+          'exposicao_atual', 'exposicao_nova')
+TOTALS = ('linhas', 'sem_cliente', 'invalidos', 'aprovados_registrados')
+LOG_COLUMNS = ('cpf_cliente', 'novo_limite_solicitado', 'status_pedido')
+OUT_OF_TABLE = 'fora'
+
+
+def load_table(path):
+    """Linhas de uma tabela no formato de score_limite.csv, validadas (ScoreRulesError se inconsistente)."""
+    with open(path, mode='r', encoding='utf-8') as csvfile:
+        rows = [dict(row) for row in csv.DictReader(csvfile)]
+    ScoreRules.compile(rows)
+    return rows
+
+
+def band_labels(rules):
+    """Rótulos das posições devolvidas por `_tally`: 'fora' seguido das faixas ('0-300', ...)."""
+    mins, maxs, _ = rules.table()
+    return [OUT_OF_TABLE] + [f"{lo:g}-{hi:g}" for lo, hi in zip(mins, maxs)]
+
+
+# --- Avaliação de um bloco (roda nos processos do pool) ---
+
+_worker = {}
+
+
+def _init_worker(spec, data_dir, baseline, candidates):
+    _worker['storage'] = open_storage(spec, data_dir)
+    _worker['baseline'] = ScoreRules.from_rows(baseline)
+    _worker['candidates'] = [ScoreRules.from_rows(rows) for rows in candidates]
+
+
+def _read_task(task):
+    """Linhas do bloco e a posição das colunas (cpf, limite solicitado, status)."""
+    kind = task[0]
+    if kind == 'linhas':
+        return task[1], (0, 1, 2)
+    if kind == 'segmento':
+        _, log_path, stem = task
+        with SegmentedLog(log_path).open_segment(stem) as f:
+            data = f.read()
+        header = None
+    else:
+        _, path, start, end, header = task
+        with open(path, mode='rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+    # O último trecho do arquivo ativo pode terminar em uma linha ainda sendo gravada
+    rows = csv.reader(data[:data.rfind(b'\n') + 1].decode('utf-8').splitlines())
+    names = [name.strip() for name in (header or next(rows, []))]
+    try:
+        cols = tuple(names.index(name) for name in LOG_COLUMNS)
+    except ValueError:
+        raise ValueError(f"Cabeçalho inválido no log de solicitações: {','.join(names)}")
+    return rows, cols
+
+
+def _approvals(rules, scores, requested):
+    if np is not None:
+        return np.asarray(requested, dtype=np.float64) <= rules.max_limits(scores)
+    return [CreditLimitAgent.evaluate(asked, limit) == 'aprovado'
+            for asked, limit in zip(requested, rules.max_limits(scores))]
+
+
+def _tally(rules, scores, requested, base_ok):
+    """Contagens de FIELDS por posição de `band_labels(rules)`."""
+    _, _, limits = rules.table()
+    slots = len(limits) + 1
+    if np is not None:
+        idx = rules.band_indexes(scores) + 1
+        asked = np.asarray(requested, dtype=np.float64)
+        new_ok = asked <= np.concatenate(([0.0], limits))[idx]
+        columns = (np.ones(len(asked)), base_ok, new_ok, new_ok & ~base_ok, base_ok & ~new_ok,
+                   asked * base_ok, asked * new_ok)
+        return np.stack([np.bincount(idx, weights=np.asarray(w, dtype=np.float64), minlength=slots)
+                         for w in columns], axis=1).tolist()
+    counts = [[0.0] * len(FIELDS) for _ in range(slots)]
+    for i, asked, was_ok in zip(rules.band_indexes(scores), requested, base_ok):
+        is_ok = CreditLimitAgent.evaluate(asked, limits[i] if i >= 0 else 0.0) == 'aprovado'
+        for field, value in enumerate((1, was_ok, is_ok, is_ok and not was_ok, was_ok and not is_ok,
+                                       asked * was_ok, asked * is_ok)):
+            counts[i + 1][field] += value
+    return counts
+
+
+def _evaluate_task(task):
+    rows, (cpf_col, asked_col, status_col) = _read_task(task)
+    totals = dict.fromkeys(TOTALS, 0)
+    cpfs, requested = [], []
+    for row in rows:
+        if not row:
+            continue
+        try:
+            asked = float(row[asked_col])
+            cpf = row[cpf_col].strip()
+            totals['aprovados_registrados'] += row[status_col].strip() == 'aprovado'
+        except (IndexError, ValueError):
+            totals['invalidos'] += 1
+            continue
+        cpfs.append(cpf)
+        requested.append(asked)
+    totals['linhas'] = len(cpfs) + totals['invalidos']
+
+    # Junção com a base: score atual de cada cliente do bloco, em uma consulta em lote
+    scores, found = [], []
+    for asked, client in zip(requested, _worker['storage'].get_clients(cpfs)):
+        if client is None:
+            totals['sem_cliente'] += 1
+        else:
+            scores.append(float(client.get('score') or 0))
+            found.append(asked)
+    base_ok = _approvals(_worker['baseline'], scores, found)
+    return totals, [_tally(rules, scores, found, base_ok) for rules in _worker['candidates']]
+
+
+# --- Divisão do log e execução ---
+
+def _tasks(storage, chunk_bytes, chunk_rows):
+    log_path = getattr(storage, 'requests_path', None)
+    if not log_path:
+        # Backend sem log CSV (SQLite): lotes de linhas lidos aqui e enviados ao pool
+        batch = []
+        for row in storage.iter_requests():
+            batch.append((row['cpf_cliente'], row['novo_limite_solicitado'], row['status_pedido']))
+            if len(batch) >= chunk_rows:
+                yield ('linhas', batch)
+                batch = []
+        if batch:
+            yield ('linhas', batch)
+        return
+
+    flush = getattr(getattr(storage, 'requests', None), 'flush', None)
+    if flush is not None:
+        flush()
+    for stem, _, _ in SegmentedLog(log_path).segments():
+        yield ('segmento', log_path, stem)
+    try:
+        f = open(log_path, mode='rb')
+    except FileNotFoundError:
+        return
+    with f:
+        header = next(csv.reader([f.readline().decode('utf-8')]), [])
+        start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        while start < size:
+            # Trechos de ~chunk_bytes que terminam em fim de linha
+            f.seek(start + chunk_bytes)
+            f.readline()
+            end = min(f.tell(), size) if start + chunk_bytes < size else size
+            yield ('arquivo', log_path, start, end, header)
+            start = end
+
+
+def _run_pool(tasks, workers, init_args):
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=init_args) as pool:
+        # No máximo dois blocos por processo em espera: a leitura do log acompanha o pool
+        pending = set()
+        for task in tasks:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(_evaluate_task, task))
+        for future in pending:
+            yield future.result()
+
+
+def _with_deltas(counts):
+    result = dict(zip(FIELDS, counts))
+    for field in ('pedidos', 'aprovados_atual', 'aprovados_novo', 'passam_a_aprovar', 'passam_a_rejeitar'):
+        result[field] = int(result[field])
+    result['delta_aprovados'] = result['aprovados_novo'] - result['aprovados_atual']
+    result['delta_exposicao'] = result['exposicao_nova'] - result['exposicao_atual']
+    return result
+
+
+def simulate(candidates, spec=None, data_dir=DEFAULT_DATA_DIR, workers=None,
+             chunk_bytes=8 * 1024 * 1024, chunk_rows=100000):
+    """
+    Avalia o histórico de solicitações com cada tabela candidata.
+
+    `candidates` é uma lista de (nome, linhas no formato de score_limite.csv);
+    o armazenamento é o de `open_storage(spec, data_dir)`, aberto também por
+    cada processo. `workers` (padrão: nº de CPUs) igual a 1 avalia no próprio
+    processo. Retorna os totais do histórico (TOTALS), `segundos`,
+    `processos` e, em `candidatas`, para cada nome: `faixas` (rótulo -> FIELDS
+    mais `delta_aprovados` e `delta_exposicao`) e `total` no mesmo formato.
+    """
+    started = time.perf_counter()
+    storage = open_storage(spec, data_dir)
+    baseline = [dict(row) for row in storage.score_bands()]
+    rules = [ScoreRules.from_rows(rows) for _, rows in candidates]  # valida antes de abrir o pool
+    workers = workers or os.cpu_count() or 1
+    init_args = (spec, data_dir, baseline, [rows for _, rows in candidates])
+    tasks = _tasks(storage, chunk_bytes, chunk_rows)
+    if workers == 1:
+        _init_worker(*init_args)
+        results = map(_evaluate_task, tasks)
+    else:
+        results = _run_pool(tasks, workers, init_args)
+
+    totals = dict.fromkeys(TOTALS, 0)
+    merged = [[[0.0] * len(FIELDS) for _ in band_labels(r)] for r in rules]
+    for chunk_totals, tallies in results:
+        for key, value in chunk_totals.items():
+            totals[key] += value
+        for table, tally in zip(merged, tallies):
+            for slot, counts in zip(table, tally):
+                for field, value in enumerate(counts):
+                    slot[field] += value
+
+    report = dict(totals, segundos=time.perf_counter() - started, processos=workers, candidatas={})
+    for (name, _), r, table in zip(candidates, rules, merged):
+        bands = {label: _with_deltas(counts) for label, counts in zip(band_labels(r), table)
+                 if label != OUT_OF_TABLE or counts[0]}
+        overall = [sum(counts[field] for counts in table) for field in range(len(FIELDS))]
+        report['candidatas'][name] = {'faixas': bands, 'total': _with_deltas(overall)}
+    return report
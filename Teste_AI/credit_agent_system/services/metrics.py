@@ -0,0 +1,408 @@
+"""
+Registro de métricas em processo (contadores, gauges e histogramas) com exposição no formato Prometheus.
+
+    from services import metrics
+
+    with metrics.VALIDATE_SECONDS.time():
+        ...
+    metrics.LIMIT_DECISIONS.labels(faixa='301-600', status='aprovado').inc()
+
+Os incrementos vão para células por thread (sem lock no caminho quente); a
+soma entre threads só é feita na exportação. Exportação:
+
+- `render()`: texto no formato de exposição do Prometheus;
+- `serve(host, port)`: endpoint HTTP local em /metrics;
+- `dump(path)`: grava o texto em arquivo (troca atômica);
+- `start_from_env()`: METRICS_PORT e/ou METRICS_DUMP (+ METRICS_DUMP_INTERVAL, em segundos).
+"""
+
+import atexit
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class _ThreadCells:
+    """Vetores de contagem por thread; threads encerradas são somadas a um vetor de aposentadas."""
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._cells = []
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0] * self.size
+            with self._lock:
+                self._cells.append((weakref.ref(threading.current_thread()), cell))
+            self._local.cell = cell
+            return cell
+
+    def totals(self):
+        with self._lock:
+            alive = []
+            totals = list(self._retired)
+            for ref, cell in self._cells:
+                thread = ref()
+                if thread is None or not thread.is_alive():
+                    for i, value in enumerate(cell):
+                        self._retired[i] += value
+                else:
+                    alive.append((ref, cell))
+                for i, value in enumerate(cell):
+                    totals[i] += value
+            self._cells = alive
+            return totals
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _CounterChild:
+    def __init__(self):
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    def value(self):
+        return self._cells.totals()[0]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def value(self):
+        return self._value
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Células: uma contagem por balde (+Inf no fim), seguida de count e sum
+        self._cells = _ThreadCells(len(buckets) + 3)
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-2] += 1
+        cell[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+    def value(self):
+        totals = self._cells.totals()
+        cumulative, running = [], 0
+        for count in totals[:-2]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-2], totals[-1]
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: esperava os rótulos {self.labelnames}, recebeu {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{self._label_text(values)} {_number(child.value())}"]
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _render_child(self, values, child):
+        cumulative, count, total = child.value()
+        lines = []
+        for bound, running in zip(self.buckets + (float('inf'),), cumulative):
+            le = '+Inf' if bound == float('inf') else _number(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(values, [('le', le)])} {running}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {count}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_number(total)}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) or abs(value) >= 1e15 else str(int(value))
+    return str(value)
+
+
+class MetricsRegistry:
+    """Conjunto de métricas do processo, criadas uma única vez por nome."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help_text, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Métrica '{name}' já registrada com outro tipo ou rótulos.")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render = REGISTRY.render
+
+
+def dump(path):
+    """Grava a exposição atual em `path` (arquivo temporário + os.replace)."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode='w', encoding='utf-8') as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+def serve(host='127.0.0.1', port=9108):
+    """Sobe um endpoint HTTP /metrics em uma thread de fundo. Retorna o servidor."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_from_env(port=None, dump_path=None):
+    """
+    Liga os exportadores configurados (uma única vez por processo).
+
+    `port`/`dump_path` têm precedência sobre METRICS_PORT/METRICS_DUMP. O
+    arquivo é regravado a cada METRICS_DUMP_INTERVAL segundos (padrão 60) e
+    na saída do processo.
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    port = port or os.environ.get('METRICS_PORT')
+    dump_path = dump_path or os.environ.get('METRICS_DUMP')
+    if port:
+        serve(os.environ.get('METRICS_HOST', '127.0.0.1'), int(port))
+    if dump_path:
+        interval = float(os.environ.get('METRICS_DUMP_INTERVAL', 60))
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    dump(dump_path)
+                except OSError as e:
+                    print(f"Erro ao gravar métricas em {dump_path}: {e}")
+
+        threading.Thread(target=loop, name="metrics-dump", daemon=True).start()
+        atexit.register(dump, dump_path)
+
+
+# --- Métricas da aplicação ---
+
+VALIDATE_SECONDS = histogram('credito_validacao_usuario_segundos', "Latência da autenticação (CPF + data de nascimento).")
+VALIDATE_RESULTS = counter('credito_validacao_usuario_total', "Autenticações por resultado.", ['resultado'])
+AUTH_THROTTLED = counter('credito_autenticacao_recusada_total',
+                         "Tentativas de autenticação recusadas pelo controle de admissão (cpf, global, concorrencia).",
+                         ['motivo'])
+AUTH_INFLIGHT = gauge('credito_autenticacao_em_andamento', "Consultas de autenticação admitidas e em andamento.")
+AUTH_BUCKETS = gauge('credito_autenticacao_baldes_cpf', "CPFs com balde de tentativas ativo no controle de admissão.")
+CPF_PRECHECK = counter('credito_cpf_prechecagem_total',
+                       "Pré-checagens de CPF por resultado (aceito, formato, digito, desconhecido).", ['resultado'])
+CPF_FILTER_FP_RATE = gauge('credito_cpf_filtro_falso_positivo_taxa',
+                           "Taxa observada de falso positivo do filtro de CPFs (inexistentes aceitos / inexistentes consultados).")
+CPF_FILTER_EXPECTED_FP = gauge('credito_cpf_filtro_falso_positivo_estimado',
+                               "Taxa de falso positivo esperada pela ocupação dos bits do filtro de CPFs.")
+CPF_FILTER_BUILD_SECONDS = histogram('credito_cpf_filtro_construcao_segundos', "Duração da montagem do filtro de CPFs da base.")
+CPF_BASE_INVALID = gauge('credito_cpf_base_invalidos', "CPFs da base com formato ou dígitos verificadores inválidos.")
+RULES_SECONDS = histogram('credito_regras_limite_segundos', "Latência da consulta ao limite máximo por score.")
+UPDATE_SECONDS = histogram('credito_atualizacao_score_segundos', "Latência da gravação do novo score.")
+UPDATE_RESULTS = counter('credito_atualizacao_score_total', "Gravações de score por resultado.", ['resultado'])
+LOG_SECONDS = histogram('credito_log_solicitacao_segundos', "Latência do registro de uma solicitação de aumento.")
+RATE_SECONDS = histogram('credito_cambio_consulta_segundos', "Latência da consulta de cotação (inclui cache).")
+LIMIT_DECISIONS = counter('credito_solicitacoes_limite_total', "Solicitações de aumento por faixa de score e status.",
+                          ['faixa', 'status'])
+ERRORS = counter('credito_erros_total', "Erros capturados por operação.", ['operacao'])
+
+FX_CACHE = counter('credito_cambio_cache_total',
+                   "Consultas à tabela de câmbio por resultado do cache (hit, stale, miss, erro, historico).",
+                   ['resultado'])
+FX_FETCHES = counter('credito_cambio_api_requisicoes_total', "Requisições à API de câmbio por resultado.", ['resultado'])
+FX_FETCH_SECONDS = histogram('credito_cambio_api_segundos', "Latência das requisições à API de câmbio.")
+FX_BYTES = counter('credito_cambio_api_bytes_total', "Bytes recebidos da API de câmbio.")
+FX_CONNECTIONS = counter('credito_cambio_api_conexoes_total', "Conexões usadas nas requisições à API de câmbio (nova, reutilizada).",
+                         ['tipo'])
+
+FILE_LOADS = counter('credito_arquivo_cargas_total', "Leituras completas de arquivos de dados.", ['arquivo'])
+FILE_BYTES = counter('credito_arquivo_bytes_lidos_total', "Bytes lidos em cargas de arquivos de dados.", ['arquivo'])
+FILE_ROWS = counter('credito_arquivo_linhas_lidas_total', "Linhas varridas em cargas de arquivos de dados.", ['arquivo'])
+FILE_LOAD_SECONDS = histogram('credito_arquivo_carga_segundos', "Duração das cargas de arquivos de dados.", ['arquivo'])
+DATA_SERVICE_CACHE = counter('credito_servico_dados_cache_total', "Consultas de clientes e de históricos na camada de dados por resultado (hit, miss).",
+                             ['resultado'])
+DATA_SERVICE_INVALIDATIONS = counter('credito_servico_dados_invalidacoes_total',
+                                     "Invalidações da camada de dados (cliente: escrita própria; historico: solicitação própria; externa: base alterada).",
+                                     ['motivo'])
+REQUEST_LOG_ROWS = counter('credito_log_linhas_gravadas_total', "Linhas gravadas no log de solicitações.")
+LOG_SEGMENT_ROLLS = counter('credito_log_segmentos_total', "Segmentos do log de solicitações fechados por motivo (dia, tamanho, divisao).",
+                            ['motivo'])
+HISTORY_SEGMENTS = counter('credito_historico_segmentos_lidos_total',
+                           "Segmentos do log lidos em consultas de histórico por CPF (ativo, pendente, selado).", ['tipo'])
+HISTORY_SECONDS = histogram('credito_historico_consulta_segundos', "Latência da consulta ao histórico de solicitações de um CPF.")
+BUS_MESSAGES = counter('credito_barramento_mensagens_total', "Mensagens publicadas no barramento de eventos por tipo.", ['tipo'])
+BUS_PENDING = gauge('credito_barramento_fila', "Mensagens aguardando na fila de cada trabalhador do barramento.", ['trabalhador'])
+BUS_SECONDS = histogram('credito_barramento_entrega_segundos',
+                        "Tempo entre a publicação de uma mensagem e o fim do seu tratamento (inclui a fila).", ['tipo'])
+ANALYTICS_ROWS = counter('credito_agregados_linhas_processadas_total', "Linhas do log de solicitações incorporadas aos agregados.")
+ANALYTICS_SECONDS = histogram('credito_agregados_atualizacao_segundos', "Duração das atualizações incrementais dos agregados do log.")
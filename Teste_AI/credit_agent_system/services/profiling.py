@@ -0,0 +1,317 @@
+"""
+Modo de perfilamento das sessões (terminal e Streamlit).
+
+Os pontos de entrada dos agentes são marcados com `@span(nome)`:
+validate_user, request_increase, update_db e get_rate. Com o modo ligado,
+cada chamada vira um intervalo medido (tempo de relógio e tempo de CPU da
+thread) no perfil da sessão atual. Opcionalmente, cada intervalo também
+passa pelo cProfile (tempo próprio por função) e pelo tracemalloc (pico de
+memória e locais das alocações da chamada de maior pico). O relatório da
+sessão é gravado em texto em `out_dir` (padrão: perfis/).
+
+Intervalos aninhados (ex: update_db dentro de request_increase, após a
+entrevista oferecida) são medidos cada um por si; no cProfile, as funções
+do intervalo interno não entram no externo.
+
+Desligado, o decorador custa só a leitura de uma variável global por
+chamada.
+"""
+
+import cProfile
+import fnmatch
+import functools
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_DIR = 'perfis'
+TOP_FUNCTIONS = 15
+TOP_ALLOCATIONS = 10
+
+_enabled = False
+_options = {}
+_default = None
+_local = threading.local()
+
+
+def _size(n):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+class _SpanStats:
+    __slots__ = ('calls', 'wall', 'cpu', 'max_wall', 'stats', 'skipped', 'peak', 'allocations')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.max_wall = 0.0
+        self.stats = None
+        self.skipped = 0
+        self.peak = None
+        self.allocations = None
+
+
+class _Span:
+    """Uma chamada em andamento; a pilha por thread trata os intervalos aninhados."""
+
+    __slots__ = ('profiler', 'name', 'start', 'cpu', 'profile', 'mem_start', 'mem_peak', 'snapshot',
+                 'overhead_wall', 'overhead_cpu')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.profile = None
+        self.snapshot = None
+        # Tempo gasto pelo perfilamento dos intervalos internos, descontado deste
+        self.overhead_wall = 0.0
+        self.overhead_cpu = 0.0
+
+    def __enter__(self):
+        began, began_cpu = time.perf_counter(), time.thread_time()
+        stack = _stack()
+        parent = stack[-1] if stack else None
+        if parent is not None and parent.profile is not None:
+            parent.profile.disable()  # o trabalho do intervalo interno não entra no cProfile do externo
+        if self.profiler.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                # O pico do externo inclui o que aconteceu antes do interno zerar o contador
+                parent.mem_peak = max(parent.mem_peak, peak)
+            tracemalloc.reset_peak()
+            self.mem_start = self.mem_peak = current
+            self.snapshot = tracemalloc.take_snapshot()
+        if self.profiler.cprofile:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                self.profile = profile
+            except ValueError:
+                pass  # outro profiler ativo (ex: Python 3.12+ com outra thread perfilando)
+        stack.append(self)
+        self.cpu = time.thread_time()
+        self.start = time.perf_counter()
+        if parent is not None:
+            parent.overhead_wall += self.start - began
+            parent.overhead_cpu += self.cpu - began_cpu
+        return self
+
+    def __exit__(self, *exc):
+        ended, ended_cpu = time.perf_counter(), time.thread_time()
+        wall = ended - self.start - self.overhead_wall
+        cpu = ended_cpu - self.cpu - self.overhead_cpu
+        stack = _stack()
+        stack.pop()
+        parent = stack[-1] if stack else None
+        if self.profile is not None:
+            self.profile.disable()
+        peak = allocations = None
+        if self.profiler.memory:
+            top = max(self.mem_peak, tracemalloc.get_traced_memory()[1])
+            peak = top - self.mem_start
+            if parent is not None:
+                parent.mem_peak = max(parent.mem_peak, top)
+            if self.profiler._is_new_peak(self.name, peak):
+                allocations = _allocations(self.snapshot)
+        self.profiler._record(self.name, wall, cpu, self.profile, peak, allocations)
+        if parent is not None:
+            parent.overhead_wall += time.perf_counter() - ended
+            parent.overhead_cpu += time.thread_time() - ended_cpu
+            if parent.profile is not None:
+                parent.profile.enable()
+        return False
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _allocations(before):
+    # Fora da lista: o que o próprio perfilamento aloca (snapshots, estatísticas do cProfile, filtros)
+    ignore = [tracemalloc.Filter(False, path) for path in
+              (__file__, tracemalloc.__file__, cProfile.__file__, pstats.__file__, fnmatch.__file__,
+               os.path.join(os.path.dirname(re.__file__), '*'))]
+    after = tracemalloc.take_snapshot().filter_traces(ignore)
+    diffs = after.compare_to(before.filter_traces(ignore), 'lineno')
+    return [(str(stat.traceback[0]), stat.size_diff, stat.count_diff)
+            for stat in diffs if stat.size_diff][:TOP_ALLOCATIONS]
+
+
+class Profiler:
+    """Perfil de uma sessão: estatísticas acumuladas por intervalo (thread-safe)."""
+
+    def __init__(self, label='sessao', cprofile=False, memory=False, out_dir=DEFAULT_DIR):
+        self.label = label
+        self.cprofile = cprofile
+        self.memory = memory
+        self.started = time.time()
+        self.id = uuid.uuid4().hex[:8]
+        self.path = os.path.join(out_dir or DEFAULT_DIR,
+                                 f"perfil_{datetime.fromtimestamp(self.started):%Y%m%d-%H%M%S}_{self.id}.txt")
+        self.dirty = False
+        self._spans = {}
+        self._lock = threading.Lock()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def span(self, name):
+        """Context manager que mede um intervalo com este perfil."""
+        return _Span(self, name)
+
+    def _is_new_peak(self, name, peak):
+        with self._lock:
+            stats = self._spans.get(name)
+            return stats is None or stats.peak is None or peak >= stats.peak
+
+    def _record(self, name, wall, cpu, profile, peak, allocations):
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = _SpanStats()
+            stats.calls += 1
+            stats.wall += wall
+            stats.cpu += cpu
+            stats.max_wall = max(stats.max_wall, wall)
+            if profile is not None:
+                if stats.stats is None:
+                    stats.stats = pstats.Stats(profile)
+                else:
+                    stats.stats.add(profile)
+            elif self.cprofile:
+                stats.skipped += 1
+            if peak is not None and (stats.peak is None or peak >= stats.peak):
+                stats.peak = peak
+                if allocations is not None:
+                    stats.allocations = allocations
+            self.dirty = True
+
+    def report(self):
+        """Relatório em texto: tabela dos intervalos e, se ligados, funções e alocações de cada um."""
+        with self._lock:
+            spans = sorted(self._spans.items(), key=lambda item: item[1].wall, reverse=True)
+            elapsed = time.time() - self.started
+            lines = [
+                f"Perfil da sessão {self.label} ({self.id})",
+                f"Início: {datetime.fromtimestamp(self.started):%d/%m/%Y %H:%M:%S} | duração: {elapsed:.1f} s | "
+                f"cProfile: {'sim' if self.cprofile else 'não'} | tracemalloc: {'sim' if self.memory else 'não'}",
+                "",
+            ]
+            if not spans:
+                lines.append("Nenhum intervalo registrado.")
+                return "\n".join(lines) + "\n"
+            lines.append(f"{'intervalo':<18}{'chamadas':>9}{'total (s)':>11}{'média (ms)':>12}{'máx (ms)':>11}"
+                         f"{'CPU (s)':>10}{'pico mem':>11}")
+            for name, s in spans:
+                peak = _size(s.peak) if s.peak is not None else '-'
+                lines.append(f"{name:<18}{s.calls:>9}{s.wall:>11.3f}{s.wall / s.calls * 1000:>12.2f}"
+                             f"{s.max_wall * 1000:>11.2f}{s.cpu:>10.3f}{peak:>11}")
+            for name, s in spans:
+                if s.stats is not None:
+                    lines.append(f"\n== {name}: funções com maior tempo próprio ==")
+                    if s.skipped:
+                        lines.append(f"({s.skipped} chamadas sem cProfile: outro profiler estava ativo)")
+                    buffer = io.StringIO()
+                    s.stats.stream = buffer
+                    s.stats.sort_stats('tottime').print_stats(TOP_FUNCTIONS)
+                    lines.append(buffer.getvalue().strip('\n'))
+                if s.allocations:
+                    lines.append(f"\n== {name}: alocações da chamada de maior pico ({_size(s.peak)}) ==")
+                    for where, size, count in s.allocations:
+                        lines.append(f"{_size(size):>10} {count:>+8} blocos  {where}")
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Grava o relatório em `path` (substituição atômica). Retorna o caminho."""
+        text = self.report()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, mode='w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        return self.path
+
+
+def span(name):
+    """Marca uma função como intervalo medido no modo de perfilamento."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            profiler = getattr(_local, 'profiler', None) or _default
+            if profiler is None:
+                return func(*args, **kwargs)
+            with _Span(profiler, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def configure(cprofile=False, memory=False, out_dir=None):
+    """Liga o modo de perfilamento no processo; os perfis são criados por `start_session`/`session`."""
+    global _enabled
+    _options.update(cprofile=cprofile, memory=memory, out_dir=out_dir or os.environ.get('CREDIT_PROFILE_DIR') or DEFAULT_DIR)
+    _enabled = True
+
+
+def configure_from_env():
+    """
+    Liga o modo se CREDIT_PROFILE estiver definida (e não for '0'). O valor
+    pode listar 'cprofile' e/ou 'memoria' separados por vírgula (ex:
+    CREDIT_PROFILE=cprofile,memoria); qualquer outro valor liga só os tempos.
+    Retorna True se ligou.
+    """
+    value = os.environ.get('CREDIT_PROFILE', '').strip().lower()
+    if not value or value == '0':
+        return False
+    options = {part.strip() for part in value.split(',')}
+    configure(cprofile='cprofile' in options, memory='memoria' in options)
+    return True
+
+
+def enabled():
+    return _enabled
+
+
+def start_session(label):
+    """Perfil padrão do processo (sessão do terminal), usado pelas threads sem sessão própria."""
+    global _default
+    _default = Profiler(label, **_options)
+    return _default
+
+
+@contextmanager
+def session(state, label='streamlit', key='_perfil'):
+    """
+    Perfil da sessão guardado em `state` (ex: st.session_state), ativo na
+    thread durante o bloco. Ao sair, o relatório é regravado se houve novos
+    intervalos. Com o modo desligado não faz nada.
+    """
+    if not _enabled:
+        yield None
+        return
+    profiler = state.get(key)
+    if profiler is None:
+        profiler = state[key] = Profiler(label, **_options)
+    _local.profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _local.profiler = None
+        if profiler.dirty:
+            profiler.write()
@@ -0,0 +1,209 @@
+import functools
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+from services import metrics
+from services.fx_history import record_snapshot
+from services.http_pool import get_pool
+
+DEFAULT_API_URL = "https://open.er-api.com/v6/latest/USD"
+
+
+def parse_table(status, body):
+    """
+    Valida uma resposta da API (status, corpo) e retorna a tabela de câmbio.
+
+    Um 4xx é um problema da consulta (ex: base inexistente) e vira
+    ValueError; os demais status indicam o serviço fora do ar
+    (ConnectionError), assim como as falhas de rede.
+    """
+    if 400 <= status < 500:
+        raise ValueError(f"Serviço de cotação recusou a consulta (HTTP {status}). Verifique o código da moeda.")
+    if status != 200:
+        raise ConnectionError(f"Serviço de cotação respondeu HTTP {status}")
+    metrics.FX_BYTES.inc(len(body))
+    data = json.loads(body.decode())
+    if 'rates' not in data:
+        raise ValueError("Resposta da API de cotação sem o campo 'rates'.")
+    return data
+
+
+class RateCache:
+    """
+    Cache em memória da tabela de câmbio completa da API.
+
+    - A tabela é mantida até `time_next_update_unix` (a API atualiza uma vez por dia).
+    - Misses concorrentes compartilham uma única requisição (single-flight).
+    - Depois de expirada, a última tabela conhecida continua sendo servida
+      enquanto uma atualização roda em segundo plano (stale-while-revalidate).
+    - As requisições usam conexões persistentes (services.http_pool).
+    - Sem tabela em memória, uma falha da API é repetida imediatamente às
+      consultas seguintes por `retry_interval` segundos, sem nova espera
+      pelo timeout (quem chama pode usar o histórico local nesse meio tempo).
+      Falhas de conexão (rede, timeout, 5xx) valem para todas as bases do
+      mesmo servidor: só a primeira consulta depois que a API cai espera o
+      timeout. Uma base recusada (4xx) não afeta as demais.
+    - `on_table` recebe cada tabela nova (ex: gravação no histórico local).
+    """
+
+    def __init__(self, api_url=DEFAULT_API_URL, timeout=10, default_ttl=3600,
+                 retry_interval=60, clock=time.time, on_table=None):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.default_ttl = default_ttl
+        self.retry_interval = retry_interval
+        self.clock = clock
+        self.on_table = on_table
+        self._server = urllib.parse.urlsplit(api_url).netloc
+        self._table = None
+        self._expires_at = 0.0
+        self._inflight = None
+        self._last_error = None
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def fetch(self):
+        """Busca a tabela na API (sem cache)."""
+        started = time.perf_counter()
+        try:
+            pool, path = get_pool(self.api_url, timeout=self.timeout)
+            data = parse_table(*pool.get(path))
+        except Exception as e:
+            metrics.FX_FETCHES.labels(type(e).__name__).inc()
+            raise
+        finally:
+            metrics.FX_FETCH_SECONDS.observe(time.perf_counter() - started)
+        metrics.FX_FETCHES.labels('ok').inc()
+        return data
+
+    def record_failure(self, error):
+        """Registra uma busca que falhou (por `fetch` ou por um cliente asyncio)."""
+        now = self.clock()
+        with self._lock:
+            self._last_error = error
+            self._failed_at = now
+            # Evita martelar a API quando ela está fora: adia a próxima tentativa
+            if self._table is not None:
+                self._expires_at = now + self.retry_interval
+        if isinstance(error, ConnectionError):
+            with _outages_lock:
+                _outages[self._server] = (now, error)
+
+    def recent_failure(self):
+        """Erro de uma falha desta URL, ou de conexão com o mesmo servidor, há menos de `retry_interval` s; senão None."""
+        now = self.clock()
+        if self._failed_at is not None and now - self._failed_at < self.retry_interval:
+            return self._last_error
+        outage = _outages.get(self._server)
+        if outage is not None and now - outage[0] < self.retry_interval:
+            return outage[1]
+        return None
+
+    def _refresh(self, event):
+        try:
+            data = self.fetch()
+        except Exception as e:
+            self.record_failure(e)
+        else:
+            self.store(data)
+        finally:
+            with self._lock:
+                self._inflight = None
+            event.set()
+
+    def store(self, data):
+        """Guarda uma tabela recém-obtida da API (por `fetch` ou por um cliente asyncio)."""
+        now = self.clock()
+        expires_at = data.get('time_next_update_unix') or 0
+        if expires_at <= now:
+            expires_at = now + self.default_ttl
+        with self._lock:
+            self._table = data
+            self._expires_at = expires_at
+            self._last_error = None
+            self._failed_at = None
+        with _outages_lock:
+            _outages.pop(self._server, None)
+        if self.on_table is not None:
+            try:
+                self.on_table(data)
+            except Exception:
+                # O histórico é acessório: a cotação segue mesmo se a gravação falhar
+                metrics.ERRORS.labels('historico_cambio').inc()
+
+    def peek(self, stale=False):
+        """Tabela em cache ainda válida (ou a última conhecida, com `stale=True`), sem buscar na API."""
+        with self._lock:
+            if self._table is not None and (stale or self.clock() < self._expires_at):
+                return self._table
+            return None
+
+    def get_table(self):
+        """Retorna a tabela de câmbio, buscando na API apenas quando necessário."""
+        with self._lock:
+            table = self._table
+            if table is not None and self.clock() < self._expires_at:
+                metrics.FX_CACHE.labels('hit').inc()
+                return table
+
+            event = self._inflight
+            if table is None and event is None:
+                error = self.recent_failure()
+                if error is not None:
+                    metrics.FX_CACHE.labels('erro').inc()
+                    raise error
+            leader = event is None
+            if leader:
+                event = self._inflight = threading.Event()
+
+            metrics.FX_CACHE.labels('miss' if table is None else 'stale').inc()
+            if table is not None:
+                # Tabela vencida: serve a última conhecida e atualiza em segundo plano
+                if leader:
+                    threading.Thread(target=self._refresh, args=(event,), daemon=True).start()
+                return table
+
+        if leader:
+            self._refresh(event)
+        else:
+            event.wait()
+
+        with self._lock:
+            if self._table is not None:
+                return self._table
+            raise self._last_error
+
+    def get_rate(self, currency):
+        """Cotação de 1 unidade da moeda base para `currency`, ou None se desconhecida."""
+        return self.get_table().get('rates', {}).get(currency)
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = 0.0
+            self._failed_at = None
+
+
+# Servidor (host:porta) -> (instante, erro) da última falha de conexão, compartilhado entre as bases
+_outages = {}
+_outages_lock = threading.Lock()
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_rate_cache(api_url=DEFAULT_API_URL, data_dir=None):
+    """
+    Retorna a instância compartilhada de RateCache para a URL informada. As
+    tabelas são gravadas no histórico local de `data_dir` (o diretório do
+    armazenamento em uso; sem ele, data/).
+    """
+    key = (api_url, data_dir and os.path.abspath(data_dir))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = RateCache(api_url, on_table=functools.partial(record_snapshot, data_dir=data_dir))
+            _caches[key] = cache
+        return cache
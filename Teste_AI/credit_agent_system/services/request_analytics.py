@@ -0,0 +1,271 @@
+"""
+Agregados incrementais do log de solicitações de aumento de limite.
+
+Lê `solicitacoes_aumento_limite.csv` (gravado por `log_request`) e mantém,
+por faixa de score, por dia e por faixa de valor solicitado: nº de pedidos,
+aprovações, taxa de aprovação e soma/média do limite solicitado e do atual.
+
+O estado fica em um checkpoint JSON ao lado do log, com os segmentos já
+processados (storage.log_segments) e o offset em bytes da última linha lida
+do arquivo atual. Cada `refresh()` lê apenas o que foi anexado depois dele,
+em blocos; uma linha ainda incompleta (gravação em andamento) fica para a
+próxima leitura. Se o arquivo foi rolado para um segmento, a leitura
+continua do mesmo offset dentro do segmento. Se o log for truncado ou
+substituído (o trecho antes do offset não confere mais), os agregados são
+refeitos do início.
+
+O log não guarda o score: a faixa vem do score atual do cliente no momento
+em que a linha é processada (junção com a base via `Storage.get_clients`).
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+import zlib
+
+from services import metrics
+from storage.log_segments import SegmentedLog
+
+CHECKPOINT_SUFFIX = '.agregados.json'
+CHECKPOINT_VERSION = 1
+DEFAULT_AMOUNT_EDGES = (1000, 2000, 5000, 10000, 20000, 50000)
+FINGERPRINT_BYTES = 256
+DIMENSIONS = ('faixa_score', 'dia', 'faixa_valor')
+UNKNOWN_BAND = 'desconhecida'
+
+
+def _empty():
+    return {'pedidos': 0, 'aprovados': 0, 'soma_solicitado': 0.0, 'soma_atual': 0.0}
+
+
+def amount_bucket(value, edges=DEFAULT_AMOUNT_EDGES):
+    """Rótulo da faixa de valor solicitado (ex: '2000-5000', '50000+')."""
+    lower = 0
+    for edge in edges:
+        if value < edge:
+            return f"{lower:g}-{edge:g}"
+        lower = edge
+    return f"{lower:g}+"
+
+
+def summarize(totals):
+    """Acrescenta taxa de aprovação e médias a um agregado (dict novo)."""
+    count = totals['pedidos']
+    return dict(
+        totals,
+        taxa_aprovacao=totals['aprovados'] / count if count else 0.0,
+        media_solicitado=totals['soma_solicitado'] / count if count else 0.0,
+        media_atual=totals['soma_atual'] / count if count else 0.0,
+    )
+
+
+class RequestAnalytics:
+    """Agregados do log CSV de solicitações com leitura incremental (thread-safe)."""
+
+    def __init__(self, storage, log_path=None, checkpoint_path=None, amount_edges=DEFAULT_AMOUNT_EDGES,
+                 chunk_bytes=4 * 1024 * 1024):
+        self.storage = storage
+        self.log_path = log_path or getattr(storage, 'requests_path', None)
+        if not self.log_path:
+            raise ValueError("Agregados disponíveis apenas para o log CSV de solicitações (backends 'csv' e 'sharded').")
+        self.checkpoint_path = checkpoint_path or os.path.splitext(self.log_path)[0] + CHECKPOINT_SUFFIX
+        self.segments = SegmentedLog(self.log_path)
+        self.amount_edges = tuple(amount_edges)
+        self.chunk_bytes = chunk_bytes
+        self._state = None
+        self._lock = threading.Lock()
+
+    # --- Checkpoint ---
+
+    def _initial_state(self):
+        return {
+            'versao': CHECKPOINT_VERSION,
+            'faixas_valor': list(self.amount_edges),
+            'segmentos': [],
+            'offset': 0,
+            'assinatura': 0,
+            'colunas': None,
+            'invalidos': 0,
+            'total': _empty(),
+            **{dimension: {} for dimension in DIMENSIONS},
+        }
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, mode='r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return self._initial_state()
+        if state.get('versao') != CHECKPOINT_VERSION or tuple(state.get('faixas_valor', ())) != self.amount_edges:
+            return self._initial_state()
+        return state
+
+    def _save_checkpoint(self, state):
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, mode='w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _tail(self, f, offset):
+        """Bytes imediatamente antes do offset (seu CRC detecta log truncado ou substituído)."""
+        start = max(0, offset - FINGERPRINT_BYTES)
+        f.seek(start)
+        return f.read(offset - start)
+
+    def _resumable(self, state, stems):
+        """O offset do checkpoint ainda vale para o arquivo em que parou (o 1º segmento novo ou o ativo)?"""
+        if state['offset'] == 0:
+            return True
+        done = set(state['segmentos'])
+        current = next((stem for stem in stems if stem not in done), None)
+        try:
+            f = self.segments.open_segment(current) if current else open(self.log_path, mode='rb')
+        except FileNotFoundError:
+            return False
+        with f:
+            tail = self._tail(f, state['offset'])
+        return len(tail) == min(state['offset'], FINGERPRINT_BYTES) and zlib.crc32(tail) == state['assinatura']
+
+    # --- Leitura incremental ---
+
+    def _columns(self, header):
+        names = [name.strip() for name in header]
+        try:
+            return {name: names.index(name) for name in
+                    ('cpf_cliente', 'data_hora_solicitacao', 'limite_atual', 'novo_limite_solicitado', 'status_pedido')}
+        except ValueError:
+            raise ValueError(f"Cabeçalho inválido em {self.log_path}: {','.join(names)}")
+
+    def _aggregate(self, state, rows):
+        cols = state['colunas']
+        parsed = []
+        for row in rows:
+            if not row:
+                continue
+            try:
+                parsed.append((
+                    row[cols['cpf_cliente']].strip(),
+                    row[cols['data_hora_solicitacao']][:10],
+                    float(row[cols['limite_atual']]),
+                    float(row[cols['novo_limite_solicitado']]),
+                    row[cols['status_pedido']].strip() == 'aprovado',
+                ))
+            except (IndexError, ValueError):
+                state['invalidos'] += 1
+
+        # Junção com a base: um lote de clientes por bloco lido
+        clients = self.storage.get_clients([cpf for cpf, *_ in parsed])
+        for (cpf, day, current, requested, approved), client in zip(parsed, clients):
+            if client is not None:
+                band = self.storage.score_band(float(client.get('score') or 0))
+            else:
+                band = UNKNOWN_BAND
+            keys = (band, day, amount_bucket(requested, self.amount_edges))
+            for totals in [state['total']] + [state[d].setdefault(k, _empty()) for d, k in zip(DIMENSIONS, keys)]:
+                totals['pedidos'] += 1
+                totals['aprovados'] += approved
+                totals['soma_solicitado'] += requested
+                totals['soma_atual'] += current
+        return len(parsed)
+
+    def _consume(self, state, f):
+        """Agrega as linhas completas de `f` a partir do offset do checkpoint."""
+        processed = 0
+        tail = self._tail(f, state['offset'])
+        while True:
+            data = f.read(self.chunk_bytes)
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                # Linha maior que o bloco: lê até o fim dela (sem fim de linha, ainda está sendo gravada)
+                rest = f.readline()
+                if not rest.endswith(b'\n'):
+                    break
+                data += rest
+                end = len(data)
+            rows = csv.reader(data[:end].decode('utf-8').splitlines())
+            if state['colunas'] is None:
+                state['colunas'] = self._columns(next(rows, []))
+            processed += self._aggregate(state, rows)
+            state['offset'] += end
+            tail = (tail + data[:end])[-FINGERPRINT_BYTES:]
+            state['assinatura'] = zlib.crc32(tail)
+            self._save_checkpoint(state)
+            if end < len(data):
+                f.seek(state['offset'])
+        return processed
+
+    def refresh(self):
+        """Processa as linhas anexadas desde o último checkpoint. Retorna o nº de linhas novas."""
+        started = time.perf_counter()
+        with self._lock:
+            state = self._state or self._load_checkpoint()
+            flush = getattr(getattr(self.storage, 'requests', None), 'flush', None)
+            if flush is not None:
+                flush()
+            processed = 0
+            stems = [stem for stem, _, _ in self.segments.segments()]
+            if not self._resumable(state, stems):
+                # Log truncado ou substituído: refaz os agregados do início
+                state = self._initial_state()
+            done = set(state['segmentos'])
+            for stem in stems:
+                if stem in done:
+                    continue
+                try:
+                    f = self.segments.open_segment(stem)
+                except FileNotFoundError:
+                    continue
+                with f:
+                    processed += self._consume(state, f)
+                # Segmento fechado: o próximo arquivo começa do zero, com o próprio cabeçalho
+                state['segmentos'].append(stem)
+                state.update(offset=0, assinatura=0, colunas=None)
+                self._save_checkpoint(state)
+            try:
+                with open(self.log_path, mode='rb') as f:
+                    processed += self._consume(state, f)
+            except FileNotFoundError:
+                pass
+            self._state = state
+        metrics.ANALYTICS_ROWS.inc(processed)
+        metrics.ANALYTICS_SECONDS.observe(time.perf_counter() - started)
+        return processed
+
+    def rebuild(self):
+        """Descarta o checkpoint e reprocessa o log inteiro."""
+        with self._lock:
+            self._state = self._initial_state()
+            self._save_checkpoint(self._state)
+        return self.refresh()
+
+    # --- Consultas ---
+
+    def report(self, refresh=True):
+        """
+        {'total': agregado, 'faixa_score'|'dia'|'faixa_valor': {chave: agregado},
+        'segmentos': segmentos fechados processados, 'offset': bytes processados
+        do arquivo ativo, 'invalidos': n}, com taxa e médias calculadas.
+        """
+        if refresh:
+            self.refresh()
+        with self._lock:
+            state = self._state or self._load_checkpoint()
+            result = {
+                'total': summarize(state['total']),
+                'segmentos': len(state['segmentos']),
+                'offset': state['offset'],
+                'invalidos': state['invalidos'],
+            }
+            for dimension in DIMENSIONS:
+                groups = state[dimension]
+                if dimension == 'faixa_valor':
+                    keys = sorted(groups, key=lambda label: float(label.rstrip('+').split('-')[0]))
+                elif dimension == 'faixa_score':
+                    keys = sorted(groups, key=lambda label: (label == UNKNOWN_BAND, label == 'fora',
+                                                             float(label.split('-')[0]) if label[0].isdigit() else 0))
+                else:
+                    keys = sorted(groups)
+                result[dimension] = {key: summarize(groups[key]) for key in keys}
+        return result
@@ -0,0 +1,89 @@
+"""
+Fórmula de score da Entrevista de Crédito (definição única dos pesos).
+
+score = (renda_mensal / (despesas + 1)) * peso_renda
+        + peso_emprego[tipo_emprego]
+        + peso_dependentes[num_dependentes]
+        + peso_dividas[tem_dividas]
+
+truncado com int() e limitado entre 0 e 1000.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele o lote é calculado item a item
+    np = None
+
+PESO_RENDA = 30
+PESO_EMPREGO = {
+    "formal": 300,
+    "autônomo": 200,
+    "desempregado": 0
+}
+PESO_DEPENDENTES = {
+    0: 100,
+    1: 80,
+    2: 60,
+    "3+": 30
+}
+PESO_DIVIDAS = {
+    "sim": -100,
+    "não": 100
+}
+SCORE_MIN = 0
+SCORE_MAX = 1000
+
+
+def dependents_key(dependents):
+    """Normaliza o número de dependentes para as chaves da fórmula (0, 1, 2 ou "3+")."""
+    return dependents if dependents in (0, 1, 2) else "3+"
+
+
+def calculate_score(data):
+    """Score de um único cliente a partir do dict coletado na entrevista."""
+    part_income = (data['income'] / (data['expenses'] + 1)) * PESO_RENDA
+    part_job = PESO_EMPREGO.get(data['job_type'], 0)
+    part_dependents = PESO_DEPENDENTES[dependents_key(data['dependents'])]
+    part_debts = PESO_DIVIDAS.get(data['has_debts'], 0)
+
+    raw_score = part_income + part_job + part_dependents + part_debts
+    return max(SCORE_MIN, min(SCORE_MAX, int(raw_score)))
+
+
+def _lookup(values, weights, default):
+    """Converte uma coluna categórica em pesos com uma máscara por categoria."""
+    if not (isinstance(values, np.ndarray) and values.dtype.kind in 'biuf'):
+        # dtype=object preserva tipos mistos (ex: 0, 1, "3+") sem convertê-los em texto
+        values = np.array(values, dtype=object)
+    result = np.full(values.shape, default, dtype=np.float64)
+    for key, weight in weights.items():
+        result[values == key] = weight
+    return result
+
+
+def calculate_scores(income, expenses, job_type, dependents, has_debts):
+    """
+    Versão vetorizada de `calculate_score` para carteiras inteiras.
+
+    Recebe colunas (sequências do mesmo tamanho) e retorna um array de
+    scores inteiros, idêntico ao cálculo escalar item a item.
+    """
+    if np is None:
+        return [
+            calculate_score({"income": i, "expenses": e, "job_type": j, "dependents": d, "has_debts": h})
+            for i, e, j, d, h in zip(income, expenses, job_type, dependents, has_debts)
+        ]
+
+    income = np.asarray(income, dtype=np.float64)
+    expenses = np.asarray(expenses, dtype=np.float64)
+
+    part_income = (income / (expenses + 1)) * PESO_RENDA
+    part_job = _lookup(job_type, PESO_EMPREGO, 0)
+    # Qualquer valor diferente de 0, 1 e 2 cai na faixa "3+"
+    part_dependents = _lookup(dependents, {k: v for k, v in PESO_DEPENDENTES.items() if k != "3+"},
+                              PESO_DEPENDENTES["3+"])
+    part_debts = _lookup(has_debts, PESO_DIVIDAS, 0)
+
+    # Mesma ordem de soma do cálculo escalar para obter o mesmo arredondamento
+    raw_score = part_income + part_job + part_dependents + part_debts
+    return np.clip(np.trunc(raw_score), SCORE_MIN, SCORE_MAX).astype(np.int64)
@@ -0,0 +1,43 @@
+import os
+import threading
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+DEFAULT_DB_FILE = 'credito.db'
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def _create(spec, data_dir):
+    kind, _, arg = spec.partition(':')
+    if kind == 'csv':
+        from storage.csv_storage import CsvStorage
+        return CsvStorage(arg or data_dir)
+    if kind == 'sharded':
+        from storage.sharded_storage import ShardedCsvStorage
+        return ShardedCsvStorage(data_dir, arg or None)
+    if kind == 'sqlite':
+        from storage.sqlite_storage import SqliteStorage
+        path = arg or DEFAULT_DB_FILE
+        if not os.path.isabs(path):
+            path = os.path.join(data_dir, path)
+        return SqliteStorage(path)
+    raise ValueError(f"Backend de armazenamento desconhecido: '{spec}' (use 'csv', 'sharded' ou 'sqlite[:arquivo.db]').")
+
+
+def open_storage(spec=None, data_dir=DEFAULT_DATA_DIR):
+    """
+    Retorna a instância compartilhada do Storage descrito por `spec`.
+
+    Formatos: 'csv' (padrão, arquivos em `data_dir`), 'csv:<diretório>',
+    'sharded[:<diretório dos shards>]' e 'sqlite[:arquivo.db]' (relativo a
+    `data_dir`). Sem `spec`, usa a variável de ambiente CREDIT_STORAGE.
+    """
+    spec = spec or os.environ.get('CREDIT_STORAGE', 'csv')
+    key = (spec, os.path.abspath(data_dir))
+    with _instances_lock:
+        storage = _instances.get(key)
+        if storage is None:
+            storage = _create(spec, data_dir)
+            _instances[key] = storage
+        return storage
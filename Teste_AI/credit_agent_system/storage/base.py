@@ -0,0 +1,93 @@
+CLIENT_FIELDS = ['cpf', 'data_nascimento', 'nome', 'score', 'limite_atual']
+
+
+class Storage:
+    """
+    Interface de armazenamento usada pelos agentes e pela interface Streamlit.
+
+    Os registros de cliente são dicts com as chaves de CLIENT_FIELDS e valores
+    em texto, no mesmo formato das linhas de clientes.csv.
+    """
+
+    #: Descrição do local dos dados, usada em mensagens de erro
+    location = ''
+    #: Diretório dos arquivos auxiliares do backend (ex: histórico de câmbio); None usa data/
+    data_dir = None
+
+    def get_client(self, cpf):
+        """Registro do cliente ou None."""
+        raise NotImplementedError
+
+    def get_clients(self, cpfs):
+        """Consulta em lote: lista com o registro de cada CPF (ou None), somente leitura."""
+        return [self.get_client(cpf) for cpf in cpfs]
+
+    def authenticate(self, cpf, dob):
+        """Registro do cliente se CPF e data de nascimento conferem, senão None."""
+        client = self.get_client(cpf)
+        if client is not None and client['data_nascimento'].strip() == dob.strip():
+            return client
+        return None
+
+    def update_score(self, cpf, new_score):
+        """Atualiza o score do cliente. Retorna False se o CPF não existir."""
+        raise NotImplementedError
+
+    def iter_clients(self):
+        """Itera sobre todos os registros de clientes."""
+        raise NotImplementedError
+
+    def score_bands(self):
+        """Faixas de score_limite como dicts (min_score, max_score, max_limite)."""
+        raise NotImplementedError
+
+    def max_limit(self, score):
+        """Limite máximo permitido para o score."""
+        raise NotImplementedError
+
+    def max_limits(self, scores):
+        """Versão em lote de `max_limit`."""
+        return [self.max_limit(score) for score in scores]
+
+    def version(self):
+        """
+        Marcador que muda sempre que clientes ou faixas mudam no meio físico
+        (inclusive por outro processo). Usado por caches acima do Storage.
+        """
+        raise NotImplementedError
+
+    def clients_version(self):
+        """
+        Marcador que muda quando o conjunto de CPFs pode ter mudado. Usado
+        para refazer o filtro da pré-checagem de CPF (padrão: `version`).
+        """
+        return self.version()
+
+    def requests_version(self):
+        """
+        Marcador que muda quando o log de solicitações muda (inclusive por
+        outro processo), para caches do histórico. None quando `version` já
+        cobre o log (padrão).
+        """
+        return None
+
+    def score_band(self, score):
+        """Rótulo da faixa de score_limite que contém o score (ex: '301-600')."""
+        raise NotImplementedError
+
+    def log_request(self, cpf, current, requested, status):
+        """Registra uma solicitação de aumento de limite."""
+        raise NotImplementedError
+
+    def iter_requests(self):
+        """Itera sobre as solicitações registradas (dicts no formato de solicitacoes_aumento_limite.csv)."""
+        raise NotImplementedError
+
+    def request_history(self, cpf, limit=10):
+        """Solicitações do CPF, da mais recente para a mais antiga (no máximo `limit`)."""
+        cpf = cpf.strip()
+        rows = [row for row in self.iter_requests() if row['cpf_cliente'].strip() == cpf]
+        return rows[::-1][:limit]
+
+    def close(self):
+        """Libera recursos (arquivos, conexões, threads de escrita)."""
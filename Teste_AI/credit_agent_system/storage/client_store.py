@@ -0,0 +1,155 @@
+import csv
+import os
+import threading
+import time
+
+from services import metrics
+from storage.client_table import ClientTable
+from storage.file_watch import WatchedFile
+from storage.offset_index import CpfOffsetIndex, IndexUnavailable
+from storage.score_journal import ScoreJournal
+
+
+class ClientStore:
+    """
+    Índice em memória de clientes.csv chaveado por CPF.
+
+    O arquivo é lido uma única vez e recarregado apenas quando muda
+    (mtime/tamanho) ou após `invalidate()`. Os registros ficam em uma
+    ClientTable (colunas compactas, busca binária por CPF), de modo que a
+    base inteira cabe em memória mesmo com milhões de clientes. Atualizações
+    de score vão para um ScoreJournal e são aplicadas por cima do arquivo base.
+
+    Se existir o sidecar de offsets (`clientes.csv.idx`, ver CpfOffsetIndex),
+    consultas por CPF feitas antes da carga da tabela leem só a linha do
+    cliente, sem carregar a base; a tabela é carregada apenas por operações
+    que precisem dela inteira (consultas em lote, contagem).
+    """
+
+    def __init__(self, data_path):
+        self.data_path = data_path
+        self.fieldnames = []
+        self._table = ClientTable()
+        self._watch = WatchedFile(data_path)
+        self._lock = threading.Lock()
+        self.offsets = CpfOffsetIndex(data_path)
+        self.journal = ScoreJournal(data_path, on_compacted=self._on_compacted)
+
+    def _load(self):
+        # Base e overlay são lidos sem compactação em andamento, para não perder
+        # atualizações que estejam migrando do journal para o arquivo
+        started = time.perf_counter()
+        with self.journal.paused():
+            signature = self._watch.current_signature()
+            with open(self.data_path, mode='r', encoding='utf-8') as csvfile:
+                reader = csv.reader(csvfile)
+                fieldnames = next(reader, [])
+                table = ClientTable.from_records(reader, fieldnames)
+            for cpf, score in self.journal.overlay().items():
+                table.set_score(cpf, score)
+        self.fieldnames = fieldnames
+        self._table = table
+        self._watch.mark(signature)
+        metrics.FILE_LOADS.labels('clientes').inc()
+        metrics.FILE_BYTES.labels('clientes').inc(signature[1])
+        metrics.FILE_ROWS.labels('clientes').inc(len(table))
+        metrics.FILE_LOAD_SECONDS.labels('clientes').observe(time.perf_counter() - started)
+
+    def _ensure_fresh(self):
+        if self._watch.changed():
+            with self._lock:
+                if self._watch.changed():
+                    self._load()
+
+    def _lookup(self, cpf):
+        if not self._watch.changed():
+            return self._table.get(cpf)
+        # Tabela não carregada (ou desatualizada): leitura pontual pelo sidecar, se houver.
+        # O journal é consultado antes da linha: se uma compactação o esvaziar
+        # no meio, a linha já vem do arquivo novo, que contém o score
+        score = self.journal.score_of(cpf)
+        indexed = self.offsets.current()
+        if indexed is not None:
+            try:
+                row = indexed.get(cpf)
+            except IndexUnavailable:
+                pass  # arquivo substituído durante a leitura: usa a tabela
+            else:
+                if row is not None and score is not None:
+                    row['score'] = score
+                return row
+        self._ensure_fresh()
+        return self._table.get(cpf)
+
+    def get(self, cpf):
+        """Retorna uma cópia do registro do cliente ou None."""
+        row = self._lookup(cpf.strip())
+        return dict(row) if row is not None else None
+
+    def get_many(self, cpfs):
+        """
+        Consulta em lote: lista com o registro de cada CPF (ou None).
+
+        Os registros são visões da tabela (ClientRecord), sem cópia — somente leitura.
+        """
+        self._ensure_fresh()
+        table = self._table
+        return [table.get(cpf) for cpf in cpfs]
+
+    def authenticate(self, cpf, dob):
+        """Retorna o registro se CPF e data de nascimento conferem, senão None."""
+        row = self.get(cpf)
+        if row is not None and row['data_nascimento'].strip() == dob.strip():
+            return row
+        return None
+
+    def update_score(self, cpf, new_score):
+        """Registra o novo score no journal e no índice. Retorna False se o CPF não existir."""
+        cpf = cpf.strip()
+        if self._lookup(cpf) is None:
+            return False
+        with self._lock:
+            self.journal.append(cpf, new_score)
+            # Tabela desatualizada (ou nunca carregada) recebe o journal na próxima carga
+            if self._watch.signature is not None and not self._watch.changed():
+                self._table.set_score(cpf, new_score)
+        return True
+
+    def _on_compacted(self, old_signature, new_signature):
+        # A compactação só incorpora ao arquivo o que já está no índice:
+        # se carregamos exatamente a versão anterior, não há o que reler.
+        with self._lock:
+            if self._watch.signature == old_signature:
+                self._watch.mark(new_signature)
+        # O arquivo foi reescrito: o sidecar é refeito aqui, na thread de
+        # compactação, e não na próxima consulta
+        self.offsets.refresh()
+
+    def close(self):
+        self.journal.close()
+
+    def __contains__(self, cpf):
+        return self._lookup(cpf.strip()) is not None
+
+    def __len__(self):
+        self._ensure_fresh()
+        return len(self._table)
+
+    def invalidate(self):
+        """Força a releitura na próxima consulta (usar após escrever no arquivo)."""
+        self._watch.invalidate()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_client_store(data_path):
+    """Retorna a instância compartilhada de ClientStore para o arquivo informado."""
+    key = os.path.abspath(data_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ClientStore(data_path)
+            _stores[key] = store
+        return store
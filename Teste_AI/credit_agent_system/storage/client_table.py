@@ -0,0 +1,275 @@
+import re
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from storage.base import CLIENT_FIELDS
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele a ordenação da carga usa sorted()
+    np = None
+
+CPF_DIGITS = 11
+SCORE_RANGE = (-32768, 32767)
+# Só dígitos ASCII: str.isdigit() também aceita '²' e afins, que int() rejeita
+_DIGITS = re.compile(r'[0-9]+')
+_SCORE = re.compile(r'-?[0-9]+')
+
+
+def _parse_score(text):
+    """'-12' -> -12, ou None se o texto não for um inteiro simples."""
+    return int(text) if _SCORE.fullmatch(text) else None
+
+
+def _pack_dob(text):
+    """'DD/MM/AAAA' -> AAAAMMDD (int), ou None se o texto não estiver nesse formato exato."""
+    if len(text) != 10 or text[2] != '/' or text[5] != '/':
+        return None
+    day, month, year = text[0:2], text[3:5], text[6:10]
+    if not (_DIGITS.fullmatch(day) and _DIGITS.fullmatch(month) and _DIGITS.fullmatch(year)):
+        return None
+    return int(year) * 10000 + int(month) * 100 + int(day)
+
+
+def _unpack_dob(packed):
+    return f"{packed % 100:02d}/{packed // 100 % 100:02d}/{packed // 10000:04d}"
+
+
+def _to_cents(text):
+    """'1000.00' -> 100000, ou None se o texto não for um valor com até 2 casas decimais."""
+    whole, _, frac = text.partition('.')
+    if not _DIGITS.fullmatch(whole) or len(frac) > 2 or (frac and not _DIGITS.fullmatch(frac)):
+        return None
+    return int(whole) * 100 + int(frac.ljust(2, '0') or 0)
+
+
+class ClientRecord(Mapping):
+    """
+    Visão de um cliente dentro da ClientTable (sem cópia dos dados).
+
+    Funciona como o dict de texto do restante do sistema (`record['nome']`,
+    `record.get('score')`, `dict(record)`) e expõe os valores já tipados em
+    `score_value` e `limite_centavos`, sem float() a cada acesso.
+    """
+
+    __slots__ = ('_table', '_i')
+
+    def __init__(self, table, i):
+        self._table = table
+        self._i = i
+
+    @property
+    def cpf(self):
+        return f"{self._table.cpfs[self._i]:0{CPF_DIGITS}d}"
+
+    @property
+    def nome(self):
+        table, i = self._table, self._i
+        return table.names[table.name_offsets[i]:table.name_offsets[i + 1]].decode('utf-8')
+
+    @property
+    def data_nascimento(self):
+        return _unpack_dob(self._table.dobs[self._i])
+
+    @property
+    def score_value(self):
+        return self._table.scores[self._i]
+
+    @property
+    def limite_centavos(self):
+        return self._table.limits[self._i]
+
+    def __getitem__(self, key):
+        if key == 'cpf':
+            return self.cpf
+        if key == 'nome':
+            return self.nome
+        if key == 'data_nascimento':
+            return self.data_nascimento
+        if key == 'score':
+            return str(self.score_value)
+        if key == 'limite_atual':
+            cents = self.limite_centavos
+            return f"{cents // 100}.{cents % 100:02d}"
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(CLIENT_FIELDS)
+
+    def __len__(self):
+        return len(CLIENT_FIELDS)
+
+    def __repr__(self):
+        return f"ClientRecord({dict(self)!r})"
+
+
+class ClientTable:
+    """
+    Base de clientes em colunas compactas, para bases de milhões de registros.
+
+    - CPF: inteiro de 64 bits, colunas ordenadas por CPF (busca binária);
+    - data de nascimento: AAAAMMDD em 32 bits;
+    - score: `array('h')`; limite_atual: centavos em 64 bits;
+    - nomes: um único blob UTF-8 com vetor de offsets.
+
+    Cada cliente ocupa algumas dezenas de bytes, contra centenas de um dict de
+    strings. Registros que não cabem nesse formato (CPF fora do padrão,
+    colunas extras, valores com mais casas decimais...) ficam como dicts em
+    `overflow`, sem perda de informação.
+    """
+
+    def __init__(self):
+        self.cpfs = array('q')
+        self.dobs = array('i')
+        self.scores = array('h')
+        self.limits = array('q')
+        self.names = b''
+        self.name_offsets = array('q', [0])
+        self.overflow = {}
+
+    @classmethod
+    def from_rows(cls, rows, fieldnames=CLIENT_FIELDS):
+        """Constrói a tabela a partir de dicts no formato de clientes.csv."""
+        fieldnames = list(fieldnames)
+        return cls.from_records(([row.get(name) for name in fieldnames] for row in rows), fieldnames)
+
+    @classmethod
+    def from_records(cls, records, fieldnames):
+        """
+        Constrói a tabela a partir de listas de valores na ordem de `fieldnames`
+        (as linhas de um csv.reader), sem montar um dict por linha.
+        """
+        position = {name: i for i, name in enumerate(fieldnames)}
+        if not {'cpf', 'data_nascimento', 'nome'} <= position.keys():
+            return cls()
+        i_cpf, i_dob, i_nome = position['cpf'], position['data_nascimento'], position['nome']
+        i_score, i_limit = position.get('score'), position.get('limite_atual')
+        extra = [i for name, i in position.items() if name not in CLIENT_FIELDS]
+        width = len(fieldnames)
+        cpfs, dobs, scores, limits, seqs = array('q'), array('i'), array('h'), array('q'), array('q')
+        names = bytearray()
+        name_ends = array('q')
+        overflow = {}
+        low, high = SCORE_RANGE
+
+        for seq, values in enumerate(records):
+            if not values:
+                continue  # linha em branco (o DictReader também as ignora)
+            if len(values) != width:
+                values = (list(values) + [None] * width)[:width]
+            cpf = (values[i_cpf] or '').strip()
+            dob = _pack_dob((values[i_dob] or '').strip())
+            score_text = ((values[i_score] if i_score is not None else None) or '0').strip()
+            score = _parse_score(score_text)
+            cents = _to_cents(((values[i_limit] if i_limit is not None else None) or '0').strip())
+            packable = (
+                len(cpf) == CPF_DIGITS and _DIGITS.fullmatch(cpf) and dob is not None
+                and score is not None and low <= score <= high and cents is not None
+                and not (extra and any(values[i] for i in extra))
+            )
+            if not packable:
+                row = {name: values[i] for name, i in position.items()}
+                row['cpf'] = cpf
+                overflow[cpf] = (seq, row)
+                continue
+            cpfs.append(int(cpf))
+            dobs.append(dob)
+            scores.append(score)
+            limits.append(cents)
+            seqs.append(seq)
+            names += (values[i_nome] or '').encode('utf-8')
+            name_ends.append(len(names))
+
+        table = cls()
+        n = len(cpfs)
+        if all(cpfs[i] < cpfs[i + 1] for i in range(n - 1)) and not any(
+                _DIGITS.fullmatch(cpf) and len(cpf) == CPF_DIGITS for cpf in overflow):
+            # Arquivo já ordenado por CPF e sem repetições (o caso comum): as colunas são usadas como estão
+            table.cpfs, table.dobs, table.scores, table.limits = cpfs, dobs, scores, limits
+            table.names = bytes(names)
+            table.name_offsets = array('q', [0]) + name_ends
+            table.overflow = {cpf: row for cpf, (_, row) in overflow.items()}
+            return table
+
+        if np is not None and n:
+            order = np.argsort(np.frombuffer(cpfs, dtype=np.int64), kind='stable').tolist()
+        else:
+            order = sorted(range(n), key=cpfs.__getitem__)
+
+        blob = bytes(names)
+        del names
+        pieces = []
+        for pos, i in enumerate(order):
+            # CPF repetido: vale a última ocorrência no arquivo, como no índice por dict
+            if pos + 1 < n and cpfs[order[pos + 1]] == cpfs[i]:
+                continue
+            key = f"{cpfs[i]:0{CPF_DIGITS}d}"
+            if key in overflow:
+                if overflow[key][0] > seqs[i]:
+                    continue
+                del overflow[key]
+            start = name_ends[i - 1] if i else 0
+            pieces.append(blob[start:name_ends[i]])
+            table.cpfs.append(cpfs[i])
+            table.dobs.append(dobs[i])
+            table.scores.append(scores[i])
+            table.limits.append(limits[i])
+            table.name_offsets.append(table.name_offsets[-1] + name_ends[i] - start)
+        table.names = b''.join(pieces)
+        table.overflow = {cpf: row for cpf, (_, row) in overflow.items()}
+        return table
+
+    def _position(self, cpf):
+        if len(cpf) != CPF_DIGITS or not _DIGITS.fullmatch(cpf):
+            return -1
+        key = int(cpf)
+        i = bisect_left(self.cpfs, key)
+        return i if i < len(self.cpfs) and self.cpfs[i] == key else -1
+
+    def get(self, cpf):
+        """Registro (ClientRecord, ou dict para registros fora do formato compacto) ou None."""
+        row = self.overflow.get(cpf)
+        if row is not None:
+            return row
+        i = self._position(cpf)
+        return ClientRecord(self, i) if i >= 0 else None
+
+    def set_score(self, cpf, score):
+        """Atualiza o score no lugar. Retorna False se o CPF não existir."""
+        row = self.overflow.get(cpf)
+        if row is not None:
+            row['score'] = str(score)
+            return True
+        i = self._position(cpf)
+        if i < 0:
+            return False
+        value = _parse_score(str(score))
+        if value is not None and SCORE_RANGE[0] <= value <= SCORE_RANGE[1]:
+            self.scores[i] = value
+        else:
+            # Score fora do formato compacto: o registro passa para o overflow
+            # (a posição compacta fica apenas oculta por ele)
+            self.overflow[cpf] = dict(ClientRecord(self, i), score=str(score))
+        return True
+
+    def __contains__(self, cpf):
+        return cpf in self.overflow or self._position(cpf) >= 0
+
+    def __len__(self):
+        hidden = sum(1 for cpf in self.overflow if self._position(cpf) >= 0)
+        return len(self.cpfs) - hidden + len(self.overflow)
+
+    def __iter__(self):
+        """Registros em ordem de CPF (os do overflow ao final)."""
+        overflow = self.overflow
+        for i in range(len(self.cpfs)):
+            record = ClientRecord(self, i)
+            if not overflow or record.cpf not in overflow:
+                yield record
+        yield from overflow.values()
+
+    def nbytes(self):
+        """Memória aproximada das colunas compactas (sem o overflow)."""
+        columns = (self.cpfs, self.dobs, self.scores, self.limits, self.name_offsets)
+        return sum(col.itemsize * len(col) for col in columns) + len(self.names)
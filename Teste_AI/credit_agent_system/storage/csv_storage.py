@@ -0,0 +1,86 @@
+import csv
+import os
+
+from storage.base import Storage
+from storage.client_store import get_client_store
+from storage.file_watch import file_signature
+from storage.request_log import get_request_log
+from storage.score_rules import get_score_rules
+
+CLIENTES_FILE = 'clientes.csv'
+SCORE_RULES_FILE = 'score_limite.csv'
+REQUESTS_FILE = 'solicitacoes_aumento_limite.csv'
+
+
+class CsvStorage(Storage):
+    """Armazenamento em arquivos CSV no diretório de dados (comportamento original)."""
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.clients_path = os.path.join(data_dir, CLIENTES_FILE)
+        self.rules_path = os.path.join(data_dir, SCORE_RULES_FILE)
+        self.requests_path = os.path.join(data_dir, REQUESTS_FILE)
+        self.location = self.clients_path
+        self.clients = self._open_clients()
+        self.rules = get_score_rules(self.rules_path)
+        self.requests = get_request_log(self.requests_path)
+
+    def _open_clients(self):
+        return get_client_store(self.clients_path)
+
+    def get_client(self, cpf):
+        return self.clients.get(cpf)
+
+    def get_clients(self, cpfs):
+        return self.clients.get_many(cpfs)
+
+    def authenticate(self, cpf, dob):
+        return self.clients.authenticate(cpf, dob)
+
+    def update_score(self, cpf, new_score):
+        return self.clients.update_score(cpf, new_score)
+
+    def iter_clients(self):
+        with open(self.clients_path, mode='r', encoding='utf-8') as csvfile:
+            overlay = self.clients.journal.overlay()
+            for row in csv.DictReader(csvfile):
+                score = overlay.get(row['cpf'].strip())
+                if score is not None:
+                    row['score'] = score
+                yield row
+
+    def score_bands(self):
+        with open(self.rules_path, mode='r', encoding='utf-8') as csvfile:
+            return list(csv.DictReader(csvfile))
+
+    def max_limit(self, score):
+        return self.rules.max_limit(score)
+
+    def max_limits(self, scores):
+        return self.rules.max_limits(scores)
+
+    def score_band(self, score):
+        return self.rules.band_label(score)
+
+    def version(self):
+        # As atualizações de score deste processo vão para o journal e não mudam a assinatura da base
+        return (file_signature(self.clients_path), file_signature(self.rules_path))
+
+    def requests_version(self):
+        # O arquivo ativo muda a cada lote gravado e é trocado na rolagem para um segmento
+        return file_signature(self.requests_path)
+
+    def log_request(self, cpf, current, requested, status):
+        self.requests.log(cpf, current, requested, status)
+
+    def iter_requests(self):
+        self.requests.flush()
+        yield from self.requests.segments.iter_rows()
+
+    def request_history(self, cpf, limit=10):
+        self.requests.flush()
+        return self.requests.segments.history(cpf, limit)
+
+    def close(self):
+        self.requests.flush()
+        self.clients.close()
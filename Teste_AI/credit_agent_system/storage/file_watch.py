@@ -0,0 +1,38 @@
+import os
+
+
+def file_signature(path):
+    """(mtime_ns, tamanho) do arquivo, ou None se ele não existir."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class WatchedFile:
+    """Acompanha a assinatura (mtime/tamanho) de um arquivo para detectar alterações."""
+
+    def __init__(self, path):
+        self.path = path
+        self.signature = None
+
+    def current_signature(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def changed(self):
+        """Retorna True se o arquivo mudou desde o último `mark()` (ou nunca foi lido)."""
+        if self.signature is None:
+            return True
+        try:
+            return self.current_signature() != self.signature
+        except FileNotFoundError:
+            return True
+
+    def mark(self, signature=None):
+        """Registra a assinatura atual como a versão carregada em memória."""
+        self.signature = signature if signature is not None else self.current_signature()
+
+    def invalidate(self):
+        self.signature = None
@@ -0,0 +1,394 @@
+import csv
+import gzip
+import hashlib
+import io
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import groupby
+
+from services import metrics
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele a ordenação usa sorted()
+    np = None
+
+SEGMENTS_SUFFIX = '_segmentos'
+PLAIN_SUFFIX = '.csv'
+SEALED_SUFFIX = '.csv.gz'
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'REQSEG01'
+# magic | nº de entradas; depois chaves (int64), offset do bloco gzip (int64) e posição da linha no bloco (uint32)
+INDEX_HEADER = struct.Struct('<8sq')
+BLOCK_BYTES = 64 * 1024
+CACHED_BLOCKS = 32
+CPF_COLUMN = 'cpf_cliente'
+
+
+def cpf_key(cpf):
+    """Chave de 64 bits do CPF no índice (colisões são descartadas ao ler a linha)."""
+    return int.from_bytes(hashlib.blake2b(cpf.strip().encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def _row_day(row):
+    return str(row.get('data_hora_solicitacao', ''))[:10]
+
+
+def first_day(path):
+    """Dia (AAAA-MM-DD) da primeira solicitação do arquivo, ou None se ele estiver vazio."""
+    try:
+        with open(path, mode='r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            row = next(reader, None)
+    except FileNotFoundError:
+        return None
+    return _row_day(row) if row else None
+
+
+def _stable_order(keys):
+    if np is not None:
+        return np.argsort(np.frombuffer(keys, dtype=np.int64), kind='stable').tolist()
+    return sorted(range(len(keys)), key=keys.__getitem__)
+
+
+def _parse_line(fieldnames, line):
+    values = next(csv.reader([line.decode('utf-8')]), [])
+    return dict(zip(fieldnames, values))
+
+
+class _PlainIndex:
+    """Índice em memória de um segmento ainda em CSV (o ativo ou um pendente), atualizado por append."""
+
+    def __init__(self):
+        self.identity = None
+        self.offset = 0
+        self.fieldnames = None
+        self.cpf_col = None
+        self.rows = {}
+
+    def update(self, path):
+        """Incorpora as linhas completas anexadas desde a última leitura. Retorna False se o arquivo não existir."""
+        try:
+            f = open(path, mode='rb')
+        except FileNotFoundError:
+            return False
+        with f:
+            stat = os.fstat(f.fileno())
+            identity = (stat.st_dev, stat.st_ino)
+            if identity != self.identity or stat.st_size < self.offset:
+                # Arquivo novo (segmento rolado) ou truncado: reindexa do início
+                self.__init__()
+                self.identity = identity
+            if stat.st_size == self.offset:
+                return True
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+        end = data.rfind(b'\n') + 1
+        pos = 0
+        while pos < end:
+            nl = data.index(b'\n', pos) + 1
+            line = data[pos:nl]
+            if self.fieldnames is None:
+                self.fieldnames = next(csv.reader([line.decode('utf-8')]), [])
+                self.cpf_col = self.fieldnames.index(CPF_COLUMN) if CPF_COLUMN in self.fieldnames else 0
+            elif line.strip():
+                values = next(csv.reader([line.decode('utf-8')]), [])
+                if len(values) > self.cpf_col:
+                    self.rows.setdefault(values[self.cpf_col].strip(), []).append(self.offset + pos)
+            pos = nl
+        self.offset += end
+        return True
+
+
+class SegmentedLog:
+    """
+    Log de solicitações em segmentos fechados por dia ou por tamanho.
+
+    O arquivo ativo continua sendo `solicitacoes_aumento_limite.csv`. Ao virar
+    o dia (data da primeira solicitação do arquivo) ou passar de
+    `segment_bytes`, ele é movido para `<log>_segmentos/AAAAMMDD-NNNNNN.csv`
+    (pendente) e, passados `seal_grace` segundos (tempo para outro processo
+    que ainda o tenha aberto perceber a troca), é selado: comprimido em
+    blocos gzip independentes de ~64 KB (o arquivo continua sendo um .gz
+    válido) com um índice `.idx` de CPF -> (bloco, posição da linha).
+
+    `history(cpf)` consulta o índice de cada segmento e só descomprime os
+    blocos que contêm o CPF; o arquivo ativo e os pendentes têm um índice em
+    memória atualizado incrementalmente.
+    """
+
+    def __init__(self, path, segment_bytes=16 * 1024 * 1024, roll_daily=True, seal_grace=5.0):
+        self.path = path
+        self.dir = os.path.splitext(path)[0] + SEGMENTS_SUFFIX
+        self.segment_bytes = segment_bytes
+        self.roll_daily = roll_daily
+        self.seal_grace = seal_grace
+        self._indexes = {}
+        self._plain = {}
+        self._blocks = {}
+        self._headers = {}
+        self._lock = threading.Lock()
+
+    # --- Segmentos ---
+
+    def segments(self):
+        """Lista ordenada de (nome, caminho, selado) dos segmentos fechados, do mais antigo ao mais novo."""
+        try:
+            names = os.listdir(self.dir)
+        except FileNotFoundError:
+            return []
+        found = {}
+        for name in names:
+            if name.endswith(SEALED_SUFFIX):
+                found[name[:-len(SEALED_SUFFIX)]] = True
+            elif name.endswith(PLAIN_SUFFIX):
+                found.setdefault(name[:-len(PLAIN_SUFFIX)], False)
+        return [(stem, os.path.join(self.dir, stem + (SEALED_SUFFIX if sealed else PLAIN_SUFFIX)), sealed)
+                for stem, sealed in sorted(found.items())]
+
+    def open_segment(self, stem):
+        """Arquivo binário com o conteúdo (descomprimido) do segmento."""
+        sealed = os.path.join(self.dir, stem + SEALED_SUFFIX)
+        try:
+            return open(os.path.join(self.dir, stem + PLAIN_SUFFIX), mode='rb')
+        except FileNotFoundError:
+            # Selado entre a listagem e a abertura
+            return gzip.open(sealed, mode='rb')
+
+    def roll_reason(self, segment_day, day, size):
+        """Motivo para fechar o arquivo ativo antes de gravar linhas do dia `day` ('dia', 'tamanho'), ou None."""
+        if size <= 0:
+            return None
+        if self.roll_daily and segment_day and day and day != segment_day:
+            return 'dia'
+        if self.segment_bytes and size >= self.segment_bytes:
+            return 'tamanho'
+        return None
+
+    def _next_name(self, day):
+        last = max((int(stem.rpartition('-')[2]) for stem, _, _ in self.segments()), default=0)
+        return f"{day.replace('-', '') or 'semdata'}-{last + 1:06d}"
+
+    def roll(self, reason, day=None):
+        """Move o arquivo ativo para um segmento pendente. Retorna o caminho, ou None se não houver o que mover."""
+        os.makedirs(self.dir, exist_ok=True)
+        target = os.path.join(self.dir, self._next_name(day or first_day(self.path) or '') + PLAIN_SUFFIX)
+        try:
+            os.replace(self.path, target)
+        except FileNotFoundError:
+            return None  # outro processo já rolou o arquivo
+        metrics.LOG_SEGMENT_ROLLS.labels(reason).inc()
+        return target
+
+    def seal(self, plain_path):
+        """Comprime um segmento pendente em blocos gzip e grava seu índice de CPFs."""
+        stem = os.path.basename(plain_path)[:-len(PLAIN_SUFFIX)]
+        sealed_path = os.path.join(self.dir, stem + SEALED_SUFFIX)
+        index_path = os.path.join(self.dir, stem + INDEX_SUFFIX)
+        keys, blocks, positions = array('q'), array('q'), array('I')
+
+        with open(plain_path, mode='rb') as src, open(sealed_path + '.tmp', mode='wb') as dst:
+            header = src.readline()
+            fieldnames = next(csv.reader([header.decode('utf-8')]), [])
+            cpf_col = fieldnames.index(CPF_COLUMN) if CPF_COLUMN in fieldnames else 0
+            block = [header]
+            block_size = len(header)
+
+            def write_block():
+                dst.write(gzip.compress(b''.join(block), compresslevel=6, mtime=0))
+
+            for line in src:
+                if not line.endswith(b'\n'):
+                    break  # linha truncada por queda do processo
+                if block_size >= BLOCK_BYTES:
+                    write_block()
+                    block, block_size = [], 0
+                values = next(csv.reader([line.decode('utf-8')]), [])
+                if len(values) > cpf_col:
+                    keys.append(cpf_key(values[cpf_col]))
+                    blocks.append(dst.tell())
+                    positions.append(block_size)
+                block.append(line)
+                block_size += len(line)
+            write_block()
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        order = _stable_order(keys)
+        with open(index_path + '.tmp', mode='wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(keys)))
+            for column in (keys, blocks, positions):
+                f.write(array(column.typecode, (column[i] for i in order)).tobytes())
+        # Índice antes do .gz: um segmento selado visível sempre tem índice
+        os.replace(index_path + '.tmp', index_path)
+        os.replace(sealed_path + '.tmp', sealed_path)
+        os.remove(plain_path)
+        with self._lock:
+            self._plain.pop(plain_path, None)
+        return sealed_path
+
+    def seal_pending(self, force=False):
+        """Sela os segmentos pendentes há mais de `seal_grace` segundos. Retorna quantos continuam pendentes."""
+        waiting = 0
+        for _, path, sealed in self.segments():
+            if sealed:
+                continue
+            try:
+                if not force and time.time() - os.path.getmtime(path) < self.seal_grace:
+                    waiting += 1
+                    continue
+                self.seal(path)
+            except FileNotFoundError:
+                pass  # selado por outro processo
+        return waiting
+
+    def split(self):
+        """
+        Divide o arquivo ativo em segmentos selados por dia (e por tamanho),
+        deixando-o só com o cabeçalho. Para migrar um log que cresceu sem
+        segmentação; não deve haver outro processo gravando no log.
+        """
+        try:
+            src = open(self.path, mode='r', encoding='utf-8', newline='')
+        except FileNotFoundError:
+            return 0
+        os.makedirs(self.dir, exist_ok=True)
+        created = []
+        with src:
+            reader = csv.DictReader(src)
+            fieldnames = reader.fieldnames or []
+            for day, rows in groupby(reader, key=_row_day):
+                out = None
+                for row in rows:
+                    if out is None or (self.segment_bytes and out.tell() >= self.segment_bytes):
+                        if out is not None:
+                            out.close()
+                        created.append(os.path.join(self.dir, self._next_name(day) + PLAIN_SUFFIX))
+                        out = open(created[-1], mode='w', encoding='utf-8', newline='')
+                        writer = csv.DictWriter(out, fieldnames=fieldnames)
+                        writer.writeheader()
+                        metrics.LOG_SEGMENT_ROLLS.labels('divisao').inc()
+                    writer.writerow(row)
+                if out is not None:
+                    out.close()
+        for path in created:
+            self.seal(path)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, mode='w', encoding='utf-8', newline='') as f:
+            csv.DictWriter(f, fieldnames=fieldnames).writeheader()
+        os.replace(tmp_path, self.path)
+        return len(created)
+
+    # --- Leitura ---
+
+    def iter_rows(self):
+        """Todas as solicitações (dicts), dos segmentos mais antigos ao arquivo ativo."""
+        for stem, _, _ in self.segments():
+            try:
+                with self.open_segment(stem) as f:
+                    yield from csv.DictReader(io.TextIOWrapper(f, encoding='utf-8', newline=''))
+            except FileNotFoundError:
+                continue
+        try:
+            with open(self.path, mode='r', encoding='utf-8', newline='') as f:
+                yield from csv.DictReader(f)
+        except FileNotFoundError:
+            return
+
+    def _sealed_index(self, stem):
+        index = self._indexes.get(stem)
+        if index is None:
+            with open(os.path.join(self.dir, stem + INDEX_SUFFIX), mode='rb') as f:
+                data = f.read()
+            magic, count = INDEX_HEADER.unpack_from(data)
+            if magic != INDEX_MAGIC:
+                raise ValueError(f"Índice inválido para o segmento {stem}")
+            index, pos = [], INDEX_HEADER.size
+            for typecode in 'qqI':
+                column = array(typecode)
+                column.frombytes(data[pos:pos + column.itemsize * count])
+                pos += column.itemsize * count
+                index.append(column)
+            self._indexes[stem] = index
+        return index
+
+    def _block(self, path, offset):
+        key = (path, offset)
+        data = self._blocks.get(key)
+        if data is None:
+            decompressor = zlib.decompressobj(wbits=31)
+            parts = []
+            with open(path, mode='rb') as f:
+                f.seek(offset)
+                while not decompressor.eof:
+                    chunk = f.read(16 * 1024)
+                    if not chunk:
+                        break
+                    parts.append(decompressor.decompress(chunk))
+            data = b''.join(parts)
+            if len(self._blocks) >= CACHED_BLOCKS:
+                self._blocks.pop(next(iter(self._blocks)))
+            self._blocks[key] = data
+        return data
+
+    def _sealed_rows(self, stem, path, cpf):
+        keys, blocks, positions = self._sealed_index(stem)
+        key = cpf_key(cpf)
+        lo, hi = bisect_left(keys, key), bisect_right(keys, key)
+        if lo == hi:
+            return []
+        metrics.HISTORY_SEGMENTS.labels('selado').inc()
+        fieldnames = self._headers.get(stem)
+        if fieldnames is None:
+            first = self._block(path, 0)
+            fieldnames = self._headers[stem] = next(csv.reader([first[:first.index(b'\n')].decode('utf-8')]), [])
+        rows = []
+        for i in range(lo, hi):
+            data = self._block(path, blocks[i])
+            start = positions[i]
+            row = _parse_line(fieldnames, data[start:data.index(b'\n', start) + 1])
+            if row.get(CPF_COLUMN, '').strip() == cpf:
+                rows.append(row)
+        return rows
+
+    def _plain_rows(self, path, cpf, kind):
+        index = self._plain.get(path)
+        if index is None:
+            index = self._plain[path] = _PlainIndex()
+        if not index.update(path):
+            return None
+        offsets = index.rows.get(cpf)
+        if not offsets:
+            return []
+        metrics.HISTORY_SEGMENTS.labels(kind).inc()
+        rows = []
+        with open(path, mode='rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                rows.append(_parse_line(index.fieldnames, f.readline()))
+        return rows
+
+    def history(self, cpf, limit=None):
+        """Solicitações do CPF, da mais recente para a mais antiga (no máximo `limit`)."""
+        cpf = cpf.strip()
+        found = []
+        with self._lock:
+            rows = self._plain_rows(self.path, cpf, 'ativo')
+            found.extend(reversed(rows or []))
+            for stem, path, sealed in reversed(self.segments()):
+                if limit is not None and len(found) >= limit:
+                    break
+                if sealed:
+                    rows = self._sealed_rows(stem, path, cpf)
+                else:
+                    rows = self._plain_rows(path, cpf, 'pendente')
+                    if rows is None:
+                        # Selado entre a listagem e a leitura
+                        rows = self._sealed_rows(stem, os.path.join(self.dir, stem + SEALED_SUFFIX), cpf)
+                found.extend(reversed(rows))
+        return found[:limit] if limit is not None else found
@@ -0,0 +1,296 @@
+import csv
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+
+from services import metrics
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele a ordenação usa sorted()
+    np = None
+
+INDEX_SUFFIX = '.idx'
+MAGIC = b'CPFIDX01'
+# magic | mtime_ns e tamanho do CSV indexado | nº de entradas | crc32 da linha de cabeçalho | crc32 do final do trecho indexado
+HEADER = struct.Struct('<8sqqqII')
+TAIL_BYTES = 4096
+CPF_DIGITS = 11
+# No Windows um arquivo mapeado não pode ser substituído com os.replace (o que a
+# compactação do journal faz com clientes.csv): lá as linhas são lidas com seek/read
+MAP_FILES = os.name != 'nt'
+
+
+class IndexUnavailable(Exception):
+    """O CSV não pode ser indexado por linha (CPF fora do padrão, campo com quebra de linha...)."""
+
+
+def _crc(data):
+    return zlib.crc32(data) & 0xFFFFFFFF
+
+
+def _sorted_unique(keys, offsets, lengths):
+    """Ordena as entradas por CPF; em CPFs repetidos vale a última ocorrência no arquivo."""
+    n = len(keys)
+    if all(keys[i] < keys[i + 1] for i in range(n - 1)):
+        return keys, offsets, lengths
+    if np is not None:
+        order = np.argsort(np.frombuffer(keys, dtype=np.int64), kind='stable').tolist()
+    else:
+        order = sorted(range(n), key=keys.__getitem__)
+    out = array('q'), array('q'), array('I')
+    for pos, i in enumerate(order):
+        if pos + 1 < n and keys[order[pos + 1]] == keys[i]:
+            continue
+        out[0].append(keys[i])
+        out[1].append(offsets[i])
+        out[2].append(lengths[i])
+    return out
+
+
+def _merge(old, new):
+    """
+    Mescla as entradas do sidecar atual com as das linhas anexadas (ambas
+    ordenadas); em CPFs repetidos vale a nova. Os trechos entre duas chaves
+    novas são copiados em bloco.
+    """
+    old_keys, old_offsets, old_lengths = old
+    new_keys, new_offsets, new_lengths = new
+    keys, offsets, lengths = array('q'), array('q'), array('I')
+
+    def copy(lo, hi):
+        keys.frombytes(old_keys[lo:hi].cast('B'))
+        offsets.frombytes(old_offsets[lo:hi].cast('B'))
+        lengths.frombytes(old_lengths[lo:hi].cast('B'))
+
+    lo = 0
+    for j, key in enumerate(new_keys):
+        pos = bisect_left(old_keys, key, lo)
+        copy(lo, pos)
+        keys.append(key)
+        offsets.append(new_offsets[j])
+        lengths.append(new_lengths[j])
+        lo = pos + 1 if pos < len(old_keys) and old_keys[pos] == key else pos
+    copy(lo, len(old_keys))
+    return keys, offsets, lengths
+
+
+class IndexedClients:
+    """Visão somente leitura de clientes.csv pelo sidecar: os dois arquivos mapeados em memória."""
+
+    def __init__(self, signature, read_line, fieldnames, index_data, count):
+        self.signature = signature
+        self.fieldnames = fieldnames
+        self._read_line = read_line
+        self._index = index_data
+        view = memoryview(index_data) if index_data is not None else memoryview(b'')
+        start = HEADER.size
+        self.keys = view[start:start + 8 * count].cast('q')
+        self.offsets = view[start + 8 * count:start + 16 * count].cast('q')
+        self.lengths = view[start + 16 * count:start + 20 * count].cast('I')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, cpf):
+        """Registro do CPF (dict, como uma linha do DictReader) lendo só a sua linha, ou None."""
+        if len(cpf) != CPF_DIGITS or not (cpf.isascii() and cpf.isdigit()):
+            return None  # todo CPF indexado tem 11 dígitos ASCII
+        key = int(cpf)
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return None
+        line = self._read_line(self.signature, self.offsets[i], self.lengths[i]).decode('utf-8')
+        values = next(csv.reader([line]))
+        fieldnames = self.fieldnames
+        row = dict(zip(fieldnames, values))
+        if len(values) < len(fieldnames):
+            row.update(dict.fromkeys(fieldnames[len(values):]))
+        elif len(values) > len(fieldnames):
+            row[None] = values[len(fieldnames):]
+        return row
+
+
+class CpfOffsetIndex:
+    """
+    Índice persistido de clientes.csv: sidecar `clientes.csv.idx` com as
+    entradas (cpf, offset, tamanho) da linha de cada cliente, ordenadas por CPF.
+
+    O sidecar é carimbado com mtime/tamanho do CSV. Enquanto o carimbo
+    confere, os dois arquivos são mapeados (mmap) e cada consulta faz uma
+    busca binária no sidecar e interpreta apenas a linha do cliente: nada da
+    base é carregado na partida. Se o CSV só recebeu linhas novas no final, o
+    sidecar é atualizado lendo apenas o trecho anexado; qualquer outra
+    alteração refaz o índice inteiro.
+
+    O índice é opcional: só é usado depois de criado com `build()`
+    (`python main.py index`).
+    """
+
+    def __init__(self, csv_path, index_path=None):
+        self.csv_path = csv_path
+        self.index_path = index_path or csv_path + INDEX_SUFFIX
+        self._state = None
+        self._unavailable = None
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.index_path)
+
+    def current(self):
+        """
+        Visão (IndexedClients) do CSV atual, atualizando o sidecar se preciso.
+        None se o sidecar não existir ou o CSV não puder ser indexado.
+        """
+        try:
+            st = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        state = self._state
+        if state is not None and state.signature == signature:
+            return state
+        if signature == self._unavailable or not self.exists():
+            return None
+        with self._lock:
+            state = self._state
+            if state is None or state.signature != signature:
+                try:
+                    state = self._open()
+                except IndexUnavailable:
+                    self._unavailable = signature
+                    return None
+                self._state = state
+        return state
+
+    def build(self):
+        """Cria (ou refaz) o sidecar para o CSV atual. Retorna o nº de CPFs indexados."""
+        with self._lock:
+            self._state = self._open(force=True)
+            self._unavailable = None
+            return len(self._state)
+
+    def refresh(self):
+        """Atualiza o sidecar, se existir, para o conteúdo atual do CSV (ex: após uma compactação)."""
+        return self.current() is not None
+
+    def _open(self, force=False):
+        with open(self.csv_path, mode='rb') as f:
+            # A assinatura e o mapeamento vêm do mesmo descritor: um os.replace
+            # concorrente não mistura o arquivo novo com o carimbo do antigo
+            st = os.fstat(f.fileno())
+            signature = (st.st_mtime_ns, st.st_size)
+            if st.st_size == 0:
+                self._write(signature, 0, 0, (array('q'), array('q'), array('I')))
+                return IndexedClients(signature, None, [], None, 0)
+            csv_map = mmap.mmap(f.fileno(), st.st_size, access=mmap.ACCESS_READ)
+
+        header_line = csv_map.readline()
+        fieldnames = next(csv.reader([header_line.decode('utf-8')]), [])
+        if 'cpf' not in fieldnames:
+            raise IndexUnavailable("arquivo sem a coluna cpf")
+        header_crc = _crc(header_line)
+
+        stamp = None if force else self._read_stamp()
+        if stamp is not None and stamp[:2] == signature and stamp[3] == header_crc:
+            return self._map(signature, csv_map, fieldnames)
+
+        started = time.perf_counter()
+        old = None
+        scan_from = len(header_line)
+        if stamp is not None and stamp[3] == header_crc and self._only_appended(csv_map, stamp):
+            old = self._map(stamp[:2], None, fieldnames)
+            scan_from = stamp[1]
+        new = _sorted_unique(*self._scan(csv_map, scan_from, fieldnames.index('cpf')))
+        entries = _merge((old.keys, old.offsets, old.lengths), new) if old is not None else new
+        del old
+
+        self._write(signature, header_crc, _crc(csv_map[max(0, st.st_size - TAIL_BYTES):st.st_size]), entries)
+        metrics.FILE_LOADS.labels('clientes_indice').inc()
+        metrics.FILE_BYTES.labels('clientes_indice').inc(st.st_size - scan_from)
+        metrics.FILE_ROWS.labels('clientes_indice').inc(len(new[0]))
+        metrics.FILE_LOAD_SECONDS.labels('clientes_indice').observe(time.perf_counter() - started)
+        return self._map(signature, csv_map, fieldnames)
+
+    def _read_stamp(self):
+        """(mtime_ns, tamanho, nº de entradas, crc do cabeçalho, crc do final) do sidecar, ou None."""
+        try:
+            with open(self.index_path, mode='rb') as f:
+                data = f.read(HEADER.size)
+        except FileNotFoundError:
+            return None
+        if len(data) != HEADER.size:
+            return None
+        magic, mtime_ns, size, count, header_crc, tail_crc = HEADER.unpack(data)
+        if magic != MAGIC:
+            return None
+        return mtime_ns, size, count, header_crc, tail_crc
+
+    def _only_appended(self, csv_map, stamp):
+        """True se o CSV atual começa exatamente pelo trecho já indexado (só recebeu linhas no final)."""
+        _, old_size, _, _, tail_crc = stamp
+        if not 0 < old_size < len(csv_map) or csv_map[old_size - 1:old_size] != b'\n':
+            return False
+        return _crc(csv_map[max(0, old_size - TAIL_BYTES):old_size]) == tail_crc
+
+    @staticmethod
+    def _scan(csv_map, start, cpf_pos):
+        """Entradas (cpf, offset, tamanho) das linhas a partir de `start`, na ordem do arquivo."""
+        keys, offsets, lengths = array('q'), array('q'), array('I')
+        csv_map.seek(start)
+        offset = start
+        readline = csv_map.readline
+        while True:
+            line = readline()
+            if not line:
+                break
+            stripped = line.rstrip(b'\r\n')
+            if stripped:
+                if b'"' in stripped:
+                    if stripped.count(b'"') % 2:
+                        raise IndexUnavailable("campo entre aspas com quebra de linha")
+                    values = next(csv.reader([stripped.decode('utf-8')]))
+                else:
+                    values = stripped.split(b',')
+                cpf = values[cpf_pos].strip() if cpf_pos < len(values) else ''
+                if len(cpf) != CPF_DIGITS or not cpf.isdigit():
+                    raise IndexUnavailable(f"CPF fora do padrão de {CPF_DIGITS} dígitos: {cpf!r}")
+                keys.append(int(cpf))
+                offsets.append(offset)
+                lengths.append(len(stripped))
+            offset += len(line)
+        return keys, offsets, lengths
+
+    def _write(self, signature, header_crc, tail_crc, entries):
+        keys, offsets, lengths = entries
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, mode='wb') as f:
+            f.write(HEADER.pack(MAGIC, signature[0], signature[1], len(keys), header_crc, tail_crc))
+            f.write(keys.tobytes())
+            f.write(offsets.tobytes())
+            f.write(lengths.tobytes())
+        os.replace(tmp_path, self.index_path)
+
+    def _map(self, signature, csv_map, fieldnames):
+        with open(self.index_path, mode='rb') as f:
+            index_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if MAP_FILES else f.read()
+        count = HEADER.unpack(index_data[:HEADER.size])[3]
+        if MAP_FILES and csv_map is not None:
+            read_line = lambda signature, start, length: csv_map[start:start + length]
+        else:
+            read_line = self._read_line
+        return IndexedClients(signature, read_line, fieldnames, index_data, count)
+
+    def _read_line(self, signature, start, length):
+        with open(self.csv_path, mode='rb') as f:
+            st = os.fstat(f.fileno())
+            if (st.st_mtime_ns, st.st_size) != signature:
+                raise IndexUnavailable("clientes.csv mudou durante a leitura")
+            f.seek(start)
+            return f.read(length)
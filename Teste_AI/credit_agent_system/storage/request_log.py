@@ -0,0 +1,249 @@
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from itertools import groupby
+
+from services import metrics
+from storage.log_segments import SegmentedLog, first_day
+
+FIELDNAMES = ['cpf_cliente', 'data_hora_solicitacao', 'limite_atual', 'novo_limite_solicitado', 'status_pedido']
+
+_STOP = object()
+FLUSH_TIMEOUT = 10.0
+
+
+class RequestLogWriter:
+    """
+    Escrita agrupada (group commit) do log de solicitações de aumento de limite.
+
+    O caminho quente apenas enfileira a linha; uma thread de fundo mantém o
+    arquivo aberto e grava em lotes a cada `batch_size` linhas ou
+    `flush_interval_ms` milissegundos, o que ocorrer primeiro. Com `fsync=True`
+    cada lote é forçado para o disco. `close()` (também chamado no `atexit`)
+    garante que a fila seja totalmente drenada.
+
+    Antes de cada lote o arquivo é rolado para um segmento (SegmentedLog) se
+    o dia mudou ou ele passou de `segment_mb`; a selagem (gzip + índice)
+    também roda nesta thread, fora do caminho quente.
+    """
+
+    def __init__(self, path, batch_size=100, flush_interval_ms=200, fsync=False, segment_mb=16, roll_daily=True):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.fsync = fsync
+        self.segments = SegmentedLog(path, segment_bytes=int(segment_mb * 1024 * 1024), roll_daily=roll_daily)
+        self.rows_written = 0
+        self.last_error = None
+        self._queue = queue.Queue()
+        self._file = None
+        self._writer = None
+        self._segment_day = None
+        self._seal_due = None
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Log de solicitações já foi encerrado.")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+                self._thread.start()
+
+    def append(self, row):
+        """Enfileira uma linha (dict no formato FIELDNAMES) para gravação."""
+        if self._thread is None or self._closed:
+            self._start()
+        self._queue.put(row)
+
+    def log(self, cpf, current, requested, status):
+        """Enfileira uma solicitação com o horário atual."""
+        self.append({
+            'cpf_cliente': cpf,
+            'data_hora_solicitacao': datetime.now().isoformat(),
+            'limite_atual': current,
+            'novo_limite_solicitado': requested,
+            'status_pedido': status
+        })
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """
+        Bloqueia até que tudo o que foi enfileirado antes desta chamada esteja
+        gravado. Retorna False se a gravação não foi confirmada em `timeout`
+        segundos ou se a thread de escrita não está mais ativa.
+        """
+        thread = self._thread
+        if thread is None:
+            return True
+        if self._closed:
+            # `close` drena a fila: basta esperar o fim da thread
+            thread.join(timeout)
+            return not thread.is_alive()
+        if not thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Drena a fila, grava o lote final e encerra a thread de escrita."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _open(self):
+        csvfile = open(self.path, mode='a', encoding='utf-8', newline='')
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        if csvfile.tell() == 0:
+            writer.writeheader()
+        self._segment_day = first_day(self.path)
+        # Segmentos pendentes de uma execução anterior são selados após a carência
+        self._seal_due = time.monotonic()
+        return csvfile, writer
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rolled_elsewhere(self):
+        """O arquivo aberto deixou de ser o ativo (rolado por outro processo)."""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self._file.fileno())
+        return (opened.st_dev, opened.st_ino) != (current.st_dev, current.st_ino)
+
+    def _write_batch(self, batch):
+        try:
+            if self._file is not None and self._rolled_elsewhere():
+                self._close_file()
+            # Um lote que atravessa a meia-noite é gravado em dois segmentos
+            for day, rows in groupby(batch, key=lambda row: str(row['data_hora_solicitacao'])[:10]):
+                rows = list(rows)
+                if self._file is None:
+                    self._file, self._writer = self._open()
+                reason = self.segments.roll_reason(self._segment_day, day, self._file.tell())
+                if reason:
+                    self._close_file()
+                    self.segments.roll(reason, self._segment_day)
+                    self._file, self._writer = self._open()
+                if self._segment_day is None:
+                    self._segment_day = day
+                self._writer.writerows(rows)
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self.rows_written += len(rows)
+                metrics.REQUEST_LOG_ROWS.inc(len(rows))
+        except Exception as e:
+            self.last_error = e
+            print(f"Erro ao registrar solicitação: {e}")
+        self._seal_segments()
+
+    def _seal_segments(self, now=False):
+        if self._seal_due is None or (not now and time.monotonic() < self._seal_due):
+            return
+        try:
+            waiting = self.segments.seal_pending()
+        except Exception as e:
+            self.last_error = e
+            print(f"Erro ao selar segmento do log de solicitações: {e}")
+            waiting = 0
+        self._seal_due = time.monotonic() + self.segments.seal_grace if waiting else None
+
+    def _run(self):
+        try:
+            stop = False
+            while not stop:
+                item = self._queue.get()
+                batch = []
+                waiters = []
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is _STOP:
+                        stop = True
+                        break
+                    if isinstance(item, threading.Event):
+                        # Pedido de flush: grava o que já está no lote imediatamente
+                        waiters.append(item)
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if stop:
+                    # Drena o que ainda estiver na fila antes de encerrar
+                    while True:
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if isinstance(item, threading.Event):
+                            waiters.append(item)
+                        elif item is not _STOP:
+                            batch.append(item)
+
+                if batch:
+                    self._write_batch(batch)
+                for waiter in waiters:
+                    waiter.set()
+            self._seal_segments(now=True)
+        finally:
+            self._close_file()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def policy_from_env():
+    """
+    Política de flush e de segmentação configurável pelas variáveis
+    REQUEST_LOG_BATCH, REQUEST_LOG_FLUSH_MS, REQUEST_LOG_FSYNC,
+    REQUEST_LOG_SEGMENT_MB e REQUEST_LOG_ROLL_DAILY.
+    """
+    return {
+        'batch_size': int(os.environ.get('REQUEST_LOG_BATCH', 100)),
+        'flush_interval_ms': int(os.environ.get('REQUEST_LOG_FLUSH_MS', 200)),
+        'fsync': os.environ.get('REQUEST_LOG_FSYNC', '0').lower() in ('1', 'true', 'sim'),
+        'segment_mb': float(os.environ.get('REQUEST_LOG_SEGMENT_MB', 16)),
+        'roll_daily': os.environ.get('REQUEST_LOG_ROLL_DAILY', '1').lower() in ('1', 'true', 'sim'),
+    }
+
+
+def get_request_log(path, **policy):
+    """Retorna o RequestLogWriter compartilhado para o arquivo informado."""
+    key = os.path.abspath(path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = RequestLogWriter(path, **(policy or policy_from_env()))
+            _writers[key] = writer
+        return writer
+
+
+@atexit.register
+def close_all():
+    """Drena todos os logs compartilhados (executado no encerramento do processo)."""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
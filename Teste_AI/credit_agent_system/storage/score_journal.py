@@ -0,0 +1,293 @@
+import csv
+import os
+import threading
+from contextlib import contextmanager
+
+from storage.file_watch import WatchedFile
+
+try:
+    import fcntl
+except ImportError:  # fcntl só existe em POSIX: sem ele, um único processo deve escrever no journal
+    fcntl = None
+
+
+class _FileLock:
+    """Trava entre processos (flock) em um arquivo auxiliar; o uso entre threads é serializado por quem chama."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    @contextmanager
+    def held(self, shared=False):
+        if fcntl is None:
+            yield
+            return
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class ScoreJournal:
+    """
+    Journal append-only de atualizações de score sobre clientes.csv.
+
+    Cada atualização vira uma linha `cpf,score` anexada ao journal, em vez de
+    reescrever a base inteira. As atualizações pendentes ficam em memória
+    (`overlay()`) para serem aplicadas por cima do arquivo base, e uma thread
+    de fundo faz a compactação: o journal é rotacionado para `.compacting`, as
+    alterações são mescladas em uma cópia da base e a cópia substitui o
+    original com `os.replace` (atômico). Ao iniciar, os dois arquivos são
+    reaplicados, recuperando o que não chegou a ser compactado.
+
+    Vários processos podem usar o mesmo journal (ex: Streamlit e terminal).
+    As escritas seguram uma trava compartilhada (`<journal>.lock`) e a
+    rotação, uma exclusiva. Só um processo compacta por vez
+    (`<journal>.compacting.lock`), e a mesclagem é feita a partir do arquivo
+    `.compacting`, com as linhas de todos os processos. O arquivo
+    `<journal>.generation` conta as rotações e as compactações concluídas:
+    quem ainda tiver aberto o journal rotacionado por outro processo reabre
+    o novo antes de escrever, e as atualizações deste processo saem do
+    overlay assim que outro processo as incorpora à base.
+    """
+
+    def __init__(self, base_path, journal_path=None, compact_every=1000,
+                 compact_interval=30, fsync=False, on_compacted=None):
+        self.base_path = base_path
+        self.journal_path = journal_path or base_path + '.journal'
+        self.compacting_path = self.journal_path + '.compacting'
+        self.generation_path = self.journal_path + '.generation'
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self.fsync = fsync
+        self.on_compacted = on_compacted
+        self._active = {}
+        self._compacting = {}
+        # Rotação que levou (ou levará) `_active` para `.compacting`, menos um, e
+        # a rotação que contém `_compacting`: mescladas quando `merged` a alcança
+        self._generation = 0
+        self._compacting_generation = 0
+        self._appended = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._journal_lock = _FileLock(self.journal_path + '.lock')
+        self._compaction_lock = _FileLock(self.compacting_path + '.lock')
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopped = False
+        self._replay()
+
+    @staticmethod
+    def _read_entries(path):
+        entries = {}
+        try:
+            with open(path, mode='r', encoding='utf-8', newline='') as f:
+                for line in f:
+                    # Uma linha truncada por queda do processo é descartada
+                    if not line.endswith('\n'):
+                        break
+                    cpf, _, score = line.strip().partition(',')
+                    if cpf and score:
+                        entries[cpf] = score
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _read_generation(self):
+        """(rotações, compactações concluídas) registradas em `.generation`."""
+        try:
+            with open(self.generation_path, mode='r', encoding='utf-8') as f:
+                rotated, merged = (int(n) for n in f.read().split())
+        except (FileNotFoundError, ValueError):
+            return 0, 0
+        return rotated, merged
+
+    def _write_generation(self, rotated, merged):
+        # Só é chamado com a trava de compactação: um escritor por vez, leitura sem trava
+        tmp_path = f"{self.generation_path}.{os.getpid()}.tmp"
+        with open(tmp_path, mode='w', encoding='utf-8') as f:
+            f.write(f"{rotated} {merged}\n")
+        os.replace(tmp_path, self.generation_path)
+
+    def _replay(self):
+        with self._journal_lock.held(shared=True):
+            rotated, merged = self._read_generation()
+            self._compacting = self._read_entries(self.compacting_path)
+            self._active = self._read_entries(self.journal_path)
+        self._generation = rotated
+        # `.compacting` presente: uma rotação ainda não mesclada
+        self._compacting_generation = max(rotated, merged + 1)
+        if self._compacting or self._active:
+            self._start_compactor()
+            self._wakeup.set()
+
+    def _sync(self, rotated, merged):
+        """Acompanha rotações e compactações de outros processos (chamar com `_lock`)."""
+        if rotated != self._generation:
+            # O journal em que gravamos foi rotacionado: as linhas seguiram para `.compacting`
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._active:
+                self._compacting.update(self._active)
+                self._compacting_generation = self._generation + 1
+                self._active = {}
+            self._generation = rotated
+        if self._compacting and merged >= self._compacting_generation:
+            # Já incorporadas à base por uma compactação (deste ou de outro processo)
+            self._compacting = {}
+
+    def overlay(self):
+        """Scores ainda não compactados na base: {cpf: score (str)}."""
+        with self._lock:
+            if self._compacting or self._active:
+                self._sync(*self._read_generation())
+            merged = dict(self._compacting)
+            merged.update(self._active)
+            return merged
+
+    def score_of(self, cpf):
+        """Score ainda não compactado de um CPF (str), ou None."""
+        with self._lock:
+            if self._compacting or self._active:
+                self._sync(*self._read_generation())
+            score = self._active.get(cpf)
+            return score if score is not None else self._compacting.get(cpf)
+
+    def append(self, cpf, score):
+        """Registra a atualização no journal (uma linha anexada)."""
+        with self._lock, self._journal_lock.held(shared=True):
+            # Sob a trava compartilhada nenhuma rotação acontece até a linha ser gravada
+            self._sync(*self._read_generation())
+            if self._file is None:
+                self._file = open(self.journal_path, mode='a', encoding='utf-8', newline='')
+            self._file.write(f"{cpf},{score}\n")
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._active[cpf] = str(score)
+            self._appended += 1
+            should_compact = self._appended >= self.compact_every
+        self._start_compactor()
+        if should_compact:
+            self._wakeup.set()
+
+    def _start_compactor(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._compactor, name="score-journal-compactor", daemon=True)
+                    self._thread.start()
+
+    def _compactor(self):
+        while not self._stopped:
+            self._wakeup.wait(self.compact_interval)
+            self._wakeup.clear()
+            if self._stopped:
+                break
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Erro ao compactar journal de scores: {e}")
+
+    def _rotate(self):
+        """Move o journal ativo para `.compacting`; novas escritas vão para um journal novo."""
+        with self._lock, self._journal_lock.held():
+            rotated, merged = self._read_generation()
+            self._sync(rotated, merged)
+            # Contada antes de mover o arquivo: os outros processos reabrem o journal novo
+            self._write_generation(rotated + 1, merged)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.journal_path):
+                if os.path.exists(self.compacting_path):
+                    # Sobra de uma compactação interrompida: concatena os dois
+                    with open(self.journal_path, mode='r', encoding='utf-8', newline='') as src, \
+                            open(self.compacting_path, mode='a', encoding='utf-8', newline='') as dst:
+                        dst.write(src.read())
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, self.compacting_path)
+            self._generation = rotated + 1
+            self._compacting.update(self._active)
+            self._compacting_generation = rotated + 1
+            self._active = {}
+            self._appended = 0
+
+    def paused(self):
+        """Context manager que impede compactações (para ler base + overlay de forma consistente)."""
+        return self._compact_lock
+
+    def compact(self):
+        """Mescla o journal em clientes.csv com substituição atômica. Retorna o nº de CPFs aplicados."""
+        with self._compact_lock, self._compaction_lock.held():
+            self._rotate()
+            # Lido do disco: inclui as linhas gravadas pelos outros processos
+            snapshot = self._read_entries(self.compacting_path)
+            if not snapshot:
+                # O que este processo gravou já foi mesclado por outro
+                self._finish_compaction()
+                return 0
+
+            watch = WatchedFile(self.base_path)
+            old_signature = watch.current_signature()
+            tmp_path = f"{self.base_path}.{os.getpid()}.tmp"
+            with open(self.base_path, mode='r', encoding='utf-8', newline='') as src, \
+                    open(tmp_path, mode='w', encoding='utf-8', newline='') as dst:
+                reader = csv.DictReader(src)
+                fieldnames = list(reader.fieldnames or [])
+                if 'score' not in fieldnames:
+                    fieldnames.append('score')
+                writer = csv.DictWriter(dst, fieldnames=fieldnames, lineterminator='\n')
+                writer.writeheader()
+                for row in reader:
+                    score = snapshot.get(row['cpf'].strip())
+                    if score is not None:
+                        row['score'] = score
+                    writer.writerow(row)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_path, self.base_path)
+            new_signature = watch.current_signature()
+            self._finish_compaction()
+
+        if self.on_compacted is not None:
+            self.on_compacted(old_signature, new_signature)
+        return len(snapshot)
+
+    def _finish_compaction(self):
+        with self._lock:
+            self._compacting = {}
+            try:
+                os.remove(self.compacting_path)
+            except FileNotFoundError:
+                pass
+            # Registrada depois da remoção: com `.compacting` presente, a mesclagem nunca consta como feita
+            rotated, _ = self._read_generation()
+            self._write_generation(rotated, rotated)
+
+    def close(self):
+        """Fecha o journal e encerra a thread de compactação (o que restar é reaplicado na próxima abertura)."""
+        self._stopped = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._journal_lock.close()
+        with self._compact_lock:
+            self._compaction_lock.close()
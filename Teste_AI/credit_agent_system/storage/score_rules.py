@@ -0,0 +1,161 @@
+import csv
+import os
+import threading
+import time
+from bisect import bisect_right
+
+from services import metrics
+from storage.file_watch import WatchedFile
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele o lote usa bisect item a item
+    np = None
+
+
+class ScoreRulesError(ValueError):
+    """Tabela score_limite.csv inconsistente (faixas sobrepostas ou com buracos)."""
+
+
+class ScoreRules:
+    """
+    Motor de regras compilado a partir de score_limite.csv.
+
+    As faixas são ordenadas em vetores de limites (`min_score`, `max_score`,
+    `max_limite`) e a consulta é uma busca binária. Cada faixa vale de seu
+    `min_score` até o início da próxima, então scores fracionários entre
+    faixas inteiras (ex: 300.5) caem na faixa inferior em vez de retornar 0.
+    """
+
+    def __init__(self, rules_path):
+        self.rules_path = rules_path
+        self._table = None
+        self._watch = WatchedFile(rules_path) if rules_path else None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Motor de regras fixo a partir de faixas já carregadas (ex: de um banco de dados)."""
+        rules = cls(None)
+        rules._table = cls.compile(rows)
+        return rules
+
+    @staticmethod
+    def compile(rows):
+        """Valida e ordena as faixas; retorna (mins, maxs, limits)."""
+        bands = sorted(
+            (float(row['min_score']), float(row['max_score']), float(row['max_limite']))
+            for row in rows
+        )
+        if not bands:
+            raise ScoreRulesError("Tabela de regras vazia.")
+
+        for min_s, max_s, _ in bands:
+            if min_s > max_s:
+                raise ScoreRulesError(f"Faixa inválida: {min_s} > {max_s}.")
+
+        for (prev_min, prev_max, _), (min_s, max_s, _) in zip(bands, bands[1:]):
+            if min_s <= prev_max:
+                raise ScoreRulesError(
+                    f"Faixas sobrepostas: [{prev_min}, {prev_max}] e [{min_s}, {max_s}]."
+                )
+            # As faixas são inteiras (0-300, 301-600...): um salto maior que 1 é um buraco
+            if min_s - prev_max > 1:
+                raise ScoreRulesError(
+                    f"Buraco entre as faixas: nenhum limite definido entre {prev_max} e {min_s}."
+                )
+
+        mins = [b[0] for b in bands]
+        maxs = [b[1] for b in bands]
+        limits = [b[2] for b in bands]
+        return mins, maxs, limits
+
+    def _load(self):
+        started = time.perf_counter()
+        signature = self._watch.current_signature()
+        with open(self.rules_path, mode='r', encoding='utf-8') as csvfile:
+            table = self.compile(csv.DictReader(csvfile))
+        # Troca atômica: leitores concorrentes veem a tabela antiga ou a nova, nunca uma mistura
+        self._table = table
+        self._watch.mark(signature)
+        metrics.FILE_LOADS.labels('score_limite').inc()
+        metrics.FILE_BYTES.labels('score_limite').inc(signature[1])
+        metrics.FILE_ROWS.labels('score_limite').inc(len(table[0]))
+        metrics.FILE_LOAD_SECONDS.labels('score_limite').observe(time.perf_counter() - started)
+
+    def table(self):
+        """Retorna a tabela compilada (mins, maxs, limits), recarregando se o arquivo mudou."""
+        if self._watch is not None and self._watch.changed():
+            with self._lock:
+                if self._watch.changed():
+                    self._load()
+        return self._table
+
+    @staticmethod
+    def _lookup(table, score):
+        mins, maxs, _ = table
+        i = bisect_right(mins, score) - 1
+        if i < 0 or score > maxs[-1]:
+            return -1
+        return i
+
+    def band_index(self, score):
+        """Índice da faixa que contém o score, ou -1 se estiver fora da tabela."""
+        return self._lookup(self.table(), score)
+
+    def band_indexes(self, scores):
+        """Versão em lote de `band_index` (array com NumPy, senão lista)."""
+        table = self.table()
+        if np is not None:
+            mins, maxs, _ = table
+            scores = np.asarray(scores, dtype=np.float64)
+            idx = np.searchsorted(np.asarray(mins), scores, side='right') - 1
+            return np.where(scores <= maxs[-1], idx, -1)
+        return [self._lookup(table, score) for score in scores]
+
+    def band_label(self, score):
+        """Faixa do score no formato 'min-max' (ex: '301-600'), ou 'fora' se não houver faixa."""
+        mins, maxs, _ = table = self.table()
+        i = self._lookup(table, score)
+        return f"{mins[i]:g}-{maxs[i]:g}" if i >= 0 else 'fora'
+
+    def max_limit(self, score):
+        """Limite máximo permitido para o score (0.0 fora da tabela)."""
+        table = self.table()
+        i = self._lookup(table, score)
+        return table[2][i] if i >= 0 else 0.0
+
+    def max_limits(self, scores):
+        """
+        Versão em lote de `max_limit` para uma sequência de scores.
+
+        Com NumPy a busca é vetorizada (`searchsorted`) e o retorno é um array;
+        sem ele, uma lista.
+        """
+        mins, maxs, limits = self.table()
+        top = maxs[-1]
+        if np is not None:
+            scores = np.asarray(scores, dtype=np.float64)
+            idx = np.searchsorted(np.asarray(mins), scores, side='right') - 1
+            inside = (idx >= 0) & (scores <= top)
+            return np.where(inside, np.asarray(limits)[np.clip(idx, 0, None)], 0.0)
+        result = []
+        for score in scores:
+            i = bisect_right(mins, score) - 1
+            result.append(limits[i] if i >= 0 and score <= top else 0.0)
+        return result
+
+
+_rules = {}
+_rules_lock = threading.Lock()
+
+
+def get_score_rules(rules_path):
+    """Retorna a instância compartilhada de ScoreRules para o arquivo informado."""
+    key = os.path.abspath(rules_path)
+    with _rules_lock:
+        rules = _rules.get(key)
+        if rules is None:
+            rules = ScoreRules(rules_path)
+            _rules[key] = rules
+        return rules
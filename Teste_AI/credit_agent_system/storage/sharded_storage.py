@@ -0,0 +1,194 @@
+import csv
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+
+from services import metrics
+from storage.base import CLIENT_FIELDS
+from storage.csv_storage import CsvStorage
+from storage.file_watch import WatchedFile, file_signature
+
+SHARDS_DIR = 'clientes_shards'
+MANIFEST_FILE = 'shards.json'
+
+
+def shard_of(cpf, n_shards):
+    """Partição do CPF: crc32 é estável entre processos (ao contrário de hash())."""
+    return zlib.crc32(cpf.strip().encode('utf-8')) % n_shards
+
+
+def shard_path(shards_dir, index):
+    return os.path.join(shards_dir, f'clientes_{index:03d}.csv')
+
+
+class ClientShard:
+    """Uma partição de clientes: arquivo CSV próprio, índice em memória e lock próprio."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fieldnames = list(CLIENT_FIELDS)
+        self._index = {}
+        self._watch = WatchedFile(path)
+        self._lock = threading.Lock()
+
+    def _load(self):
+        started = time.perf_counter()
+        signature = self._watch.current_signature()
+        index = {}
+        with open(self.path, mode='r', encoding='utf-8') as csvfile:
+            reader = csv.DictReader(csvfile)
+            fieldnames = list(reader.fieldnames or CLIENT_FIELDS)
+            for row in reader:
+                index[row['cpf'].strip()] = row
+        self.fieldnames = fieldnames
+        self._index = index
+        self._watch.mark(signature)
+        metrics.FILE_LOADS.labels('clientes_shard').inc()
+        metrics.FILE_BYTES.labels('clientes_shard').inc(signature[1])
+        metrics.FILE_ROWS.labels('clientes_shard').inc(len(index))
+        metrics.FILE_LOAD_SECONDS.labels('clientes_shard').observe(time.perf_counter() - started)
+
+    def _ensure_fresh(self):
+        if self._watch.changed():
+            with self._lock:
+                if self._watch.changed():
+                    self._load()
+
+    def get(self, cpf):
+        self._ensure_fresh()
+        return self._index.get(cpf)
+
+    def rows(self):
+        self._ensure_fresh()
+        return list(self._index.values())
+
+    def update_score(self, cpf, new_score):
+        """Reescreve apenas este shard (cópia temporária + os.replace atômico)."""
+        with self._lock:
+            if self._watch.changed():
+                self._load()
+            row = self._index.get(cpf)
+            if row is None:
+                return False
+            updated = dict(row, score=str(new_score))
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, mode='w', encoding='utf-8', newline='') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames, lineterminator='\n')
+                writer.writeheader()
+                for key, current in self._index.items():
+                    writer.writerow(updated if key == cpf else current)
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+            os.replace(tmp_path, self.path)
+            self._index[cpf] = updated
+            self._watch.mark()
+            return True
+
+
+class ShardedClientStore:
+    """
+    Base de clientes particionada em N arquivos pelo crc32 do CPF.
+
+    Mesma interface de consulta do ClientStore. Cada atualização de score
+    reescreve só o shard do cliente (~1/N da base) sob o lock daquele shard,
+    então escritas em shards diferentes correm em paralelo.
+    """
+
+    def __init__(self, shards_dir):
+        self.shards_dir = shards_dir
+        manifest_path = os.path.join(shards_dir, MANIFEST_FILE)
+        try:
+            with open(manifest_path, mode='r', encoding='utf-8') as f:
+                self.n_shards = json.load(f)['shards']
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"Base particionada não encontrada em {shards_dir}. Execute 'python main.py reshard' primeiro."
+            )
+        self.shards = [ClientShard(shard_path(shards_dir, i)) for i in range(self.n_shards)]
+
+    def _shard(self, cpf):
+        return self.shards[shard_of(cpf, self.n_shards)]
+
+    def get(self, cpf):
+        cpf = cpf.strip()
+        row = self._shard(cpf).get(cpf)
+        return dict(row) if row is not None else None
+
+    def get_many(self, cpfs):
+        return [self._shard(cpf).get(cpf) for cpf in cpfs]
+
+    def authenticate(self, cpf, dob):
+        row = self.get(cpf)
+        if row is not None and row['data_nascimento'].strip() == dob.strip():
+            return row
+        return None
+
+    def update_score(self, cpf, new_score):
+        cpf = cpf.strip()
+        return self._shard(cpf).update_score(cpf, new_score)
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        for shard in self.shards:
+            yield from shard.rows()
+
+
+class ShardedCsvStorage(CsvStorage):
+    """CsvStorage com a base de clientes particionada; regras e log continuam em `data_dir`."""
+
+    def __init__(self, data_dir, shards_dir=None):
+        self.shards_dir = shards_dir or os.path.join(data_dir, SHARDS_DIR)
+        super().__init__(data_dir)
+        self.location = self.shards_dir
+
+    def _open_clients(self):
+        return ShardedClientStore(self.shards_dir)
+
+    def iter_clients(self):
+        return iter(self.clients)
+
+    def version(self):
+        shards = tuple(file_signature(shard.path) for shard in self.clients.shards)
+        return (shards, file_signature(self.rules_path))
+
+
+def reshard(source_rows, fieldnames, shards_dir, n_shards):
+    """
+    Distribui os registros em `n_shards` arquivos e troca o diretório de shards.
+
+    Os arquivos novos são escritos em `<shards_dir>.tmp` e só então substituem
+    o diretório atual. Retorna a quantidade de registros por shard.
+    """
+    tmp_dir = shards_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    files = [open(shard_path(tmp_dir, i), mode='w', encoding='utf-8', newline='') for i in range(n_shards)]
+    counts = [0] * n_shards
+    try:
+        writers = [csv.DictWriter(f, fieldnames=fieldnames, lineterminator='\n', extrasaction='ignore') for f in files]
+        for writer in writers:
+            writer.writeheader()
+        for row in source_rows:
+            i = shard_of(row['cpf'], n_shards)
+            writers[i].writerow(row)
+            counts[i] += 1
+    finally:
+        for f in files:
+            f.close()
+
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), mode='w', encoding='utf-8') as f:
+        json.dump({'shards': n_shards, 'hash': 'crc32', 'fieldnames': fieldnames}, f)
+
+    old_dir = shards_dir + '.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(shards_dir):
+        os.replace(shards_dir, old_dir)
+    os.replace(tmp_dir, shards_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return counts
@@ -0,0 +1,254 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from storage.base import Storage
+from storage.score_rules import ScoreRules
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clientes (
+    cpf TEXT PRIMARY KEY,
+    data_nascimento TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    limite_atual REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS score_limite (
+    min_score REAL NOT NULL,
+    max_score REAL NOT NULL,
+    max_limite REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS solicitacoes_aumento_limite (
+    id INTEGER PRIMARY KEY,
+    cpf_cliente TEXT NOT NULL,
+    data_hora_solicitacao TEXT NOT NULL,
+    limite_atual REAL NOT NULL,
+    novo_limite_solicitado REAL NOT NULL,
+    status_pedido TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_solicitacoes_cpf ON solicitacoes_aumento_limite (cpf_cliente);
+
+-- Versão do conjunto de CPFs (Storage.clients_version): incrementada por toda escrita que pode
+-- incluir, remover ou trocar um CPF, de qualquer conexão ou processo
+CREATE TABLE IF NOT EXISTS clientes_versao (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    versao INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO clientes_versao (id, versao) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS clientes_versao_insert AFTER INSERT ON clientes
+BEGIN
+    UPDATE clientes_versao SET versao = versao + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS clientes_versao_delete AFTER DELETE ON clientes
+BEGIN
+    UPDATE clientes_versao SET versao = versao + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS clientes_versao_update AFTER UPDATE OF cpf ON clientes
+BEGIN
+    UPDATE clientes_versao SET versao = versao + 1 WHERE id = 1;
+END;
+"""
+
+# Instruções fixas: o módulo sqlite3 mantém um cache de statements preparados
+# por conexão, então cada uma é compilada uma única vez por thread.
+SQL_GET_CLIENT = "SELECT cpf, data_nascimento, nome, score, limite_atual FROM clientes WHERE cpf = ?"
+SQL_UPDATE_SCORE = "UPDATE clientes SET score = ? WHERE cpf = ?"
+SQL_ALL_CLIENTS = "SELECT cpf, data_nascimento, nome, score, limite_atual FROM clientes ORDER BY cpf"
+SQL_CLIENTS_VERSION = "SELECT versao FROM clientes_versao WHERE id = 1"
+SQL_BANDS = "SELECT min_score, max_score, max_limite FROM score_limite ORDER BY min_score"
+SQL_LOG_REQUEST = (
+    "INSERT INTO solicitacoes_aumento_limite "
+    "(cpf_cliente, data_hora_solicitacao, limite_atual, novo_limite_solicitado, status_pedido) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+SQL_ALL_REQUESTS = (
+    "SELECT cpf_cliente, data_hora_solicitacao, limite_atual, novo_limite_solicitado, status_pedido "
+    "FROM solicitacoes_aumento_limite ORDER BY id"
+)
+SQL_REQUEST_HISTORY = (
+    "SELECT cpf_cliente, data_hora_solicitacao, limite_atual, novo_limite_solicitado, status_pedido "
+    "FROM solicitacoes_aumento_limite WHERE cpf_cliente = ? ORDER BY id DESC LIMIT ?"
+)
+
+BATCH_SIZE = 500
+
+
+def _client_row(row):
+    """Converte a linha do banco para o formato texto de clientes.csv."""
+    cpf, dob, nome, score, limite = row
+    return {
+        'cpf': cpf,
+        'data_nascimento': dob,
+        'nome': nome,
+        'score': str(score),
+        'limite_atual': f"{limite:.2f}",
+    }
+
+
+class SqliteStorage(Storage):
+    """
+    Armazenamento em SQLite (biblioteca padrão) em modo WAL.
+
+    Cada thread recebe sua própria conexão (pool por thread), o CPF é chave
+    primária indexada e a atualização de score altera apenas a linha do cliente.
+    """
+
+    def __init__(self, db_path, timeout=30):
+        self.db_path = db_path
+        self.location = db_path
+        self.data_dir = os.path.dirname(os.path.abspath(db_path))
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                                   cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get_client(self, cpf):
+        row = self._conn().execute(SQL_GET_CLIENT, (cpf.strip(),)).fetchone()
+        return _client_row(row) if row else None
+
+    def get_clients(self, cpfs):
+        conn = self._conn()
+        found = {}
+        for start in range(0, len(cpfs), BATCH_SIZE):
+            batch = cpfs[start:start + BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            query = f"SELECT cpf, data_nascimento, nome, score, limite_atual FROM clientes WHERE cpf IN ({placeholders})"
+            for row in conn.execute(query, batch):
+                found[row[0]] = _client_row(row)
+        return [found.get(cpf) for cpf in cpfs]
+
+    def update_score(self, cpf, new_score):
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(SQL_UPDATE_SCORE, (int(new_score), cpf.strip()))
+        return cursor.rowcount > 0
+
+    def iter_clients(self):
+        for row in self._conn().execute(SQL_ALL_CLIENTS):
+            yield _client_row(row)
+
+    def score_bands(self):
+        return [
+            {'min_score': min_s, 'max_score': max_s, 'max_limite': limit}
+            for min_s, max_s, limit in self._conn().execute(SQL_BANDS)
+        ]
+
+    def _score_rules(self):
+        # data_version (por conexão) muda quando outra conexão grava no banco:
+        # só então as faixas são relidas e recompiladas
+        version = self._conn().execute("PRAGMA data_version").fetchone()[0]
+        if getattr(self._local, 'rules_version', None) != version:
+            self._local.rules = ScoreRules.from_rows(self.score_bands())
+            self._local.rules_version = version
+        return self._local.rules
+
+    def max_limit(self, score):
+        return self._score_rules().max_limit(score)
+
+    def max_limits(self, scores):
+        return self._score_rules().max_limits(scores)
+
+    def score_band(self, score):
+        return self._score_rules().band_label(score)
+
+    def version(self):
+        # Conexão dedicada: seu data_version muda a cada commit de qualquer outra conexão
+        # (das outras threads deste processo ou de outros processos)
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def clients_version(self):
+        # data_version muda a cada solicitação registrada; o contador mantido pelos
+        # gatilhos de `clientes` só muda quando um CPF entra, sai ou é trocado (leitura O(1))
+        return self._conn().execute(SQL_CLIENTS_VERSION).fetchone()[0]
+
+    def log_request(self, cpf, current, requested, status):
+        conn = self._conn()
+        with conn:
+            conn.execute(SQL_LOG_REQUEST, (cpf, datetime.now().isoformat(), current, requested, status))
+
+    @staticmethod
+    def _request_row(row):
+        cpf, when, current, requested, status = row
+        return {
+            'cpf_cliente': cpf,
+            'data_hora_solicitacao': when,
+            'limite_atual': str(current),
+            'novo_limite_solicitado': str(requested),
+            'status_pedido': status,
+        }
+
+    def iter_requests(self):
+        for row in self._conn().execute(SQL_ALL_REQUESTS):
+            yield self._request_row(row)
+
+    def request_history(self, cpf, limit=10):
+        # idx_solicitacoes_cpf: só as linhas do CPF são lidas
+        rows = self._conn().execute(SQL_REQUEST_HISTORY, (cpf.strip(), -1 if limit is None else limit))
+        return [self._request_row(row) for row in rows]
+
+    def import_from(self, source):
+        """Copia clientes, faixas e solicitações de outro Storage (migração CSV → SQLite)."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM clientes")
+            conn.execute("DELETE FROM score_limite")
+            conn.execute("DELETE FROM solicitacoes_aumento_limite")
+            conn.executemany(
+                "INSERT INTO clientes (cpf, data_nascimento, nome, score, limite_atual) VALUES (?, ?, ?, ?, ?)",
+                ((row['cpf'].strip(), row['data_nascimento'].strip(), row['nome'],
+                  int(float(row.get('score') or 0)), float(row.get('limite_atual') or 0))
+                 for row in source.iter_clients())
+            )
+            conn.executemany(
+                "INSERT INTO score_limite (min_score, max_score, max_limite) VALUES (?, ?, ?)",
+                ((float(b['min_score']), float(b['max_score']), float(b['max_limite']))
+                 for b in source.score_bands())
+            )
+            conn.executemany(
+                SQL_LOG_REQUEST,
+                ((r['cpf_cliente'], r['data_hora_solicitacao'], float(r['limite_atual']),
+                  float(r['novo_limite_solicitado']), r['status_pedido'])
+                 for r in source.iter_requests())
+            )
+        self._local.rules_version = None
+        counts = {}
+        for table in ('clientes', 'score_limite', 'solicitacoes_aumento_limite'):
+            counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return counts
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
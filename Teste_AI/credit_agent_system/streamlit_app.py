@@ -1,141 +1,161 @@
 import streamlit as st
 import os
-import csv
-import json
-import urllib.request
 from datetime import datetime
 
+from storage.backends import open_storage
+from services import metrics, profiling, scoring
+from services.admission import Throttled, get_admission
+from services.cpf_check import get_cpf_precheck, normalize_cpf
+from services.data_service import DataService
+from services.rate_cache import DEFAULT_API_URL
+from services.request_analytics import RequestAnalytics
+
 st.set_page_config(page_title="Sistema de Agentes de Crédito", page_icon="🏦")
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
-CLIENTES_CSV = os.path.join(DATA_DIR, 'clientes.csv')
-SCORE_RULES_CSV = os.path.join(DATA_DIR, 'score_limite.csv')
-LOGS_CSV = os.path.join(DATA_DIR, 'solicitacoes_aumento_limite.csv')
+FX_API_URL = os.environ.get('FX_API_URL', DEFAULT_API_URL)
+# CPFs com acesso ao painel administrativo (separados por vírgula)
+ADMIN_CPFS = {cpf.strip() for cpf in os.environ.get('ADMIN_CPFS', '').split(',') if cpf.strip()}
+DEFAULT_CURRENCIES = ['ARS', 'BRL', 'CAD', 'CHF', 'CNY', 'EUR', 'GBP', 'JPY', 'MXN', 'USD']
+
+# Exportação de métricas (METRICS_PORT / METRICS_DUMP); ligada uma vez por processo
+metrics.start_from_env()
+# Modo de perfilamento (CREDIT_PROFILE / CREDIT_PROFILE_DIR): um relatório por sessão do navegador
+profiling.configure_from_env()
 
 # --- Funções Auxiliares (Lógica dos Agentes) ---
 
+def get_storage():
+    """Armazenamento configurado (CREDIT_STORAGE: 'csv' ou 'sqlite'), compartilhado pelo processo"""
+    return open_storage(data_dir=DATA_DIR)
+
+@st.cache_resource
+def get_data_service():
+    """Camada de dados única do processo: clientes, regras e câmbio em memória, compartilhados entre sessões e reruns"""
+    return DataService(get_storage(), FX_API_URL, check_interval=float(os.environ.get('DATA_CHECK_INTERVAL', 2)))
+
+@profiling.span('validate_user')
 def authenticate_user(cpf_input, dob_input):
-    """Valida usuário contra clientes.csv"""
+    """Valida usuário contra a base de clientes"""
     try:
-        with open(CLIENTES_CSV, mode='r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['cpf'].strip() == cpf_input and row['data_nascimento'].strip() == dob_input:
-                    return row
+        cpf = normalize_cpf(cpf_input)
+        # Controle de admissão e pré-checagem do CPF do processo: valem para todas as sessões
+        with get_admission().admit(cpf) as ticket:
+            with metrics.VALIDATE_SECONDS.time():
+                service = get_data_service()
+                client = get_cpf_precheck(service.storage).get_client(cpf, service.get_client)
+                user = client if client is not None and client['data_nascimento'].strip() == dob_input.strip() else None
+            ticket.succeeded = user is not None
+        metrics.VALIDATE_RESULTS.labels('sucesso' if user else 'falha').inc()
+        return user
+    except Throttled as e:
+        # Recusada antes da consulta: não há o que dizer sobre os dados informados
+        st.error(str(e))
+        return False
     except Exception as e:
+        metrics.ERRORS.labels('validate_user').inc()
         st.error(f"Erro ao ler banco de dados: {e}")
     return None
 
 def get_client_data(cpf):
-    """Atualiza dados do cliente do CSV"""
+    """Atualiza dados do cliente da base"""
     try:
-        with open(CLIENTES_CSV, mode='r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['cpf'] == cpf:
-                    return row
-    except Exception:
-        pass
+        return get_data_service().get_client(cpf)
+    except Exception as e:
+        metrics.ERRORS.labels('get_client_data').inc()
+        st.error(f"Erro ao ler dados do cliente: {e}")
     return None
 
 def check_limit_rules(score):
     """Verifica limite máximo permitido para um score"""
     max_limit = 0.0
     try:
-        with open(SCORE_RULES_CSV, mode='r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                min_s = float(row['min_score'])
-                max_s = float(row['max_score'])
-                limit = float(row['max_limite'])
-                if min_s <= score <= max_s:
-                    max_limit = limit
-                    break
-    except Exception:
-        pass
+        with metrics.RULES_SECONDS.time():
+            max_limit = get_data_service().max_limit(score)
+    except Exception as e:
+        metrics.ERRORS.labels('check_rules').inc()
+        st.error(f"Erro ao ler regras de limite: {e}")
     return max_limit
 
 def log_request(cpf, current, requested, status):
     """Registra solicitação de aumento de limite"""
     try:
-        file_exists = os.path.isfile(LOGS_CSV)
-        with open(LOGS_CSV, mode='a', encoding='utf-8', newline='') as csvfile:
-            fieldnames = ['cpf_cliente', 'data_hora_solicitacao', 'limite_atual', 'novo_limite_solicitado', 'status_pedido']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow({
-                'cpf_cliente': cpf,
-                'data_hora_solicitacao': datetime.now().isoformat(),
-                'limite_atual': current,
-                'novo_limite_solicitado': requested,
-                'status_pedido': status
-            })
+        with metrics.LOG_SECONDS.time():
+            get_data_service().log_request(cpf, current, requested, status)
     except Exception as e:
+        metrics.ERRORS.labels('log_request').inc()
         st.error(f"Erro ao logar solicitação: {e}")
 
+def get_request_history(cpf, limit=5):
+    """Últimas solicitações do cliente (só os segmentos do log que contêm o CPF são lidos)"""
+    try:
+        with metrics.HISTORY_SECONDS.time():
+            return get_data_service().request_history(cpf, limit)
+    except Exception as e:
+        metrics.ERRORS.labels('request_history').inc()
+        st.error(f"Erro ao consultar histórico: {e}")
+    return []
+
+def count_decision(score, status):
+    """Contabiliza aprovações/rejeições por faixa de score"""
+    try:
+        band = get_data_service().score_band(score)
+    except Exception:
+        metrics.ERRORS.labels('score_band').inc()
+        band = 'desconhecida'
+    metrics.LIMIT_DECISIONS.labels(band, status).inc()
+
 def calculate_score(data):
     """Calcula score de crédito baseado na fórmula"""
-    peso_renda = 30
-    peso_emprego = {"formal": 300, "autônomo": 200, "desempregado": 0}
-    peso_dependentes = {0: 100, 1: 80, 2: 60, "3+": 30}
-    peso_dividas = {"sim": -100, "não": 100}
-
-    income = data['income']
-    expenses = data['expenses']
-    job_type = data['job_type']
-    dependents = data['dependents']
-    has_debts = data['has_debts']
-
-    part_income = (income / (expenses + 1)) * peso_renda
-    part_job = peso_emprego.get(job_type, 0)
-    
-    # Trata chave de dependentes
-    dep_key = dependents if dependents in [0, 1, 2] else "3+"
-    part_dependents = peso_dependentes.get(dep_key, 30)
-    
-    part_debts = peso_dividas.get(has_debts, 0)
-
-    raw_score = part_income + part_job + part_dependents + part_debts
-    return max(0, min(1000, int(raw_score)))
+    return scoring.calculate_score(data)
 
+@profiling.span('update_db')
 def update_client_score(cpf, new_score):
-    """Atualiza score no CSV"""
-    rows = []
-    updated = False
+    """Atualiza score do cliente na base"""
     try:
-        with open(CLIENTES_CSV, mode='r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            fieldnames = reader.fieldnames
-            for row in reader:
-                if row['cpf'] == cpf:
-                    row['score'] = str(new_score)
-                    updated = True
-                rows.append(row)
-        
-        if updated:
-            with open(CLIENTES_CSV, mode='w', encoding='utf-8', newline='') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(rows)
-            return True
+        with metrics.UPDATE_SECONDS.time():
+            updated = get_data_service().update_score(cpf, new_score)
+        metrics.UPDATE_RESULTS.labels('atualizado' if updated else 'nao_encontrado').inc()
+        return updated
     except Exception as e:
+        metrics.ERRORS.labels('update_db').inc()
         st.error(f"Erro ao atualizar DB: {e}")
     return False
 
-def get_exchange_rate(currency):
-    """Busca taxa de câmbio da API"""
-    url = "https://open.er-api.com/v6/latest/USD"
+@profiling.span('get_rate')
+def get_exchange_rates(bases, currencies):
+    """Busca várias cotações de várias bases de uma vez (uma tabela da API por base, buscadas em paralelo)"""
     try:
-        with urllib.request.urlopen(url) as response:
-            if response.status == 200:
-                data = json.loads(response.read().decode())
-                return data.get('rates', {}).get(currency)
+        with metrics.RATE_SECONDS.time():
+            return get_data_service().get_rates({base: list(currencies) for base in bases})
     except Exception as e:
+        metrics.ERRORS.labels('get_rate').inc()
         st.error(f"Erro de conexão: {e}")
+    return {}
+
+@st.cache_resource
+def get_request_analytics():
+    """Agregados do log de solicitações, compartilhados pelo processo (cada atualização lê só as linhas novas)"""
+    return RequestAnalytics(get_storage())
+
+def get_request_report():
+    """Incorpora as solicitações novas e retorna os agregados"""
+    try:
+        return get_request_analytics().report()
+    except Exception as e:
+        metrics.ERRORS.labels('analytics').inc()
+        st.error(f"Erro ao agregar solicitações: {e}")
     return None
 
+def get_currency_codes():
+    """Moedas disponíveis para seleção (da tabela em cache; lista básica se a API estiver fora)"""
+    try:
+        return get_data_service().currencies()
+    except Exception:
+        metrics.ERRORS.labels('get_rate').inc()
+        return DEFAULT_CURRENCIES
+
 # --- Funções Auxiliares (Formatação) ---
 
 def format_currency(value):
@@ -205,9 +225,18 @@ def view_login():
                 st.session_state['cpf'] = user['cpf']
                 st.success(f"Bem-vindo(a), {user['nome']}!")
                 st.rerun()
-            else:
+            elif user is None:
                 st.error("Dados incorretos. Tente novamente.")
 
+@profiling.span('request_increase')
+def request_increase(cpf, score, current_limit, new_limit):
+    """Decide a solicitação pela faixa do score e registra no log. Retorna (status, limite máximo)"""
+    max_allowed = check_limit_rules(score)
+    status = 'aprovado' if new_limit <= max_allowed else 'rejeitado'
+    count_decision(score, status)
+    log_request(cpf, current_limit, new_limit, status)
+    return status, max_allowed
+
 def view_credit_limit():
     st.header("💳 Limite de Crédito")
     
@@ -230,17 +259,26 @@ def view_credit_limit():
         submit = st.form_submit_button("Solicitar")
         
         if submit:
-            max_allowed = check_limit_rules(score)
-            if new_limit <= max_allowed:
-                status = 'aprovado'
+            status, max_allowed = request_increase(st.session_state['cpf'], score, current_limit, new_limit)
+            if status == 'aprovado':
                 st.success("✅ Parabéns! Sua solicitação foi APROVADA.")
             else:
-                status = 'rejeitado'
                 st.error("❌ Solicitação REJEITADA com base no seu score atual.")
                 st.info(f"Limite máximo permitido para seu score: R$ {max_allowed:.2f}")
                 st.warning("💡 Dica: Vá para a aba 'Entrevista' para tentar melhorar seu score!")
-            
-            log_request(st.session_state['cpf'], current_limit, new_limit, status)
+
+    history = get_request_history(st.session_state['cpf'])
+    if history:
+        st.subheader("Histórico Recente")
+        st.dataframe([
+            {
+                "Data": row['data_hora_solicitacao'][:16].replace('T', ' '),
+                "Limite Atual (R$)": format_currency(float(row['limite_atual'])),
+                "Solicitado (R$)": format_currency(float(row['novo_limite_solicitado'])),
+                "Status": row['status_pedido'],
+            }
+            for row in history
+        ], hide_index=True)
 
 def view_interview():
     st.header("📝 Entrevista de Crédito")
@@ -273,17 +311,58 @@ def view_interview():
 
 def view_exchange():
     st.header("💱 Agente de Câmbio")
-    st.write("Consulte a cotação do Dólar (USD) em tempo real.")
-    
-    currency = st.text_input("Código da Moeda (ex: BRL, EUR, JPY)", "BRL").upper()
-    
+    st.write("Consulte a cotação do Dólar (USD), ou de outras moedas base, em tempo real.")
+
+    codes = get_currency_codes()
+    bases = st.multiselect("Moedas base", codes, default=[c for c in ['USD'] if c in codes])
+    currencies = st.multiselect("Moedas para cotação", codes, default=[c for c in ['BRL', 'EUR'] if c in codes])
+
     if st.button("Consultar Cotação"):
-        if currency:
-            rate = get_exchange_rate(currency)
-            if rate:
-                st.info(f"🇺🇸 1 USD = {rate:.4f} {currency}")
-            else:
-                st.error("Moeda não encontrada ou erro de conexão.")
+        if not bases or not currencies:
+            st.warning("Selecione ao menos uma moeda base e uma moeda para cotação.")
+            return
+        for base, rates in get_exchange_rates(bases, currencies).items():
+            if isinstance(rates, Exception):
+                metrics.ERRORS.labels('get_rate').inc()
+                st.error(f"Não foi possível consultar a base {base}: {rates}")
+                continue
+            for currency, rate in rates.items():
+                if currency == base:
+                    continue
+                if rate:
+                    st.info(f"1 {base} = {rate:.4f} {currency}")
+                else:
+                    st.error(f"Moeda '{currency}' não encontrada.")
+
+def view_analytics():
+    st.header("📊 Painel Administrativo")
+    st.write("Solicitações de aumento de limite por faixa de score, dia e valor solicitado.")
+
+    report = get_request_report()
+    if not report:
+        return
+
+    total = report['total']
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Solicitações", f"{total['pedidos']}")
+    col2.metric("Taxa de Aprovação", f"{total['taxa_aprovacao']:.1%}")
+    col3.metric("Média Solicitada", f"R$ {format_currency(total['media_solicitado'])}")
+
+    titles = {'faixa_score': "Faixa de score", 'dia': "Dia", 'faixa_valor': "Valor solicitado (R$)"}
+    for dimension, title in titles.items():
+        st.subheader(title)
+        st.dataframe([
+            {
+                title: key,
+                "Solicitações": totals['pedidos'],
+                "Aprovadas": totals['aprovados'],
+                "Taxa de Aprovação": f"{totals['taxa_aprovacao']:.1%}",
+                "Média Solicitada (R$)": format_currency(totals['media_solicitado']),
+                "Média Atual (R$)": format_currency(totals['media_atual']),
+            }
+            for key, totals in report[dimension].items()
+        ], hide_index=True)
+    st.caption("A faixa de score considera o score atual de cada cliente no momento em que a solicitação é agregada.")
 
 # --- Fluxo Principal do App ---
 
@@ -296,10 +375,10 @@ def main():
     else:
         # Navegação da Sidebar
         st.sidebar.title(f"Olá, {st.session_state['user']['nome']}")
-        menu = st.sidebar.radio(
-            "Menu",
-            ["🏠 Home", "💳 Limite de Crédito", "📝 Entrevista", "💱 Câmbio", "🚪 Sair"]
-        )
+        options = ["🏠 Home", "💳 Limite de Crédito", "📝 Entrevista", "💱 Câmbio"]
+        if st.session_state['cpf'] in ADMIN_CPFS:
+            options.append("📊 Painel Administrativo")
+        menu = st.sidebar.radio("Menu", options + ["🚪 Sair"])
         
         if menu == "🏠 Home":
             st.title("Painel Principal")
@@ -311,6 +390,8 @@ def main():
             view_interview()
         elif menu == "💱 Câmbio":
             view_exchange()
+        elif menu == "📊 Painel Administrativo":
+            view_analytics()
         elif menu == "🚪 Sair":
             terminate_session()
 
@@ -320,4 +401,5 @@ def terminate_session():
     st.rerun()
 
 if __name__ == "__main__":
-    main()
+    with profiling.session(st.session_state):
+        main()
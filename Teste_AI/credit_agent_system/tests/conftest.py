@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do sistema são importados a partir da raiz do projeto (from services import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CLIENTS = (
+    "cpf,data_nascimento,nome,score,limite_atual\n"
+    "12345678900,01/01/1990,João Silva,700,1000.00\n"
+    "98765432100,15/05/1985,Maria Oliveira,700,1000.00\n"
+    "11122233344,20/10/2000,Pedro Santos,0,1000.00\n"
+)
+SCORE_BANDS = (
+    "min_score,max_score,max_limite\n"
+    "0,300,500\n"
+    "301,600,2000\n"
+    "601,800,5000\n"
+    "801,1000,15000\n"
+)
+REQUESTS = "cpf_cliente,data_hora_solicitacao,limite_atual,novo_limite_solicitado,status_pedido\n"
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Diretório de dados pequeno e isolado, no formato de data/."""
+    for name, content in (('clientes.csv', CLIENTS), ('score_limite.csv', SCORE_BANDS),
+                          ('solicitacoes_aumento_limite.csv', REQUESTS)):
+        (tmp_path / name).write_text(content, encoding='utf-8')
+    return str(tmp_path)
@@ -0,0 +1,109 @@
+import pytest
+
+from services.admission import AdmissionController, Throttled, TokenBuckets
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_continuously_up_to_burst():
+    clock = Clock()
+    buckets = TokenBuckets(rate=1.0, burst=3, clock=clock)
+    assert [buckets.take('a') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take('a') == pytest.approx(1.0)
+    clock.now += 0.5
+    # Meia ficha recomposta, mas a tentativa anterior (recusada) não consome nada
+    assert buckets.take('a') == pytest.approx(0.5)
+    clock.now += 0.5
+    assert buckets.take('a') == 0.0
+    clock.now += 100
+    assert [buckets.take('a') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take('a') > 0
+
+
+def test_keys_are_independent():
+    buckets = TokenBuckets(rate=1.0, burst=1, clock=Clock())
+    assert buckets.take('a') == 0.0
+    assert buckets.take('a') > 0
+    assert buckets.take('b') == 0.0
+
+
+def test_give_back_returns_token_without_exceeding_burst():
+    clock = Clock()
+    buckets = TokenBuckets(rate=1.0, burst=2, clock=clock)
+    buckets.take('a')
+    buckets.take('a')
+    buckets.give_back('a')
+    assert buckets.take('a') == 0.0
+    assert buckets.take('a') > 0
+    buckets.reset('a')
+    buckets.give_back('a')  # balde inexistente: nada a devolver
+    assert len(buckets) == 0
+
+
+def test_idle_buckets_expire_on_sweep():
+    clock = Clock()
+    buckets = TokenBuckets(rate=1.0, burst=2, clock=clock)
+    for key in ('a', 'b'):
+        buckets.take(key)
+    clock.now += buckets.idle_ttl
+    for _ in range(1024):
+        buckets.take('c')
+    assert len(buckets) == 1
+
+
+def test_max_keys_drops_least_recently_used():
+    buckets = TokenBuckets(rate=1.0, burst=5, max_keys=3, clock=Clock())
+    for key in ('a', 'b', 'c'):
+        buckets.take(key)
+    buckets.take('a')
+    buckets.take('d')
+    assert len(buckets) == 3
+    assert set(buckets._buckets) == {'c', 'a', 'd'}
+
+
+def test_controller_per_cpf_limit_resets_on_success():
+    clock = Clock()
+    admission = AdmissionController(cpf_attempts=2, cpf_window=60, global_rate=0, max_inflight=0, clock=clock)
+    for _ in range(2):
+        with admission.admit('12345678900'):
+            pass
+    with pytest.raises(Throttled) as refused:
+        admission.admit('12345678900')
+    assert refused.value.reason == 'cpf'
+    clock.now += 30
+    with admission.admit('12345678900') as ticket:
+        ticket.succeeded = True
+    # Sucesso devolve o balde do CPF ao estado inicial
+    for _ in range(2):
+        with admission.admit('12345678900'):
+            pass
+
+
+def test_controller_global_refusal_does_not_charge_cpf():
+    clock = Clock()
+    admission = AdmissionController(cpf_attempts=1, cpf_window=60, global_rate=1, global_burst=1,
+                                    max_inflight=0, clock=clock)
+    with admission.admit('11111111111'):
+        pass
+    with pytest.raises(Throttled) as refused:
+        admission.admit('22222222222')
+    assert refused.value.reason == 'global'
+    clock.now += 1
+    with admission.admit('22222222222'):
+        pass
+
+
+def test_controller_concurrency_limit():
+    admission = AdmissionController(cpf_attempts=0, global_rate=0, max_inflight=1, clock=Clock())
+    with admission.admit('11111111111'):
+        with pytest.raises(Throttled) as refused:
+            admission.admit('22222222222')
+        assert refused.value.reason == 'concorrencia'
+    with admission.admit('22222222222'):
+        pass
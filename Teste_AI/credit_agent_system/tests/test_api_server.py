@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from benchmarks.stub_fx import StubFxServer
+from services.api_server import ApiServer
+from storage.backends import open_storage
+
+
+async def _request(port, raw):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(raw)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = int(next(line.split(b':', 1)[1] for line in head.split(b'\r\n')
+                      if line.lower().startswith(b'content-length')))
+    body = json.loads(await reader.readexactly(length))
+    writer.close()
+    return status, body
+
+
+def _get(path):
+    return f"GET {path} HTTP/1.1\r\nHost: teste\r\nConnection: close\r\n\r\n".encode()
+
+
+def _run(data_dir, fx_url, raw_requests):
+    """Sobe a API em uma porta livre, envia as requisições e devolve [(status, corpo)]."""
+    server = ApiServer(open_storage('csv', data_dir), exchange_url=fx_url, workers=2)
+
+    async def scenario():
+        ready = asyncio.get_running_loop().create_future()
+        task = asyncio.ensure_future(server.serve(port=0, ready=ready.set_result))
+        port = (await ready).sockets[0].getsockname()[1]
+        try:
+            return [await _request(port, raw) for raw in raw_requests]
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    try:
+        return asyncio.run(scenario())
+    finally:
+        server.close()
+
+
+def test_rates_by_base_through_async_client(data_dir):
+    with StubFxServer() as fx:
+        results = _run(data_dir, fx.url('USD'), [
+            _get('/cambio/brl'), _get('/cambio/EUR/BRL'), _get('/cambio/EUR/BRL'),
+            _get('/cambio/XYZ/BRL'), _get('/cambio/USD/ZZZ'), _get('/cambio/U%2FS/BRL'),
+        ])
+        hits = fx.hits
+    (usd, eur, eur_again, unknown_base, unknown_currency, invalid) = results
+    assert usd == (200, {'base': 'USD', 'moeda': 'BRL', 'cotacao': 5.4321, 'atualizado_em': usd[1]['atualizado_em']})
+    assert eur[0] == 200 and eur[1]['base'] == 'EUR'
+    assert abs(eur[1]['cotacao'] - 5.4321 / 0.9123) < 1e-9
+    assert eur_again == eur
+    assert unknown_base[0] == 404 and unknown_currency[0] == 404
+    assert invalid[0] == 400
+    # USD, EUR e XYZ: a segunda consulta de EUR sai do cache
+    assert hits == 3
+
+
+def test_invalid_content_length_is_bad_request(data_dir):
+    def post(length):
+        return (f"POST /auth HTTP/1.1\r\nHost: teste\r\nContent-Length: {length}\r\n"
+                f"Connection: close\r\n\r\n").encode()
+
+    results = _run(data_dir, None, [post('abc'), post('-5'), post('1_0'), post(str(64 * 1024 + 1))])
+    assert [status for status, _ in results] == [400, 400, 400, 413]
+    assert results[0][1] == {'erro': "Content-Length inválido."}
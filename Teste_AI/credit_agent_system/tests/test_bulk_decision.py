@@ -0,0 +1,36 @@
+import csv
+
+from services.bulk_decision import decide_file
+from storage.backends import open_storage
+
+
+def _decide(data_dir, tmp_path, content):
+    src = tmp_path / 'entrada.csv'
+    dst = tmp_path / 'saida.csv'
+    src.write_text(content, encoding='utf-8')
+    stats = decide_file(str(src), str(dst), open_storage('csv', data_dir), chunk_size=10)
+    with open(dst, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    return stats, {row['cpf_cliente']: (float(row['novo_limite_solicitado']), row['status_pedido']) for row in rows}
+
+
+def test_decisions_by_score_band(data_dir, tmp_path):
+    stats, rows = _decide(data_dir, tmp_path, "cpf,novo_limite_solicitado\n"
+                                              "12345678900,5000\n98765432100,5000.01\n11122233344,500\n")
+    assert rows == {
+        '12345678900': (5000.0, 'aprovado'),
+        '98765432100': (5000.01, 'rejeitado'),
+        '11122233344': (500.0, 'aprovado'),
+    }
+    assert (stats['aprovados'], stats['rejeitados'], stats['invalidos']) == (2, 1, 0)
+
+
+def test_short_row_does_not_shift_later_rows(data_dir, tmp_path):
+    # Linha curta com a coluna de CPF depois da de limite: o valor lido não pode sobrar para a linha seguinte
+    stats, rows = _decide(data_dir, tmp_path, "novo_limite_solicitado,cpf\n"
+                                              "100,12345678900\n400\n20000,98765432100\n100,55555555555\n")
+    assert rows == {
+        '12345678900': (100.0, 'aprovado'),
+        '98765432100': (20000.0, 'rejeitado'),
+    }
+    assert (stats['linhas'], stats['invalidos'], stats['nao_encontrados']) == (4, 1, 1)
@@ -0,0 +1,59 @@
+import pytest
+
+from storage import client_table
+from storage.base import CLIENT_FIELDS
+from storage.client_table import ClientTable
+
+ROWS = [
+    {'cpf': '98765432100', 'data_nascimento': '15/05/1985', 'nome': 'Maria Oliveira', 'score': '700', 'limite_atual': '1000.00'},
+    {'cpf': '12345678900', 'data_nascimento': '01/01/1990', 'nome': 'João Silva', 'score': '-12', 'limite_atual': '250.75'},
+    {'cpf': '00000000191', 'data_nascimento': '29/02/2000', 'nome': 'Zé Ninguém', 'score': '0', 'limite_atual': '0.00'},
+]
+# Registros fora do formato compacto: voltam exatamente como foram lidos
+ODD_ROWS = [
+    {'cpf': '123', 'data_nascimento': '01/01/1990', 'nome': 'CPF curto', 'score': '1', 'limite_atual': '1.00'},
+    {'cpf': '55555555555', 'data_nascimento': '1990-01-01', 'nome': 'Data ISO', 'score': '1', 'limite_atual': '1.00'},
+    {'cpf': '66666666666', 'data_nascimento': '01/01/1990', 'nome': 'Score malformado', 'score': '--5', 'limite_atual': '1.00'},
+    {'cpf': '77777777777', 'data_nascimento': '01/01/1990', 'nome': 'Score grande', 'score': '99999', 'limite_atual': '1.00'},
+    {'cpf': '88888888888', 'data_nascimento': '0²/01/1990', 'nome': 'Dígito não ASCII', 'score': '²', 'limite_atual': '1.234'},
+]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'sem-numpy'])
+def numpy(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(client_table, 'np', None)
+    elif client_table.np is None:
+        pytest.skip("NumPy não instalado")
+    return request.param
+
+
+def test_round_trip_of_compact_and_overflow_rows(numpy):
+    table = ClientTable.from_rows(ROWS + ODD_ROWS, CLIENT_FIELDS)
+    assert len(table) == len(ROWS) + len(ODD_ROWS)
+    for row in ROWS + ODD_ROWS:
+        assert dict(table.get(row['cpf'])) == row
+    assert set(table.overflow) == {row['cpf'] for row in ODD_ROWS}
+    # Ordem de CPF nas colunas compactas, overflow ao final
+    assert [record['cpf'] for record in table][:3] == ['00000000191', '12345678900', '98765432100']
+    assert table.get('11111111111') is None and table.get('1234567890²') is None
+
+
+def test_typed_values_and_repeated_cpf(numpy):
+    rows = ROWS + [dict(ROWS[0], score='810', nome='Maria O. Souza')]
+    table = ClientTable.from_rows(rows, CLIENT_FIELDS)
+    record = table.get('98765432100')
+    # Como no dict de um DictReader, a última linha do CPF vale
+    assert (record['nome'], record.score_value, record.limite_centavos) == ('Maria O. Souza', 810, 100000)
+    assert len(table) == len(ROWS)
+
+
+def test_set_score_in_place_and_to_overflow():
+    table = ClientTable.from_rows(ROWS, CLIENT_FIELDS)
+    assert table.set_score('12345678900', 640)
+    assert table.get('12345678900')['score'] == '640' and not table.overflow
+    # Fora do formato compacto: o registro passa inteiro para o overflow
+    assert table.set_score('12345678900', '--1')
+    assert dict(table.get('12345678900')) == dict(ROWS[1], score='--1')
+    assert len(table) == len(ROWS)
+    assert not table.set_score('11111111111', 500)
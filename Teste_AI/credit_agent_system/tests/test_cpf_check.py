@@ -0,0 +1,76 @@
+import sqlite3
+from array import array
+
+import pytest
+
+from services import cpf_check
+from services.cpf_check import BloomFilter, CpfPrecheck, normalize_cpf, valid_cpf
+from storage.csv_storage import CsvStorage
+from storage.sqlite_storage import SqliteStorage
+
+
+def test_normalize_keeps_only_digits():
+    assert normalize_cpf('123.456.789-09') == '12345678909'
+    assert normalize_cpf(' 529 982 247 25 ') == '52998224725'
+    assert normalize_cpf(12345678909) == '12345678909'
+
+
+@pytest.mark.parametrize('cpf', ['52998224725', '11144477735', '12345678909'])
+def test_valid_check_digits(cpf):
+    assert valid_cpf(cpf)
+
+
+@pytest.mark.parametrize('cpf', ['52998224726', '52998224715', '11111111111', '00000000000',
+                                 '5299822472', '529982247250', '5299822472a'])
+def test_invalid_cpfs(cpf):
+    assert not valid_cpf(cpf)
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_bloom_filter_has_no_false_negatives(numpy, monkeypatch):
+    if not numpy:
+        monkeypatch.setattr(cpf_check, 'np', None)
+    keys = array('Q', range(10_000_000_000, 10_000_000_000 + 20000 * 7, 7))
+    bloom = BloomFilter(len(keys), 0.01)
+    bloom.add_many(keys)
+    assert all(key in bloom for key in keys)
+    absent = range(20_000_000_000, 20_000_000_000 + 20000)
+    false_positives = sum(key in bloom for key in absent)
+    assert false_positives / len(absent) < 0.03
+    assert bloom.expected_fp_rate() == pytest.approx(0.01, rel=0.5)
+
+
+def _precheck(storage):
+    precheck = CpfPrecheck(storage, check_digits='desligado', check_interval=0)
+    precheck.refresh(wait=True)
+    return precheck
+
+
+def test_filter_rebuilt_when_csv_base_changes(data_dir):
+    storage = CsvStorage(data_dir)
+    precheck = _precheck(storage)
+    assert precheck.rejection('12345678900') is None
+    assert precheck.rejection('52998224725') == 'desconhecido'
+
+    # Cliente incluído por fora (edição do arquivo, outro processo)
+    with open(storage.clients_path, 'a', encoding='utf-8') as f:
+        f.write("52998224725,02/02/1992,Ana Souza,0,1000.00\n")
+    precheck.refresh(wait=True)
+    assert precheck.rejection('52998224725') is None
+
+
+def test_filter_rebuilt_when_sqlite_clients_swap(data_dir, tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'credito.db'))
+    storage.import_from(CsvStorage(data_dir))
+    precheck = _precheck(storage)
+    assert precheck.rejection('11122233344') is None
+
+    # Um cliente sai e outro entra: a contagem e o maior CPF continuam iguais
+    with sqlite3.connect(storage.db_path) as conn:
+        conn.execute("DELETE FROM clientes WHERE cpf = '11122233344'")
+        conn.execute("INSERT INTO clientes (cpf, data_nascimento, nome, score, limite_atual) "
+                     "VALUES ('52998224725', '02/02/1992', 'Ana Souza', 0, 1000)")
+    precheck.refresh(wait=True)
+    assert precheck.rejection('52998224725') is None
+    assert precheck.rejection('11122233344') == 'desconhecido'
+    storage.close()
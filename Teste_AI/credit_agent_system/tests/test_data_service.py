@@ -0,0 +1,52 @@
+from services.data_service import DataService
+from storage.backends import open_storage
+
+
+class CountingStorage:
+    """Storage que conta as leituras do histórico."""
+
+    def __init__(self, storage):
+        self._storage = storage
+        self.history_reads = 0
+
+    def request_history(self, cpf, limit=10):
+        self.history_reads += 1
+        return self._storage.request_history(cpf, limit)
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+
+def test_history_is_cached_until_own_request(data_dir):
+    storage = CountingStorage(open_storage('csv', data_dir))
+    clock = [0.0]
+    service = DataService(storage, check_interval=3600, clock=lambda: clock[0])
+
+    assert service.request_history('12345678900', 5) == []
+    for _ in range(3):
+        service.request_history('12345678900', 5)
+    assert storage.history_reads == 1
+
+    service.log_request('12345678900', 1000.0, 3000.0, 'aprovado')
+    service.request_history('98765432100', 5)
+    history = service.request_history('12345678900', 5)
+    assert [row['status_pedido'] for row in history] == ['aprovado']
+    assert storage.history_reads == 3
+    service.request_history('12345678900', 5)
+    assert storage.history_reads == 3
+
+
+def test_history_reloaded_when_log_changes_elsewhere(data_dir):
+    storage = CountingStorage(open_storage('csv', data_dir))
+    clock = [0.0]
+    service = DataService(storage, check_interval=2, clock=lambda: clock[0])
+    service.request_history('12345678900', 5)
+
+    # Solicitação gravada sem passar pela camada de dados (como outro processo faria)
+    storage.log_request('12345678900', 1000.0, 9000.0, 'rejeitado')
+    storage.requests.flush()
+    service.request_history('12345678900', 5)
+    assert storage.history_reads == 1
+    clock[0] = 5.0
+    assert [row['status_pedido'] for row in service.request_history('12345678900', 5)] == ['rejeitado']
+    assert storage.history_reads == 2
@@ -0,0 +1,72 @@
+import os
+import time
+
+import pytest
+
+from services.event_bus import EventBus, InterviewCompleted, LimitRequested, ScoreUpdated
+
+
+def _handlers(fail_on_build):
+    if fail_on_build:
+        raise RuntimeError("base indisponível")
+    return {LimitRequested: lambda message: None}
+
+
+def _dying_handlers():
+    def handle(message):
+        os._exit(3)
+    return {LimitRequested: handle}
+
+
+def test_reply_is_published_and_flushed():
+    bus = EventBus()
+    updates = []
+    bus.subscribe(InterviewCompleted, lambda m: ScoreUpdated(m.cpf, m.score, True), worker='score')
+    bus.subscribe(ScoreUpdated, updates.append, worker='registro')
+    replies = bus.publish(InterviewCompleted('12345678900', 640.0)).result(timeout=5)
+    assert replies == [ScoreUpdated('12345678900', 640.0, True)]
+    assert bus.flush(timeout=5)
+    assert updates == [ScoreUpdated('12345678900', 640.0, True)]
+    assert bus.close()
+
+
+def test_handler_error_fails_future():
+    bus = EventBus()
+    bus.subscribe(LimitRequested, lambda m: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        bus.publish(LimitRequested('12345678900', 1000.0, 5000.0, 'aprovado')).result(timeout=5)
+    assert bus.close()
+
+
+def test_close_is_bounded_when_handler_hangs():
+    bus = EventBus()
+    bus.subscribe(LimitRequested, lambda m: time.sleep(3))
+    bus.publish(LimitRequested('12345678900', 1000.0, 5000.0, 'aprovado'))
+    started = time.monotonic()
+    assert bus.close(timeout=0.3) is False
+    assert time.monotonic() - started < 1.5
+
+
+def test_worker_process_whose_factory_fails():
+    bus = EventBus()
+    bus.subscribe_processes([LimitRequested], _handlers, (True,), processes=1)
+    future = bus.publish(LimitRequested('12345678900', 1000.0, 5000.0, 'aprovado'))
+    with pytest.raises(RuntimeError, match="encerrado"):
+        future.result(timeout=30)
+    # Mensagens roteadas depois para o processo morto falham na hora
+    with pytest.raises(RuntimeError, match="encerrado"):
+        bus.publish(LimitRequested('12345678900', 1000.0, 5000.0, 'aprovado')).result(timeout=1)
+    assert bus.close(timeout=5)
+
+
+def test_worker_process_that_dies_fails_its_pending_messages():
+    bus = EventBus()
+    bus.subscribe_processes([LimitRequested], _dying_handlers, processes=1)
+    futures = [bus.publish(LimitRequested(cpf, 1000.0, 5000.0, 'aprovado'))
+               for cpf in ('12345678900', '98765432100', '11122233344')]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="código 3"):
+            future.result(timeout=30)
+    started = time.monotonic()
+    assert bus.close(timeout=5)
+    assert time.monotonic() - started < 5
@@ -0,0 +1,53 @@
+import os
+import socket
+
+import pytest
+
+from benchmarks.stub_fx import StubFxServer
+from services.fx_client import FxClient
+from services.fx_history import HISTORY_FILE
+from services.rate_cache import RateCache
+
+
+def _closed_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_history_goes_to_storage_data_dir(tmp_path):
+    with StubFxServer() as fx:
+        client = FxClient(fx.url('USD'), data_dir=str(tmp_path))
+        assert client.get_rates('USD', ['BRL']) == {'BRL': 5.4321}
+    assert os.path.getsize(tmp_path / HISTORY_FILE) > 0
+
+
+def test_outage_falls_back_without_new_fetch_for_other_bases(tmp_path, monkeypatch):
+    # Histórico gravado enquanto a API respondia
+    with StubFxServer() as fx:
+        FxClient(fx.url('USD'), data_dir=str(tmp_path)).table()
+
+    fetches = []
+    fetch = RateCache.fetch
+
+    def counted(self):
+        fetches.append(self.api_url)
+        return fetch(self)
+
+    monkeypatch.setattr(RateCache, 'fetch', counted)
+    client = FxClient(f"http://127.0.0.1:{_closed_port()}/v6/latest/USD", data_dir=str(tmp_path))
+    table = client.table()
+    assert table['offline'] and table['rates']['BRL'] == 5.4321
+    assert len(fetches) == 1
+    # Outra base no mesmo servidor: histórico direto, sem nova tentativa de conexão
+    assert client.table('EUR')['offline']
+    assert len(fetches) == 1
+
+
+def test_unknown_base_does_not_mark_server_down(tmp_path):
+    with StubFxServer() as fx:
+        client = FxClient(fx.url('USD'), data_dir=str(tmp_path))
+        with pytest.raises(ValueError, match="HTTP 404"):
+            client.table('XYZ')
+        assert client.get_rates('EUR', ['BRL'])['BRL'] is not None
+        assert client.get_rates('USD', ['BRL']) == {'BRL': 5.4321}
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from services import limit_simulation
+from services.limit_simulation import simulate
+from storage.log_segments import SegmentedLog
+
+CANDIDATE = [
+    {'min_score': '0', 'max_score': '500', 'max_limite': '1000'},
+    {'min_score': '501', 'max_score': '750', 'max_limite': '4000'},
+    {'min_score': '751', 'max_score': '1000', 'max_limite': '20000'},
+]
+CPFS = ('12345678900', '98765432100', '11122233344', '55555555555')
+
+
+@pytest.fixture
+def history(data_dir):
+    """Log com um segmento fechado e um arquivo ativo, linhas inválidas e CPFs fora da base."""
+    rng = random.Random(7)
+    path = f"{data_dir}/solicitacoes_aumento_limite.csv"
+
+    def append(count, day):
+        with open(path, mode='a', encoding='utf-8', newline='') as f:
+            for i in range(count):
+                # Múltiplos de 0,5: somas exatas em float, em qualquer ordem
+                asked = rng.randrange(0, 40000) / 2
+                f.write(f"{rng.choice(CPFS)},{day} 10:{i % 60:02d}:00,1000.00,{asked},"
+                        f"{rng.choice(('aprovado', 'rejeitado'))}\n")
+            f.write(f"{CPFS[0]},{day} 11:00:00,1000.00,abc,rejeitado\n")
+
+    append(150, '2024-01-10')
+    SegmentedLog(path).roll('dia')
+    with open(path, mode='w', encoding='utf-8', newline='') as f:
+        f.write("cpf_cliente,data_hora_solicitacao,limite_atual,novo_limite_solicitado,status_pedido\n")
+    append(400, '2024-01-11')
+    return data_dir
+
+
+def _simulate(data_dir, workers):
+    report = simulate([('candidata', CANDIDATE)], spec='csv', data_dir=data_dir, workers=workers, chunk_bytes=1024)
+    del report['segundos'], report['processos']
+    return report
+
+
+def _without_numpy(monkeypatch, tmp_path):
+    monkeypatch.setattr(limit_simulation, 'np', None)
+    # Os processos do pool ('spawn') herdam o sys.path: lá o import de numpy falha como se não estivesse instalado
+    blocker = tmp_path / 'sem_numpy' / 'numpy'
+    blocker.mkdir(parents=True)
+    (blocker / '__init__.py').write_text("raise ImportError('numpy desabilitado no teste')\n", encoding='utf-8')
+    monkeypatch.syspath_prepend(str(blocker.parent))
+
+
+def test_report_counts(history):
+    report = _simulate(history, workers=1)
+    assert (report['linhas'], report['invalidos']) == (552, 2)
+    total = report['candidatas']['candidata']['total']
+    assert total['pedidos'] == report['linhas'] - report['invalidos'] - report['sem_cliente']
+    assert total['delta_aprovados'] == total['passam_a_aprovar'] - total['passam_a_rejeitar']
+    # Scores da base: 700 e 0 -> só as faixas 501-750 e 0-500 da candidata recebem pedidos
+    bands = report['candidatas']['candidata']['faixas']
+    assert bands['751-1000']['pedidos'] == 0
+    assert bands['0-500']['pedidos'] + bands['501-750']['pedidos'] == total['pedidos']
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_same_result_with_and_without_numpy(history, workers, monkeypatch, tmp_path):
+    if limit_simulation.np is None:
+        pytest.skip("NumPy não instalado")
+    expected = _simulate(history, workers=1)
+    assert _simulate(history, workers=workers) == expected
+    _without_numpy(monkeypatch, tmp_path)
+    assert _simulate(history, workers=workers) == expected
@@ -0,0 +1,93 @@
+import csv
+import os
+
+import pytest
+
+from storage.offset_index import CpfOffsetIndex
+
+HEADER = "cpf,data_nascimento,nome,score,limite_atual\n"
+ROWS = [
+    "98765432100,15/05/1985,Maria Oliveira,700,1000.00\n",
+    "12345678900,01/01/1990,\"Silva, João\",700,1000.00\n",
+    "11122233344,20/10/2000,Pedro Santos,0,1000.00\n",
+]
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """Posição a partir da qual cada reconstrução leu o CSV."""
+    starts = []
+    scan = CpfOffsetIndex._scan
+
+    def recorded(csv_map, start, cpf_pos):
+        starts.append(start)
+        return scan(csv_map, start, cpf_pos)
+
+    monkeypatch.setattr(CpfOffsetIndex, '_scan', staticmethod(recorded))
+    return starts
+
+
+def _rows(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return {row['cpf']: row for row in csv.DictReader(f)}
+
+
+def _touch(path):
+    # Garante um mtime diferente mesmo em sistemas de arquivos com resolução grossa
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_point_reads_match_the_csv(tmp_path):
+    path = tmp_path / 'clientes.csv'
+    path.write_text(HEADER + "".join(ROWS), encoding='utf-8')
+    index = CpfOffsetIndex(str(path))
+    assert index.current() is None  # opcional: só existe depois do build()
+    assert index.build() == 3
+    indexed = CpfOffsetIndex(str(path)).current()  # outra instância reaproveita o sidecar
+    for cpf, row in _rows(path).items():
+        assert indexed.get(cpf) == row
+    assert indexed.get('00000000000') is None and indexed.get('1234567890²') is None
+
+
+def test_appended_rows_update_the_sidecar_incrementally(tmp_path, scans):
+    path = tmp_path / 'clientes.csv'
+    path.write_text(HEADER + "".join(ROWS), encoding='utf-8')
+    index = CpfOffsetIndex(str(path))
+    index.build()
+    indexed_size = os.path.getsize(path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("55566677788,02/02/1992,Ana Souza,500,2000.00\n")
+        f.write("12345678900,01/01/1990,João Silva,810,3000.00\n")  # mesmo CPF: vale a nova linha
+    _touch(path)
+
+    indexed = index.current()
+    assert scans[-1] == indexed_size
+    assert len(indexed) == 4
+    assert indexed.get('55566677788')['nome'] == 'Ana Souza'
+    assert indexed.get('12345678900')['score'] == '810'
+    assert indexed.get('98765432100') == _rows(path)['98765432100']
+
+
+def test_rewritten_csv_rebuilds_the_whole_sidecar(tmp_path, scans):
+    path = tmp_path / 'clientes.csv'
+    path.write_text(HEADER + "".join(ROWS), encoding='utf-8')
+    index = CpfOffsetIndex(str(path))
+    index.build()
+    # Mesmo tamanho, conteúdo trocado no meio (como uma compactação do journal)
+    path.write_text(HEADER + "".join(ROWS).replace(",700,", ",710,"), encoding='utf-8')
+    _touch(path)
+    indexed = index.current()
+    assert scans[-1] == len(HEADER)
+    assert indexed.get('98765432100')['score'] == '710'
+
+
+def test_csv_that_cannot_be_indexed(tmp_path):
+    path = tmp_path / 'clientes.csv'
+    path.write_text(HEADER + "".join(ROWS), encoding='utf-8')
+    index = CpfOffsetIndex(str(path))
+    index.build()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("123,01/01/1990,CPF curto,0,0.00\n")
+    _touch(path)
+    assert index.current() is None
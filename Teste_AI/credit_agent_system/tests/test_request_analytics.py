@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from services.request_analytics import RequestAnalytics
+from storage.backends import open_storage
+from storage.log_segments import SegmentedLog
+
+HEADER = "cpf_cliente,data_hora_solicitacao,limite_atual,novo_limite_solicitado,status_pedido\n"
+ROWS = [
+    "12345678900,2024-01-10 09:00:00,1000.00,3000.00,aprovado\n",
+    "98765432100,2024-01-10 10:00:00,1000.00,8000.00,rejeitado\n",
+    "11122233344,2024-01-11 11:00:00,1000.00,400.00,aprovado\n",
+    "55555555555,2024-01-11 12:00:00,1000.00,1500.00,rejeitado\n",
+    "12345678900,2024-01-12 13:00:00,3000.00,5000.00,aprovado\n",
+    "98765432100,2024-01-12 14:00:00,1000.00,60000.00,rejeitado\n",
+]
+
+
+@pytest.fixture
+def storage(data_dir):
+    storage = open_storage('csv', data_dir)
+    yield storage
+    storage.close()
+
+
+def _append(path, text):
+    with open(path, mode='a', encoding='utf-8', newline='') as f:
+        f.write(text)
+
+
+def _analytics(storage):
+    # Blocos pequenos: a leitura incremental passa por vários blocos e checkpoints
+    return RequestAnalytics(storage, chunk_bytes=64)
+
+
+def _full_report(storage, tmp_path):
+    """Agregados refeitos do zero, com um checkpoint separado."""
+    analytics = RequestAnalytics(storage, checkpoint_path=str(tmp_path / 'completo.json'))
+    analytics.rebuild()
+    return analytics.report(refresh=False)
+
+
+def _groups(report):
+    return {key: report[key] for key in ('total', 'faixa_score', 'dia', 'faixa_valor', 'invalidos')}
+
+
+def test_resume_reads_only_appended_rows(storage, tmp_path):
+    _append(storage.requests_path, ''.join(ROWS[:3]))
+    assert _analytics(storage).refresh() == 3
+    with open(_analytics(storage).checkpoint_path, encoding='utf-8') as f:
+        assert json.load(f)['offset'] == len((HEADER + ''.join(ROWS[:3])).encode('utf-8'))
+
+    # Nova instância (ex: outro processo): retoma do checkpoint; a linha incompleta fica para depois
+    partial = ROWS[4][:20]
+    _append(storage.requests_path, ROWS[3] + partial)
+    analytics = _analytics(storage)
+    assert analytics.refresh() == 1
+    _append(storage.requests_path, ROWS[4][20:] + ROWS[5])
+    assert analytics.refresh() == 2
+    assert analytics.refresh() == 0
+
+    report = analytics.report(refresh=False)
+    assert _groups(report) == _groups(_full_report(storage, tmp_path))
+    assert report['total']['pedidos'] == 6
+    assert report['total']['aprovados'] == 3
+    assert report['faixa_score']['601-800']['pedidos'] == 4
+    assert report['faixa_score']['desconhecida']['pedidos'] == 1
+    assert list(report['dia']) == ['2024-01-10', '2024-01-11', '2024-01-12']
+    assert report['faixa_valor']['50000+']['pedidos'] == 1
+
+
+def test_resume_continues_inside_rolled_segment(storage, tmp_path):
+    _append(storage.requests_path, ''.join(ROWS[:2]))
+    assert _analytics(storage).refresh() == 2
+
+    # Mais linhas no mesmo arquivo, que em seguida é rolado para um segmento antes da próxima leitura
+    _append(storage.requests_path, ROWS[2])
+    SegmentedLog(storage.requests_path).roll('tamanho')
+    _append(storage.requests_path, HEADER + ''.join(ROWS[3:]))
+
+    analytics = _analytics(storage)
+    assert analytics.refresh() == 4
+    report = analytics.report(refresh=False)
+    assert report['segmentos'] == 1
+    assert _groups(report) == _groups(_full_report(storage, tmp_path))
+    assert report['total']['pedidos'] == 6
+
+
+def test_replaced_log_is_recomputed_from_start(storage, tmp_path):
+    _append(storage.requests_path, ''.join(ROWS))
+    assert _analytics(storage).refresh() == 6
+
+    # Log substituído por outro, maior: o offset antigo não vale mais
+    with open(storage.requests_path, mode='w', encoding='utf-8', newline='') as f:
+        f.write(HEADER + ''.join(reversed(ROWS)) + ROWS[0])
+    analytics = _analytics(storage)
+    assert analytics.refresh() == 7
+    assert _groups(analytics.report(refresh=False)) == _groups(_full_report(storage, tmp_path))
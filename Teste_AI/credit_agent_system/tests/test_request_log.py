@@ -0,0 +1,62 @@
+import csv
+import time
+
+import pytest
+
+from storage.request_log import _STOP, RequestLogWriter
+
+
+def _rows(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def _writer(tmp_path, **policy):
+    policy.setdefault('flush_interval_ms', 5000)
+    return RequestLogWriter(str(tmp_path / 'solicitacoes.csv'), roll_daily=False, **policy)
+
+
+def test_flush_writes_pending_rows(tmp_path):
+    writer = _writer(tmp_path)
+    for i in range(5):
+        writer.log(f"{i:011d}", 1000.0, 2000.0, 'aprovado')
+    assert writer.flush()
+    assert [row['cpf_cliente'] for row in _rows(writer.path)] == [f"{i:011d}" for i in range(5)]
+    writer.close()
+
+
+def test_close_drains_queue_and_rejects_new_rows(tmp_path):
+    writer = _writer(tmp_path, batch_size=7)
+    for i in range(50):
+        writer.log(f"{i:011d}", 1000.0, 2000.0, 'rejeitado')
+    writer.close()
+    assert len(_rows(writer.path)) == 50
+    assert writer.rows_written == 50
+    with pytest.raises(RuntimeError):
+        writer.log('12345678900', 1000.0, 2000.0, 'aprovado')
+
+
+def test_flush_after_close_returns_immediately(tmp_path):
+    writer = _writer(tmp_path)
+    writer.log('12345678900', 1000.0, 2000.0, 'aprovado')
+    writer.close()
+    started = time.monotonic()
+    assert writer.flush()
+    assert time.monotonic() - started < 1
+
+
+def test_flush_with_dead_writer_thread_does_not_block(tmp_path):
+    writer = _writer(tmp_path)
+    writer.log('12345678900', 1000.0, 2000.0, 'aprovado')
+    # Encerra a thread sem passar por close(), como se ela tivesse morrido
+    writer._queue.put(_STOP)
+    writer._thread.join(5)
+    started = time.monotonic()
+    assert writer.flush() is False
+    assert time.monotonic() - started < 1
+
+
+def test_flush_before_first_row_is_noop(tmp_path):
+    writer = _writer(tmp_path)
+    assert writer.flush()
+    writer.close()
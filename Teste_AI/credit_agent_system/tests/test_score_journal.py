@@ -0,0 +1,124 @@
+import csv
+import multiprocessing
+
+from storage.score_journal import ScoreJournal
+
+HEADER = "cpf,data_nascimento,nome,score,limite_atual\n"
+
+
+def _base(tmp_path, cpfs):
+    path = tmp_path / 'clientes.csv'
+    path.write_text(HEADER + "".join(f"{cpf},01/01/1990,Cliente {cpf},0,1000.00\n" for cpf in cpfs),
+                    encoding='utf-8')
+    return str(path)
+
+
+def _scores(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return {row['cpf']: row['score'] for row in csv.DictReader(f)}
+
+
+def _journal(path):
+    # Sem compactação automática: os testes chamam compact() quando querem
+    return ScoreJournal(path, compact_every=10 ** 9, compact_interval=3600)
+
+
+def test_compact_merges_journal_into_base(tmp_path):
+    path = _base(tmp_path, ['11111111111', '22222222222'])
+    journal = _journal(path)
+    journal.append('11111111111', 500)
+    journal.append('11111111111', 650)
+    assert journal.overlay() == {'11111111111': '650'}
+    assert journal.compact() == 1
+    assert journal.overlay() == {}
+    assert _scores(path) == {'11111111111': '650', '22222222222': '0'}
+    journal.close()
+
+
+def test_replay_recovers_interrupted_compaction(tmp_path):
+    path = _base(tmp_path, ['11111111111', '22222222222', '33333333333'])
+    # Queda no meio de uma compactação: journal já rotacionado, base ainda não substituída,
+    # novas escritas no journal e uma última linha truncada
+    with open(path + '.journal.compacting', 'w', encoding='utf-8', newline='') as f:
+        f.write("11111111111,300\n22222222222,400\n")
+    with open(path + '.journal', 'w', encoding='utf-8', newline='') as f:
+        f.write("11111111111,700\n33333333333,9")
+    journal = _journal(path)
+    assert journal.overlay() == {'11111111111': '700', '22222222222': '400'}
+    assert journal.score_of('33333333333') is None
+    journal.compact()
+    assert _scores(path) == {'11111111111': '700', '22222222222': '400', '33333333333': '0'}
+    journal.close()
+
+
+def test_append_after_rotation_by_other_instance(tmp_path):
+    path = _base(tmp_path, ['11111111111', '22222222222'])
+    writer, compactor = _journal(path), _journal(path)
+    writer.append('11111111111', 510)
+    compactor.compact()
+    # O journal aberto pelo escritor foi rotacionado: a escrita seguinte vai para o journal novo
+    writer.append('22222222222', 520)
+    compactor.compact()
+    assert _scores(path) == {'11111111111': '510', '22222222222': '520'}
+    writer.close()
+    compactor.close()
+
+
+def _write_scores(path, cpfs, score, rounds):
+    # Várias passadas sobre os mesmos CPFs: vale a última, e as compactações caem no meio delas
+    journal = _journal(path)
+    for round_ in range(rounds):
+        for cpf in cpfs:
+            journal.append(cpf, score + round_)
+    journal.close()
+
+
+def _write_and_compact(path, cpf, score):
+    journal = _journal(path)
+    journal.append(cpf, score)
+    journal.compact()
+    journal.close()
+
+
+def test_overlay_drops_updates_merged_by_other_process(tmp_path):
+    path = _base(tmp_path, ['11111111111', '22222222222'])
+    journal = _journal(path)
+    journal.append('11111111111', 700)
+    process = multiprocessing.get_context('spawn').Process(
+        target=_write_and_compact, args=(path, '11111111111', 800))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    # A base já tem o 800 e a nossa linha de 700 (anterior) foi mesclada junto
+    assert _scores(path)['11111111111'] == '800'
+    assert journal.score_of('11111111111') is None
+    assert journal.overlay() == {}
+    # Escritas seguintes vão para o journal novo e voltam a valer sobre a base
+    journal.append('22222222222', 900)
+    assert journal.overlay() == {'22222222222': '900'}
+    journal.compact()
+    assert _scores(path) == {'11111111111': '800', '22222222222': '900'}
+    journal.close()
+
+
+def test_two_writer_processes_and_compaction_lose_no_updates(tmp_path):
+    cpfs = [f"{i:011d}" for i in range(1, 4001)]
+    path = _base(tmp_path, cpfs)
+    context = multiprocessing.get_context('spawn')
+    writers = [context.Process(target=_write_scores, args=(path, cpfs[:2000], 100, 10)),
+               context.Process(target=_write_scores, args=(path, cpfs[2000:], 200, 10))]
+    compactor = _journal(path)
+    for process in writers:
+        process.start()
+    merged = 0
+    while any(process.is_alive() for process in writers):
+        merged += compactor.compact() > 0
+    for process in writers:
+        process.join()
+        assert process.exitcode == 0
+    compactor.compact()
+    compactor.close()
+    assert merged > 1
+    scores = _scores(path)
+    assert [cpf for cpf in cpfs[:2000] if scores[cpf] != '109'] == []
+    assert [cpf for cpf in cpfs[2000:] if scores[cpf] != '209'] == []
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from storage import score_rules
+from storage.score_rules import ScoreRules, ScoreRulesError
+
+BANDS = [
+    {'min_score': '601', 'max_score': '800', 'max_limite': '5000'},
+    {'min_score': '0', 'max_score': '300', 'max_limite': '500'},
+    {'min_score': '801', 'max_score': '1000', 'max_limite': '15000'},
+    {'min_score': '301', 'max_score': '600', 'max_limite': '2000'},
+]
+SCORES = [-1, 0, 300, 300.5, 301, 600.99, 601, 800, 1000, 1000.01]
+EXPECTED = [0.0, 500.0, 500.0, 500.0, 2000.0, 2000.0, 5000.0, 5000.0, 15000.0, 0.0]
+
+
+def _band(min_s, max_s, limit=1000):
+    return {'min_score': str(min_s), 'max_score': str(max_s), 'max_limite': str(limit)}
+
+
+@pytest.mark.parametrize('bands, message', [
+    ([], "vazia"),
+    ([_band(0, 300), _band(300, 600)], "sobrepostas"),
+    ([_band(0, 300), _band(250, 280)], "sobrepostas"),
+    ([_band(0, 300), _band(302, 600)], "Buraco"),
+    ([_band(500, 400)], "inválida"),
+])
+def test_inconsistent_tables_are_rejected(bands, message):
+    with pytest.raises(ScoreRulesError, match=message):
+        ScoreRules.compile(bands)
+
+
+def test_lookup_between_and_outside_bands():
+    rules = ScoreRules.from_rows(BANDS)
+    assert [rules.max_limit(score) for score in SCORES] == EXPECTED
+    assert rules.band_label(300.5) == '0-300'
+    assert rules.band_label(1001) == 'fora' and rules.band_label(-0.5) == 'fora'
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_batch_matches_single_lookups(numpy, monkeypatch):
+    if not numpy:
+        monkeypatch.setattr(score_rules, 'np', None)
+    elif score_rules.np is None:
+        pytest.skip("NumPy não instalado")
+    rules = ScoreRules.from_rows(BANDS)
+    assert [float(limit) for limit in rules.max_limits(SCORES)] == EXPECTED
+    assert [int(i) for i in rules.band_indexes(SCORES)] == [rules.band_index(score) for score in SCORES]
+
+
+def test_file_reloaded_when_changed(tmp_path):
+    path = tmp_path / 'score_limite.csv'
+    path.write_text("min_score,max_score,max_limite\n0,500,1000\n501,1000,3000\n", encoding='utf-8')
+    rules = ScoreRules(str(path))
+    assert rules.max_limit(700) == 3000
+    path.write_text("min_score,max_score,max_limite\n0,500,1000\n501,1000,9000\n", encoding='utf-8')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert rules.max_limit(700) == 9000
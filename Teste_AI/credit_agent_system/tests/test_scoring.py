@@ -0,0 +1,66 @@
+import csv
+import random
+
+import pytest
+
+from services import scoring
+from services.bulk_rescore import rescore_file
+from services.scoring import calculate_score, calculate_scores
+from storage.backends import open_storage
+
+EDGE_CASES = [
+    # (renda, despesas, emprego, dependentes, dívidas)
+    (0.0, 0.0, 'desempregado', "3+", 'sim'),         # negativo antes do limite: 0
+    (-5000.0, 0.0, 'formal', 0, 'não'),              # renda negativa: limitado a 0
+    (1e9, 0.0, 'formal', 0, 'não'),                  # acima de 1000: 1000
+    (1000.0, 99.0, 'autônomo', 2, 'sim'),            # 300 + 200 + 60 - 100
+    (33.0, 99.0, 'formal', 1, 'sim'),                # 289.9: truncado por int(), não arredondado
+    (-0.5, 29.0, 'desempregado', 0, 'sim'),          # -0.5: int() trunca para 0 antes do limite
+    (5.0, 0.0, 'desempregado', 7, 'não'),            # 7 dependentes: faixa "3+"
+    (5.0, 0.0, 'formal', "3+", 'não'),
+    (100.0, 3.0, 'outro', 1, 'talvez'),              # categorias desconhecidas valem 0
+]
+
+
+def _random_answers(rng, n):
+    return [(rng.uniform(-2000, 40000), rng.uniform(0, 20000), rng.choice(list(scoring.PESO_EMPREGO) + ['outro']),
+             rng.choice([0, 1, 2, 3, 5, "3+"]), rng.choice(['sim', 'não'])) for _ in range(n)]
+
+
+def _scalar(rows):
+    return [calculate_score({'income': i, 'expenses': e, 'job_type': j, 'dependents': d, 'has_debts': h})
+            for i, e, j, d, h in rows]
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_batch_matches_scalar(numpy, monkeypatch):
+    if not numpy:
+        monkeypatch.setattr(scoring, 'np', None)
+    elif scoring.np is None:
+        pytest.skip("NumPy não instalado")
+    rows = EDGE_CASES + _random_answers(random.Random(42), 20000)
+    batch = calculate_scores(*zip(*rows))
+    assert [int(score) for score in batch] == _scalar(rows)
+
+
+def test_edge_case_values():
+    assert _scalar(EDGE_CASES) == [0, 0, 1000, 460, 289, 0, 280, 580, 830]
+
+
+def test_rescore_file_applies_changed_scores(data_dir, tmp_path):
+    src, dst = tmp_path / 'respostas.csv', tmp_path / 'scores.csv'
+    src.write_text("cpf,renda,tipo_emprego,despesas,dependentes,dividas\n"
+                   "12345678900,1000,autônomo,99,2,sim\n"          # 460
+                   "98765432100,20000,formal,0,0,não\n"            # 1000
+                   "11122233344,0,desempregado,0,4,sim\n"          # 0: sem alteração
+                   "55555555555,1000,formal,0,0,não\n"             # fora da base
+                   "12345678900,abc,formal,0,0,não\n", encoding='utf-8')
+    storage = open_storage('csv', data_dir)
+    stats = rescore_file(str(src), str(dst), storage, apply=True, chunk_size=2)
+    with open(dst, encoding='utf-8', newline='') as f:
+        assert [tuple(row.values()) for row in csv.DictReader(f)] == [
+            ('12345678900', '700', '460'), ('98765432100', '700', '1000'), ('11122233344', '0', '0')]
+    assert (stats['linhas'], stats['alterados'], stats['gravados'], stats['nao_encontrados'], stats['invalidos']) \
+        == (5, 2, 2, 1, 1)
+    assert storage.get_client('12345678900')['score'] == '460'
+    storage.close()
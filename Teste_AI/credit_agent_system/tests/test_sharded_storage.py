@@ -0,0 +1,51 @@
+import csv
+import os
+
+from storage.base import CLIENT_FIELDS
+from storage.csv_storage import CsvStorage
+from storage.sharded_storage import SHARDS_DIR, ShardedCsvStorage, reshard, shard_of, shard_path
+
+CPFS = ['12345678900', '98765432100', '11122233344']
+
+
+def _shard_cpfs(shards_dir, n_shards):
+    found = {}
+    for i in range(n_shards):
+        with open(shard_path(shards_dir, i), encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                found[row['cpf']] = i
+    return found
+
+
+def test_reshard_routes_every_client_to_its_crc32_shard(data_dir):
+    shards_dir = os.path.join(data_dir, SHARDS_DIR)
+    counts = reshard(CsvStorage(data_dir).iter_clients(), CLIENT_FIELDS, shards_dir, 4)
+    assert sum(counts) == 3
+    assert _shard_cpfs(shards_dir, 4) == {cpf: shard_of(cpf, 4) for cpf in CPFS}
+
+    storage = ShardedCsvStorage(data_dir)
+    assert storage.get_client('98765432100')['nome'] == 'Maria Oliveira'
+    assert storage.authenticate('12345678900', '01/01/1990') is not None
+    assert storage.get_client('00000000000') is None
+    assert [row['cpf'] if row else None for row in storage.get_clients(CPFS + ['00000000000'])] == CPFS + [None]
+
+
+def test_score_update_rewrites_one_shard_and_survives_reshard(data_dir):
+    shards_dir = os.path.join(data_dir, SHARDS_DIR)
+    reshard(CsvStorage(data_dir).iter_clients(), CLIENT_FIELDS, shards_dir, 4)
+    storage = ShardedCsvStorage(data_dir)
+    untouched = {i: os.stat(shard_path(shards_dir, i)).st_mtime_ns for i in range(4)}
+    target = shard_of('11122233344', 4)
+
+    assert storage.update_score('11122233344', 640)
+    assert not storage.update_score('00000000000', 640)
+    changed = [i for i in range(4) if os.stat(shard_path(shards_dir, i)).st_mtime_ns != untouched[i]]
+    assert changed == [target]
+
+    # Reparticionar a partir dos próprios shards: outro N, nenhum cliente perdido
+    counts = reshard(storage.iter_clients(), CLIENT_FIELDS, shards_dir, 3)
+    assert sum(counts) == 3 and not os.path.exists(shards_dir + '.tmp')
+    assert _shard_cpfs(shards_dir, 3) == {cpf: shard_of(cpf, 3) for cpf in CPFS}
+    resharded = ShardedCsvStorage(data_dir)
+    assert resharded.clients.n_shards == 3
+    assert resharded.get_client('11122233344')['score'] == '640'
@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+from storage.csv_storage import CsvStorage
+from storage.sqlite_storage import SqliteStorage
+
+
+@pytest.fixture
+def storage(data_dir, tmp_path):
+    source = CsvStorage(data_dir)
+    for cpf, requested in (('12345678900', 2000.0), ('98765432100', 9000.0), ('12345678900', 3000.0)):
+        source.log_request(cpf, 1000.0, requested, 'aprovado' if requested <= 5000 else 'rejeitado')
+    db = SqliteStorage(str(tmp_path / 'credito.db'))
+    db.counts = db.import_from(source)
+    source.close()
+    yield db
+    db.close()
+
+
+def test_import_copies_everything(storage, data_dir):
+    assert storage.counts == {'clientes': 3, 'score_limite': 4, 'solicitacoes_aumento_limite': 3}
+    # No banco a ordem é a do CPF
+    by_cpf = lambda row: row['cpf']
+    assert list(storage.iter_clients()) == sorted(CsvStorage(data_dir).iter_clients(), key=by_cpf)
+    assert storage.get_client('98765432100')['limite_atual'] == '1000.00'
+    assert storage.get_clients(['11122233344', '00000000000']) == [storage.get_client('11122233344'), None]
+    # Reimportar substitui em vez de duplicar
+    assert storage.import_from(CsvStorage(data_dir))['clientes'] == 3
+
+
+def test_request_history_newest_first(storage):
+    history = storage.request_history('12345678900', limit=10)
+    assert [float(row['novo_limite_solicitado']) for row in history] == [3000.0, 2000.0]
+    assert len(storage.request_history('12345678900', limit=1)) == 1
+    assert storage.request_history('11122233344') == []
+
+
+def test_score_rules_reloaded_after_write_by_other_connection(storage):
+    assert storage.max_limit(700) == 5000.0
+    with sqlite3.connect(storage.db_path) as conn:
+        conn.execute("UPDATE score_limite SET max_limite = 7000 WHERE min_score = 601")
+    assert storage.max_limit(700) == 7000.0
+    assert list(storage.max_limits([700, 900])) == [7000.0, 15000.0]
+
+
+def test_score_update_touches_only_the_client(storage):
+    assert storage.update_score('12345678900', 820)
+    assert not storage.update_score('00000000000', 820)
+    assert storage.get_client('12345678900')['score'] == '820'
+    assert storage.get_client('98765432100')['score'] == '700'